@@ -0,0 +1,369 @@
+"""
+Measures latency and throughput of `AccessService.check_user` over a grid of
+synthetic policies.
+
+Every amount of controllers is booted in a separate process with an
+in-memory storage. For each amount of permissions and roles per user,
+authorized, anonymous and unknown-route checks are measured.
+
+Results are printed as one JSON document. Pass a previous result with
+`--baseline` to get throughput changes between versions.
+
+Run: `python -m benchmarks.access [--controllers 10,100,1000,5000]
+[--permissions 1,50,500] [--roles 1,10] [--output result.json]`.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from orwynn import Module
+from orwynn.boot import Boot
+from orwynn.di.di import Di
+from orwynn.http import Endpoint, HttpController
+from orwynn.mongo import module as mongo_module
+from pykit.errors import ForbiddenResourceError, NotFoundError
+
+from orwynn_rbac import module as rbac_module
+from orwynn_rbac.bootscripts import RBACBoot
+from orwynn_rbac.documents import Role
+from orwynn_rbac.search import PermissionSearch, RoleSearch
+from orwynn_rbac.storage import MemoryRBACStorage
+
+if TYPE_CHECKING:
+    from orwynn_rbac.services import (
+        AccessService,
+        PermissionService,
+        RoleService,
+    )
+
+Cases: list[str] = ["authorized", "anonymous", "unknown_route"]
+# users share a limited amount of role sets, as it usually happens
+RoleGroupAmount: int = 20
+UserAmount: int = 1000
+
+
+def get_permission_name(i: int) -> str:
+    return f"bench.permission.resource-{i}:get"
+
+
+def create_controllers(amount: int) -> list[type[HttpController]]:
+    def get(self: HttpController, id: str) -> dict:
+        return {}
+
+    return [
+        type(
+            f"Resource{i}Controller",
+            (HttpController,),
+            {
+                "Route": f"/resources-{i}/{{id}}",
+                "Endpoints": [Endpoint(method="get")],
+                "Permissions": {"get": get_permission_name(i)},
+                "get": get,
+            },
+        )
+        for i in range(amount)
+    ]
+
+
+async def boot(controllers: int) -> MemoryRBACStorage:
+    os.environ["ORWYNN_MODE"] = "test"
+    storage: MemoryRBACStorage = MemoryRBACStorage()
+
+    await Boot.create(
+        Module(
+            "/",
+            Controllers=create_controllers(controllers),
+            imports=[rbac_module, mongo_module],
+        ),
+        bootscripts=[
+            RBACBoot(storage=storage).get_bootscript(),
+        ],
+        apprc={
+            "prod": {
+                "Mongo": {
+                    "url": "mongodb://localhost:9006",
+                    "database_name": "orwynn-rbac-bench",
+                },
+            },
+        },
+    )
+
+    return storage
+
+
+def assign_roles(
+    storage: MemoryRBACStorage,
+    *,
+    permissions_per_user: int,
+    roles_per_user: int,
+    seed: int = 0,
+) -> dict[str, list[int]]:
+    """
+    Replaces roles with groups of roles having given amounts of
+    permissions and assigns each user to a group.
+
+    Returns:
+        Numbers of controllers permitted for each user.
+    """
+    rnd: random.Random = random.Random(seed)
+    permission_service: PermissionService = Di.ie().find("PermissionService")
+    role_service: RoleService = Di.ie().find("RoleService")
+
+    ids_by_controller_no: dict[int, str] = {}
+    for p in permission_service.get(PermissionSearch()):
+        if p.name.startswith("bench."):
+            ids_by_controller_no[
+                int(p.name.split(":")[0].rsplit("-", 1)[1])
+            ] = p.getid()
+    controller_nos: list[int] = sorted(ids_by_controller_no.keys())
+
+    with contextlib.suppress(NotFoundError):
+        storage.delete_roles([
+            r.getid() for r in storage.get_roles(RoleSearch())
+            if r.name.startswith("bench-")
+        ])
+
+    permitted_by_group: list[list[int]] = [
+        rnd.sample(
+            controller_nos, min(permissions_per_user, len(controller_nos)),
+        )
+        for _ in range(RoleGroupAmount)
+    ]
+    storage.create_roles([
+        Role(
+            name=f"bench-role-{group}-{role_no}",
+            permission_ids=[
+                ids_by_controller_no[i]
+                for i in permitted[role_no::roles_per_user]
+            ],
+            user_ids=[
+                f"user-{i}"
+                for i in range(group, UserAmount, RoleGroupAmount)
+            ],
+            is_dynamic=False,
+        )
+        for group, permitted in enumerate(permitted_by_group)
+        for role_no in range(roles_per_user)
+    ])
+    role_service.rebuild_members_filter()
+
+    return {
+        f"user-{i}": permitted_by_group[i % RoleGroupAmount]
+        for i in range(UserAmount)
+    }
+
+
+def create_checks(
+    case: str,
+    *,
+    controllers: int,
+    permitted_by_user_id: dict[str, list[int]],
+    amount: int = 1000,
+    seed: int = 1,
+) -> list[tuple[str | None, str, str]]:
+    rnd: random.Random = random.Random(seed)
+    user_ids: list[str] = list(permitted_by_user_id.keys())
+    checks: list[tuple[str | None, str, str]] = []
+
+    for _ in range(amount):
+        user_id: str = rnd.choice(user_ids)
+        match case:
+            case "authorized":
+                checks.append((
+                    user_id,
+                    f"/resources-{rnd.choice(permitted_by_user_id[user_id])}"
+                    f"/{rnd.randrange(1000)}",
+                    "get",
+                ))
+            case "anonymous":
+                checks.append((
+                    None,
+                    f"/resources-{rnd.randrange(controllers)}"
+                    f"/{rnd.randrange(1000)}",
+                    "get",
+                ))
+            case "unknown_route":
+                checks.append((
+                    user_id, f"/unknown-{rnd.randrange(1000)}", "get",
+                ))
+
+    return checks
+
+
+def measure(
+    check: Callable[[str | None, str, str], Any],
+    checks: list[tuple[str | None, str, str]],
+    *,
+    duration: float,
+) -> dict[str, float]:
+    # the first calls build route matchers and caches
+    for c in checks:
+        with contextlib.suppress(ForbiddenResourceError, NotFoundError):
+            check(*c)
+
+    latencies: list[int] = []
+    finish_at: float = time.perf_counter() + duration
+    started_at: float = time.perf_counter()
+
+    while time.perf_counter() < finish_at:
+        for c in checks:
+            call_started_at: int = time.perf_counter_ns()
+            with contextlib.suppress(ForbiddenResourceError, NotFoundError):
+                check(*c)
+            latencies.append(time.perf_counter_ns() - call_started_at)
+
+    elapsed: float = time.perf_counter() - started_at
+    quantiles: list[float] = statistics.quantiles(latencies, n=100)
+
+    return {
+        "checks_per_second": round(len(latencies) / elapsed),
+        "p50_us": round(quantiles[49] / 1000, 2),
+        "p99_us": round(quantiles[98] / 1000, 2),
+    }
+
+
+def run_controllers(
+    controllers: int,
+    permissions: list[int],
+    roles: list[int],
+    duration: float,
+) -> list[dict[str, Any]]:
+    storage: MemoryRBACStorage = asyncio.run(boot(controllers))
+    access_service: AccessService = Di.ie().find("AccessService")
+    results: list[dict[str, Any]] = []
+
+    for permissions_per_user in permissions:
+        if permissions_per_user > controllers:
+            continue
+        for roles_per_user in roles:
+            if roles_per_user > permissions_per_user:
+                continue
+
+            permitted_by_user_id: dict[str, list[int]] = assign_roles(
+                storage,
+                permissions_per_user=permissions_per_user,
+                roles_per_user=roles_per_user,
+            )
+
+            results.extend(
+                {
+                    "controllers": controllers,
+                    "permissions_per_user": permissions_per_user,
+                    "roles_per_user": roles_per_user,
+                    "case": case,
+                    **measure(
+                        access_service.check_user,
+                        create_checks(
+                            case,
+                            controllers=controllers,
+                            permitted_by_user_id=permitted_by_user_id,
+                        ),
+                        duration=duration,
+                    ),
+                }
+                for case in Cases
+            )
+
+    return results
+
+
+def compare(
+    results: list[dict[str, Any]],
+    baseline: list[dict[str, Any]],
+) -> None:
+    """
+    Adds throughput of matching baseline results and its change to the
+    results.
+    """
+    def get_key(result: dict[str, Any]) -> tuple:
+        return (
+            result["controllers"],
+            result["permissions_per_user"],
+            result["roles_per_user"],
+            result["case"],
+        )
+
+    baseline_by_key: dict[tuple, dict[str, Any]] = {
+        get_key(r): r for r in baseline
+    }
+    for result in results:
+        baseline_result: dict[str, Any] | None = \
+            baseline_by_key.get(get_key(result))
+        if baseline_result is None:
+            continue
+        result["baseline_checks_per_second"] = \
+            baseline_result["checks_per_second"]
+        result["change"] = round(
+            result["checks_per_second"]
+            / baseline_result["checks_per_second"],
+            2,
+        )
+
+
+def _parse_ints(value: str) -> list[int]:
+    return [int(v) for v in value.split(",")]
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Orwynn RBAC Access Check Benchmark",
+    )
+    parser.add_argument(
+        "--controllers", type=_parse_ints, default=[10, 100, 1000, 5000],
+    )
+    parser.add_argument(
+        "--permissions", type=_parse_ints, default=[1, 50, 500],
+    )
+    parser.add_argument("--roles", type=_parse_ints, default=[1, 10])
+    parser.add_argument("--duration", type=float, default=1.0)
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--output", type=Path, default=None)
+    namespace: argparse.Namespace = parser.parse_args()
+
+    results: list[dict[str, Any]] = []
+    # every app is booted in a fresh process, since DI is global
+    context = multiprocessing.get_context("spawn")
+    for controllers in namespace.controllers:
+        with context.Pool(1) as pool:
+            results.extend(pool.apply(
+                run_controllers,
+                (
+                    controllers,
+                    namespace.permissions,
+                    namespace.roles,
+                    namespace.duration,
+                ),
+            ))
+
+    if namespace.baseline is not None:
+        compare(
+            results,
+            json.loads(namespace.baseline.read_text())["results"],
+        )
+
+    output: str = json.dumps({
+        "benchmark": "access",
+        "params": {
+            "controllers": namespace.controllers,
+            "permissions": namespace.permissions,
+            "roles": namespace.roles,
+            "duration": namespace.duration,
+        },
+        "results": results,
+    })
+    if namespace.output is not None:
+        namespace.output.write_text(output)
+    print(output)  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
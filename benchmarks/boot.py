@@ -0,0 +1,307 @@
+"""
+Measures phases of `RBACBoot` for many synthetic controllers and default
+roles.
+
+The app is booted once with N generated controllers, then the RBAC
+bootscript is run directly in three scenarios:
+- cold: an empty storage
+- warm: the storage left by the cold boot, nothing has changed
+- warm_changed: the warm storage after a tenth of controllers has got new
+  permission names
+
+Every phase is timed and storage operations made in it are counted by a
+storage proxy. An in-memory storage stands in for Mongo, so the counts show
+how many round trips a Mongo deployment would make.
+
+Run: `python -m benchmarks.boot [--controllers 900] [--roles 50]
+[--reconcile]`.
+"""
+import abc
+import argparse
+import asyncio
+import functools
+import json
+import os
+import random
+import time
+from collections import Counter
+from collections.abc import Callable
+from typing import Any
+
+from orwynn import Module
+from orwynn.boot import Boot
+from orwynn.di.di import Di
+from orwynn.http import Endpoint, HttpController
+from orwynn.mongo import module as mongo_module
+
+from orwynn_rbac import module as rbac_module
+from orwynn_rbac.bootscripts import RBACBoot
+from orwynn_rbac.models import DefaultRole
+from orwynn_rbac.services import PermissionService, RoleService
+from orwynn_rbac.storage import MemoryRBACStorage, RBACStorage
+
+# storage methods counted as database operations
+OperationNames: list[str] = [
+    "get_permissions",
+    "create_permissions",
+    "update_permissions",
+    "delete_permissions",
+    "get_roles",
+    "create_roles",
+    "update_roles",
+    "delete_roles",
+    "get_role_ids_for_users",
+]
+# bootscript phases by service class and method name
+Phases: dict[str, tuple[type, str]] = {
+    "permissions_sync": (PermissionService, "_init_internal"),
+    "default_roles_init": (RoleService, "_init_defaults_internal"),
+    "default_roles_reconcile": (RoleService, "reconcile_defaults"),
+    "permissions_unlink": (RoleService, "_unlink_internal"),
+    "members_filter": (RoleService, "rebuild_members_filter"),
+}
+
+
+class CountingStorage(RBACStorage):
+    """
+    Counts operations made through the wrapped storage.
+    """
+    def __init__(self, storage: RBACStorage) -> None:
+        super().__init__()
+        self.storage: RBACStorage = storage
+        self.counts: Counter[str] = Counter()
+
+    @property
+    def revision(self) -> int:
+        return self.storage.revision
+
+    def load(
+        self,
+        snapshot: dict[str, list[dict[str, Any]]],
+    ) -> None:
+        self.storage.load(snapshot)
+
+
+def _create_counted(name: str) -> Callable:
+    def counted(self: CountingStorage, *args: Any, **kwargs: Any) -> Any:
+        self.counts[name] += 1
+        return getattr(self.storage, name)(*args, **kwargs)
+
+    counted.__name__ = name
+    return counted
+
+
+for _name in OperationNames:
+    setattr(CountingStorage, _name, _create_counted(_name))
+abc.update_abstractmethods(CountingStorage)
+
+
+class PhaseRecorder:
+    """
+    Records duration and storage operations of bootscript phases.
+    """
+    def __init__(self) -> None:
+        self.storage: CountingStorage | None = None
+        self.phases: dict[str, dict[str, Any]] = {}
+
+    def install(self) -> None:
+        for phase, (Service, method_name) in Phases.items():
+            setattr(
+                Service,
+                method_name,
+                self._wrap(phase, getattr(Service, method_name)),
+            )
+
+    def _wrap(self, phase: str, method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapped(*args: Any, **kwargs: Any) -> Any:
+            operations_before: Counter[str] = \
+                Counter(self.storage.counts) if self.storage else Counter()
+            started_at: float = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed: float = time.perf_counter() - started_at
+                operations: Counter[str] = \
+                    self.storage.counts - operations_before \
+                    if self.storage else Counter()
+
+                # nested phases, e.g. reconcile called by init, are
+                # reported on their own and included in the outer one
+                self.phases[phase] = {
+                    "ms": round(elapsed * 1000, 2),
+                    "operations": sum(operations.values()),
+                    "operations_by_name": dict(operations),
+                }
+
+        return wrapped
+
+
+def get_permission_name(i: int, version: int = 1) -> str:
+    return f"bench.permission.resource-{i}-v{version}:get"
+
+
+def create_controllers(amount: int) -> list[type[HttpController]]:
+    def get(self: HttpController, id: str) -> dict:
+        return {}
+
+    def post(self: HttpController, id: str) -> dict:
+        return {}
+
+    return [
+        type(
+            f"Resource{i}Controller",
+            (HttpController,),
+            {
+                "Route": f"/resources-{i}/{{id}}",
+                "Endpoints": [Endpoint(method="get"), Endpoint(method="post")],
+                "Permissions": {"get": get_permission_name(i)},
+                "get": get,
+                "post": post,
+            },
+        )
+        for i in range(amount)
+    ]
+
+
+def create_default_roles(
+    amount: int,
+    *,
+    controllers: int,
+    permissions_per_role: int,
+    seed: int = 0,
+) -> list[DefaultRole]:
+    rnd: random.Random = random.Random(seed)
+    # the last tenth of controllers is renamed in the changed scenario
+    stable_controllers: int = max(controllers - controllers // 10, 1)
+
+    return [
+        DefaultRole(
+            name=f"bench-role-{i}",
+            title=f"Bench Role {i}",
+            permission_names=[
+                get_permission_name(no)
+                for no in rnd.sample(
+                    range(stable_controllers),
+                    min(permissions_per_role, stable_controllers),
+                )
+            ],
+        )
+        for i in range(amount)
+    ]
+
+
+def rename_permissions(controllers: list[HttpController]) -> None:
+    for no, controller in enumerate(controllers):
+        if no >= len(controllers) - len(controllers) // 10:
+            type(controller).Permissions = {  # type: ignore
+                "get": get_permission_name(no, version=2),
+            }
+
+
+def run_scenario(
+    recorder: PhaseRecorder,
+    storage: CountingStorage,
+    *,
+    default_roles: list[DefaultRole],
+    reconcile_default_roles: bool,
+) -> dict[str, Any]:
+    recorder.storage = storage
+    recorder.phases = {}
+
+    rbac_boot: RBACBoot = RBACBoot(
+        default_roles=default_roles,
+        storage=storage,
+        reconcile_default_roles=reconcile_default_roles,
+    )
+
+    started_at: float = time.perf_counter()
+    rbac_boot._boot(  # noqa: SLF001
+        role_service=Di.ie().find("RoleService"),
+        permission_service=Di.ie().find("PermissionService"),
+        access_service=Di.ie().find("AccessService"),
+        mongo_state_flag_service=Di.ie().find("MongoStateFlagService"),
+    )
+    elapsed: float = time.perf_counter() - started_at
+
+    return {
+        "total_ms": round(elapsed * 1000, 2),
+        "total_operations": sum(storage.counts.values()),
+        "phases": recorder.phases,
+    }
+
+
+async def boot(controllers: int) -> None:
+    os.environ["ORWYNN_MODE"] = "test"
+
+    # the RBAC bootscript is run by the benchmark itself
+    await Boot.create(
+        Module(
+            "/",
+            Controllers=create_controllers(controllers),
+            imports=[rbac_module, mongo_module],
+        ),
+        apprc={
+            "prod": {
+                "Mongo": {
+                    "url": "mongodb://localhost:9006",
+                    "database_name": "orwynn-rbac-bench",
+                },
+            },
+        },
+    )
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Orwynn RBAC Boot Benchmark",
+    )
+    parser.add_argument("--controllers", type=int, default=900)
+    parser.add_argument("--roles", type=int, default=50)
+    parser.add_argument("--permissions-per-role", type=int, default=20)
+    parser.add_argument(
+        "--reconcile",
+        action="store_true",
+        help="reconcile default roles on every boot",
+    )
+    namespace: argparse.Namespace = parser.parse_args()
+
+    asyncio.run(boot(namespace.controllers))
+
+    recorder: PhaseRecorder = PhaseRecorder()
+    recorder.install()
+
+    run: Callable[[CountingStorage], dict[str, Any]] = functools.partial(
+        run_scenario,
+        recorder,
+        default_roles=create_default_roles(
+            namespace.roles,
+            controllers=namespace.controllers,
+            permissions_per_role=namespace.permissions_per_role,
+        ),
+        reconcile_default_roles=namespace.reconcile,
+    )
+    scenarios: dict[str, Any] = {}
+
+    cold_storage: CountingStorage = CountingStorage(MemoryRBACStorage())
+    scenarios["cold"] = run(cold_storage)
+
+    warm_storage: CountingStorage = CountingStorage(
+        MemoryRBACStorage.from_snapshot(cold_storage.storage.dump()),
+    )
+    scenarios["warm"] = run(warm_storage)
+
+    rename_permissions(Di.ie().controllers)
+    scenarios["warm_changed"] = run(CountingStorage(
+        MemoryRBACStorage.from_snapshot(warm_storage.storage.dump()),
+    ))
+
+    print(json.dumps({  # noqa: T201
+        "benchmark": "boot",
+        "params": vars(namespace),
+        "scenarios": scenarios,
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Compares route matching of `RouteUtils.is_request_route_registered` before
+and after the compiled `RouteMatcher`.
+
+The previous approach compiled a regex for every route of the app on every
+call and tried them one by one.
+
+Run: `python -m benchmarks.routes [--routes 500]`.
+"""
+import argparse
+import json
+import random
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+from orwynn_rbac.utils import RouteMatcher, RouteUtils
+
+if TYPE_CHECKING:
+    import re
+
+
+def create_abstract_routes(amount: int) -> list[str]:
+    return [
+        f"/resources-{i}/{{id}}" if i % 2 else f"/resources-{i}"
+        for i in range(amount)
+    ]
+
+
+def create_routes(
+    amount: int,
+    *,
+    abstract_routes: int,
+    seed: int = 0,
+) -> list[str]:
+    rnd: random.Random = random.Random(seed)
+    routes: list[str] = []
+
+    for _ in range(amount):
+        i: int = rnd.randrange(abstract_routes)
+        # every tenth route is not registered
+        if rnd.random() < 0.1:  # noqa: PLR2004
+            routes.append(f"/unknown-{i}")
+        elif i % 2:
+            routes.append(f"/resources-{i}/{rnd.randrange(1000)}")
+        else:
+            routes.append(f"/resources-{i}")
+
+    return routes
+
+
+def match_per_route(abstract_routes: list[str], route: str) -> int | None:
+    pattern: re.Pattern
+    for i, abstract_route in enumerate(abstract_routes):
+        pattern = RouteUtils.compile_route_regex(abstract_route)
+        if pattern.fullmatch(route):
+            return i
+    return None
+
+
+def _measure(
+    match: Callable[[str], int | None],
+    routes: list[str],
+    *,
+    duration: float,
+) -> float:
+    matched: int = 0
+    finish_at: float = time.perf_counter() + duration
+    started_at: float = time.perf_counter()
+
+    while time.perf_counter() < finish_at:
+        for route in routes:
+            match(route)
+        matched += len(routes)
+
+    return matched / (time.perf_counter() - started_at)
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Orwynn RBAC Route Matching Benchmark",
+    )
+    parser.add_argument("--routes", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=3.0)
+    namespace: argparse.Namespace = parser.parse_args()
+
+    abstract_routes: list[str] = create_abstract_routes(namespace.routes)
+    routes: list[str] = create_routes(
+        1000, abstract_routes=namespace.routes,
+    )
+    matcher: RouteMatcher = RouteMatcher(abstract_routes)
+
+    for route in routes:
+        if matcher.match(route) != match_per_route(abstract_routes, route):
+            raise AssertionError(route)
+
+    per_route_rate: float = _measure(
+        lambda route: match_per_route(abstract_routes, route),
+        routes,
+        duration=namespace.duration,
+    )
+    matcher_rate: float = _measure(
+        matcher.match, routes, duration=namespace.duration,
+    )
+
+    print(json.dumps({  # noqa: T201
+        "benchmark": "routes",
+        "params": vars(namespace),
+        "per_route_matches_per_second": round(per_route_rate),
+        "matcher_matches_per_second": round(matcher_rate),
+        "speedup": round(matcher_rate / per_route_rate, 1),
+    }))
+
+
+if __name__ == "__main__":
+    main()
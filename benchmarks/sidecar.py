@@ -0,0 +1,205 @@
+"""
+Measures decisions per second per core of the access-decision sidecar.
+
+The server runs in a separate single-threaded process, so the reported
+throughput is the throughput of one core. In-process `CompiledPolicy.decide`
+throughput is reported as a baseline.
+
+Run: `python -m benchmarks.sidecar [--batch 256] [--pipeline 8]`.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from orwynn_rbac.models import PolicyRoute, PolicySnapshot
+from orwynn_rbac.policy import CompiledPolicy
+from orwynn_rbac.sidecar import (
+    AccessCheck,
+    DecisionClient,
+    DecisionServer,
+    load_policy,
+)
+
+
+def create_policy(
+    *,
+    controllers: int,
+    roles: int,
+    users: int,
+    seed: int = 0,
+) -> CompiledPolicy:
+    rnd: random.Random = random.Random(seed)
+    permission_names: list[str] = [
+        f"bench.permission.resource-{i}:get" for i in range(controllers)
+    ]
+
+    return CompiledPolicy(PolicySnapshot(
+        routes=[
+            PolicyRoute(
+                abstract_routes=[f"/resources-{i}/{{id}}"],
+                permission_names={"get": permission_names[i], "post": None},
+            )
+            for i in range(controllers)
+        ],
+        permission_names_by_role_id={
+            f"role-{i}": rnd.sample(
+                permission_names, min(len(permission_names), 20),
+            )
+            for i in range(roles)
+        },
+        role_ids_by_user_id={
+            f"user-{i}": [f"role-{rnd.randrange(roles)}" for _ in range(3)]
+            for i in range(users)
+        },
+        unauthorized_permission_names=[],
+        authorized_permission_names=permission_names[:1],
+    ))
+
+
+def create_checks(
+    amount: int,
+    *,
+    controllers: int,
+    users: int,
+    seed: int = 1,
+) -> list[AccessCheck]:
+    rnd: random.Random = random.Random(seed)
+    return [
+        (
+            f"user-{rnd.randrange(users)}",
+            f"/resources-{rnd.randrange(controllers)}/{rnd.randrange(1000)}",
+            "get",
+        )
+        for _ in range(amount)
+    ]
+
+
+def _serve(policy_path: str, socket_path: str) -> None:
+    async def run() -> None:
+        await DecisionServer(
+            load_policy(policy_path),
+            socket_path,
+        ).serve_forever()
+
+    asyncio.run(run())
+
+
+async def _measure_sidecar(
+    socket_path: str,
+    checks: list[AccessCheck],
+    *,
+    batch: int,
+    pipeline: int,
+    duration: float,
+) -> float:
+    batches: list[list[AccessCheck]] = [
+        checks[i:i + batch] for i in range(0, len(checks), batch)
+    ]
+    decided: int = 0
+
+    async with DecisionClient(socket_path) as client:
+        finish_at: float = time.perf_counter() + duration
+        started_at: float = time.perf_counter()
+        i: int = 0
+
+        while time.perf_counter() < finish_at:
+            chunk: list[list[AccessCheck]] = [
+                batches[(i + j) % len(batches)] for j in range(pipeline)
+            ]
+            i += pipeline
+            results = await asyncio.gather(
+                *(client.check_many(b) for b in chunk),
+            )
+            decided += sum(len(r) for r in results)
+
+        return decided / (time.perf_counter() - started_at)
+
+
+def _measure_in_process(
+    policy: CompiledPolicy,
+    checks: list[AccessCheck],
+    *,
+    duration: float,
+) -> float:
+    decided: int = 0
+    finish_at: float = time.perf_counter() + duration
+    started_at: float = time.perf_counter()
+
+    while time.perf_counter() < finish_at:
+        for check in checks:
+            policy.decide(*check)
+        decided += len(checks)
+
+    return decided / (time.perf_counter() - started_at)
+
+
+async def _wait_for_socket(path: str, timeout: float = 10.0) -> None:
+    finish_at: float = time.perf_counter() + timeout
+    while not Path(path).exists():
+        if time.perf_counter() > finish_at:
+            raise TimeoutError(path)
+        await asyncio.sleep(0.05)
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Orwynn RBAC Sidecar Benchmark",
+    )
+    parser.add_argument("--controllers", type=int, default=200)
+    parser.add_argument("--roles", type=int, default=100)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--pipeline", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0)
+    namespace: argparse.Namespace = parser.parse_args()
+
+    policy: CompiledPolicy = create_policy(
+        controllers=namespace.controllers,
+        roles=namespace.roles,
+        users=namespace.users,
+    )
+    checks: list[AccessCheck] = create_checks(
+        namespace.batch * namespace.pipeline * 4,
+        controllers=namespace.controllers,
+        users=namespace.users,
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        policy_path: str = str(Path(directory, "policy.json"))
+        socket_path: str = str(Path(directory, "rbac.sock"))
+        Path(policy_path).write_text(policy.snapshot.json())
+
+        server: multiprocessing.Process = multiprocessing.Process(
+            target=_serve, args=(policy_path, socket_path), daemon=True,
+        )
+        server.start()
+        try:
+            asyncio.run(_wait_for_socket(socket_path))
+            sidecar_rate: float = asyncio.run(_measure_sidecar(
+                socket_path,
+                checks,
+                batch=namespace.batch,
+                pipeline=namespace.pipeline,
+                duration=namespace.duration,
+            ))
+        finally:
+            server.terminate()
+            server.join()
+
+    print(json.dumps({  # noqa: T201
+        "benchmark": "sidecar",
+        "params": vars(namespace),
+        "sidecar_decisions_per_second_per_core": round(sidecar_rate),
+        "in_process_decisions_per_second": round(_measure_in_process(
+            policy, checks, duration=namespace.duration,
+        )),
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,23 @@
 from orwynn_rbac.testing import (
+    access_service,
     app,
     client,
     do_buy_item_permission_id,
+    event_loop,
     get_item_permission_id,
     main_boot,
     permission_id_1,
     permission_id_2,
     permission_id_3,
     permission_service,
+    query_plan_recorder,
+    rbac_baseline,
     role_id_1,
     role_id_2,
     role_service,
+    run_around_tests,
+    session_boot,
+    synthetic_dataset,
     update_item_permission_id,
     user_client_1,
     user_client_2,
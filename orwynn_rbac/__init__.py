@@ -2,21 +2,49 @@ from orwynn import mongo
 from orwynn.module import Module
 
 from orwynn_rbac.controllers import (
+    ExplainController,
+    MetricsController,
     PermissionsController,
+    ProfilerController,
+    ProfilerStacksController,
     RolesController,
     RolesIDController,
 )
 from orwynn_rbac.documents import Permission, Role
-from orwynn_rbac.models import HTTPAction
+from orwynn_rbac.instrumentation import count_queries
+from orwynn_rbac.middleware import AccessMiddleware, get_access_context
+from orwynn_rbac.models import AccessContext, HTTPAction
+from orwynn_rbac.resolvers import (
+    ClaimsRoleResolver,
+    CombinedRoleResolver,
+    RoleResolver,
+    StorageRoleResolver,
+)
 from orwynn_rbac.services import AccessService, PermissionService, RoleService
+from orwynn_rbac.storage import (
+    MemoryRBACStorage,
+    MongoRBACStorage,
+    RBACStorage,
+)
 
 __all__ = [
     "Permission",
     "HTTPAction",
+    "AccessContext",
+    "AccessMiddleware",
+    "get_access_context",
     "Role",
     "PermissionService",
     "AccessService",
     "RoleService",
+    "RBACStorage",
+    "MongoRBACStorage",
+    "MemoryRBACStorage",
+    "RoleResolver",
+    "StorageRoleResolver",
+    "ClaimsRoleResolver",
+    "CombinedRoleResolver",
+    "count_queries",
 ]
 
 module = Module(
@@ -24,7 +52,15 @@ module = Module(
     Providers=[
         PermissionService, RoleService, AccessService,
     ],
-    Controllers=[RolesController, RolesIDController, PermissionsController],
+    Controllers=[
+        RolesController,
+        RolesIDController,
+        PermissionsController,
+        MetricsController,
+        ExplainController,
+        ProfilerController,
+        ProfilerStacksController,
+    ],
     imports=[mongo.module],
     exports=[PermissionService, RoleService, AccessService],
 )
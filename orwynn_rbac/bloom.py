@@ -0,0 +1,54 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Probabilistic set of strings.
+
+    Membership check never gives a false negative, but may give a false
+    positive with the configured probability when the filter holds no more
+    than `capacity` items. Items cannot be removed.
+
+    Args:
+        capacity:
+            Expected amount of items.
+        error_rate(optional):
+            Probability of a false positive for the expected amount of items.
+    """
+    def __init__(
+        self,
+        capacity: int,
+        error_rate: float = 0.01,
+    ) -> None:
+        capacity = max(capacity, 1)
+
+        self._bit_count: int = max(
+            math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2),
+            8,
+        )
+        self._hash_count: int = max(
+            round(self._bit_count / capacity * math.log(2)), 1,
+        )
+        self._bits: bytearray = bytearray(math.ceil(self._bit_count / 8))
+
+    def add(self, item: str) -> None:
+        for position in self._get_positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._get_positions(item)
+        )
+
+    def _get_positions(self, item: str) -> list[int]:
+        # double hashing of two independent 64-bit halves of one digest
+        digest: bytes = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first: int = int.from_bytes(digest[:8], "little")
+        second: int = int.from_bytes(digest[8:], "little") | 1
+
+        return [
+            (first + i * second) % self._bit_count
+            for i in range(self._hash_count)
+        ]
@@ -1,27 +1,66 @@
+import time
 from typing import TYPE_CHECKING
 
 from orwynn.bootscript import Bootscript, CallTime
 from orwynn.di.di import Di
 from orwynn.log import Log
 from orwynn.mongo import MongoStateFlagService
+from pykit.errors import NotFoundError
 from pykit.func import FuncSpec
 
 from orwynn_rbac.constants import RoleBootStateFlagName
-from orwynn_rbac.models import DefaultRole
-from orwynn_rbac.services import PermissionService, RoleService
+from orwynn_rbac.models import (
+    DefaultRole,
+    DefaultRolesReport,
+    PermissionSyncReport,
+)
+from orwynn_rbac.resolvers import RoleResolver
+from orwynn_rbac.search import RoleSearch
+from orwynn_rbac.services import AccessService, PermissionService, RoleService
+from orwynn_rbac.storage import RBACStorage
+from orwynn_rbac.tracing import SpanExporter, span, use_span_exporter
 
 if TYPE_CHECKING:
     from orwynn_rbac.documents import Role
 
 
 class RBACBoot:
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         *,
         default_roles: list[DefaultRole] | None = None,
         unauthorized_user_permissions: list[str] | None = None,
         authorized_user_permissions: list[str] | None = None,
+        storage: RBACStorage | None = None,
+        token_key: bytes | None = None,
+        role_resolver: RoleResolver | None = None,
+        reconcile_default_roles: bool = False,
+        span_exporter: SpanExporter | None = None,
     ) -> None:
+        """
+        Args:
+            storage(optional):
+                Storage backend to be used by all RBAC services. Defaults to
+                Mongo storage.
+            token_key(optional):
+                Key to sign permission tokens with. Permission tokens are
+                disabled by default.
+            role_resolver(optional):
+                Resolver of user roles for `AccessService.check_subject`.
+                Defaults to the resolver taking roles from the storage.
+            reconcile_default_roles(optional):
+                Whether to make stored roles match default ones on every
+                boot, see `RoleService.reconcile_defaults`. By default,
+                default roles are only created for a fresh database.
+            span_exporter(optional):
+                Exporter of tracing spans of the RBAC services, see
+                `tracing.use_span_exporter`. Tracing is disabled by default.
+        """
+        self._storage: RBACStorage | None = storage
+        self._token_key: bytes | None = token_key
+        self._role_resolver: RoleResolver | None = role_resolver
+        self._reconcile_default_roles: bool = reconcile_default_roles
+        self._span_exporter: SpanExporter | None = span_exporter
         self._default_roles: list[DefaultRole] | None = default_roles
         self._unauthorized_user_permissions: list[str] | None = \
             unauthorized_user_permissions
@@ -38,6 +77,7 @@ class RBACBoot:
         self,
         role_service: RoleService,
         permission_service: PermissionService,
+        access_service: AccessService,
         mongo_state_flag_service: MongoStateFlagService,
     ) -> None:
         """
@@ -47,43 +87,114 @@ class RBACBoot:
         initialized controllers in order to boot correct permissions. For
         unaffected databases it will initialize default roles.
         """
-        # Initialize permissions in any case since they should be calculated
-        # dynamically for each boot.
-        deleted_permission_ids: set[str]
-        _, deleted_permission_ids = \
-            permission_service._init_internal(  # noqa: SLF001
-                controllers=Di.ie().controllers,
+        if self._storage is not None:
+            access_service.use_storage(self._storage)
+        if self._token_key is not None:
+            access_service.use_token_key(self._token_key)
+        if self._role_resolver is not None:
+            access_service.use_role_resolver(self._role_resolver)
+        if self._span_exporter is not None:
+            use_span_exporter(self._span_exporter)
+
+        # legacy documents are migrated before the first typed read, which
+        # would fail on them
+        migrated_count: int = role_service.storage.migrate()
+        if migrated_count:
+            Log.info(
+                f"[orwynn_rbac] {migrated_count} legacy documents migrated",
             )
+        role_service.storage.ensure_indexes()
 
-        if self._default_roles:
-            initialized_roles: list[Role] | None = \
-                mongo_state_flag_service.decide(
-                    key=RoleBootStateFlagName,
-                    on_false=FuncSpec(
-                        func=role_service._init_defaults_internal, # noqa: SLF001
-                        args=(
-                            self._default_roles,
-                            self._unauthorized_user_permissions,
-                            self._authorized_user_permissions,
-                        ),
-                    ),
-                    finally_set_to=True,
-                    default_flag_on_not_found=False,
+        # Initialize permissions in any case since they should be calculated
+        # dynamically for each boot.
+        sync_started_at: float = time.perf_counter()
+        with span("rbac.boot.permissions_sync"):
+            sync_report: PermissionSyncReport = \
+                permission_service._init_internal(  # noqa: SLF001
+                    controllers=Di.ie().controllers,
                 )
+        access_service.metrics.record_boot_sync(
+            time.perf_counter() - sync_started_at, sync_report,
+        )
+        if sync_report.is_changed:
+            Log.info(
+                "[orwynn_rbac] permissions synced:"
+                f" {len(sync_report.created_ids)} created,"
+                f" {len(sync_report.updated_ids)} updated,"
+                f" {len(sync_report.deleted_ids)} deleted",
+            )
 
-            if initialized_roles:
-                role_names: str = ", ".join(
-                    [r.name for r in initialized_roles],
-                )
-                Log.info(
-                    f"[orwynn_rbac] default roles initialized: {role_names}",
-                )
+        if self._default_roles and self._reconcile_default_roles:
+            self._reconcile_defaults(role_service)
+        elif self._default_roles:
+            self._init_default_roles(role_service, mongo_state_flag_service)
 
-        if deleted_permission_ids:
+        if sync_report.deleted_ids:
             Log.info(
                 "[orwynn_rbac] schedule permissions for delete: "
-                + ", ".join(deleted_permission_ids),
+                + ", ".join(sync_report.deleted_ids),
+            )
+            role_service._unlink_internal(  # noqa: SLF001
+                sync_report.deleted_ids,
+            )
+
+        # warm up the filter, so first checks do not wait for its build
+        role_service.rebuild_members_filter()
+
+    def _reconcile_defaults(
+        self,
+        role_service: RoleService,
+    ) -> None:
+        report: DefaultRolesReport = role_service.reconcile_defaults(
+            self._default_roles or [],
+            self._unauthorized_user_permissions,
+            self._authorized_user_permissions,
+        )
+
+        if report.is_changed:
+            Log.info(
+                "[orwynn_rbac] default roles reconciled: "
+                + ", ".join([c.name for c in report.changes]),
+            )
+
+    def _init_default_roles(
+        self,
+        role_service: RoleService,
+        mongo_state_flag_service: MongoStateFlagService,
+    ) -> None:
+        init_defaults: FuncSpec = FuncSpec(
+            func=role_service._init_defaults_internal, # noqa: SLF001
+            args=(
+                self._default_roles,
+                self._unauthorized_user_permissions,
+                self._authorized_user_permissions,
+            ),
+        )
+        initialized_roles: list[Role] | None
+
+        if self._storage is None:
+            initialized_roles = mongo_state_flag_service.decide(
+                key=RoleBootStateFlagName,
+                on_false=init_defaults,
+                finally_set_to=True,
+                default_flag_on_not_found=False,
+            )
+        else:
+            # custom storages have no state flags, so the storage is
+            # considered fresh until it has builtin dynamic roles
+            try:
+                role_service.get(RoleSearch(
+                    names=["dynamic:unauthorized"],
+                ))
+            except NotFoundError:
+                initialized_roles = init_defaults.call()
+            else:
+                initialized_roles = None
+
+        if initialized_roles:
+            role_names: str = ", ".join(
+                [r.name for r in initialized_roles],
+            )
+            Log.info(
+                f"[orwynn_rbac] default roles initialized: {role_names}",
             )
-            role_service._unlink_internal(list(  # noqa: SLF001
-                deleted_permission_ids,
-            ))
@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Generic, TypeVar
+
+from orwynn.model import Model
+
+TKey = TypeVar("TKey", bound=Hashable)
+TValue = TypeVar("TValue")
+
+
+class CacheStats(Model):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+
+
+class TTLCache(Generic[TKey, TValue]):
+    """
+    Bounded LRU cache which entries expire after a time-to-live.
+
+    Args:
+        maxsize:
+            Maximum amount of entries. The least recently used entry is
+            evicted on overflow.
+        ttl(optional):
+            Seconds an entry lives after it has been set. Entries never
+            expire by default.
+        clock(optional):
+            Function returning current time in seconds. Defaults to
+            `time.monotonic`.
+    """
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._maxsize: int = maxsize
+        self._ttl: float | None = ttl
+        self._clock: Callable[[], float] = clock
+
+        self._lock: threading.Lock = threading.Lock()
+        self._entries: OrderedDict[TKey, tuple[float | None, TValue]] = \
+            OrderedDict()
+
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize
+
+    @property
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+            size=len(self._entries),
+        )
+
+    def get(self, key: TKey) -> tuple[bool, TValue | None]:
+        """
+        Returns:
+            Flag whether the key is found and the found value.
+        """
+        with self._lock:
+            entry: tuple[float | None, TValue] | None = \
+                self._entries.get(key)
+
+            if entry is None:
+                self._misses += 1
+                return False, None
+
+            if entry[0] is not None and entry[0] <= self._clock():
+                del self._entries[key]
+                self._misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return True, entry[1]
+
+    def set(self, key: TKey, value: TValue) -> None:
+        if self._maxsize <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (
+                None if self._ttl is None else self._clock() + self._ttl,
+                value,
+            )
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
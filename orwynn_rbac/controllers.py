@@ -1,10 +1,20 @@
 from fastapi import Query
-from orwynn.http import Endpoint, EndpointResponse, HttpController
+from orwynn.http import (
+    Endpoint,
+    EndpointResponse,
+    HttpController,
+    HttpResponse,
+)
 
 from orwynn_rbac.dtos import PermissionCDTO, RoleCDTO, RoleUDTO
-from orwynn_rbac.models import RoleCreateMany
+from orwynn_rbac.models import AccessExplanation, RoleCreateMany
+from orwynn_rbac.profiler import ProfilerConfig, ProfilerStatus
 from orwynn_rbac.search import PermissionSearch, RoleSearch
-from orwynn_rbac.services import PermissionService, RoleService
+from orwynn_rbac.services import (
+    AccessService,
+    PermissionService,
+    RoleService,
+)
 from orwynn_rbac.utils import BaseUpdateOperator, UpdateOperator
 
 
@@ -165,3 +175,170 @@ class RolesIDController(HttpController):
         return self._sv.patch_one_udto(
             UpdateOperator.from_base(id, base_update_operator),
         ).api
+
+
+class MetricsController(HttpController):
+    """
+    Exposes metrics of the RBAC module in the Prometheus text format.
+    """
+    Route = "/metrics"
+    Endpoints = [
+        Endpoint(
+            method="get",
+            tags=["rbac"],
+        ),
+    ]
+    Permissions = {
+        "get": "slimebones.orwynn-rbac.metrics.permission.metrics:get",
+    }
+
+    def __init__(
+        self,
+        sv: AccessService,
+    ) -> None:
+        super().__init__()
+        self._sv: AccessService = sv
+
+    def get(self) -> HttpResponse:
+        return HttpResponse(
+            content=self._sv.metrics.render(),
+            media_type="text/plain; version=0.0.4",
+        )
+
+
+class ExplainController(HttpController):
+    """
+    Explains how an access decision is made for a user, route and method.
+    """
+    Route = "/explain"
+    Endpoints = [
+        Endpoint(
+            method="get",
+            tags=["rbac"],
+            responses=[
+                EndpointResponse(
+                    status_code=200,
+                    Entity=AccessExplanation,
+                ),
+            ],
+        ),
+    ]
+    Permissions = {
+        "get": "slimebones.orwynn-rbac.explain.permission.explain:get",
+    }
+
+    def __init__(
+        self,
+        sv: AccessService,
+    ) -> None:
+        super().__init__()
+        self._sv: AccessService = sv
+
+    def get(
+        self,
+        route: str,
+        method: str,
+        user_id: str | None = Query(None),
+    ) -> dict:
+        return self._sv.explain(user_id, route, method).api
+
+
+class ProfilerController(HttpController):
+    """
+    Controls the access check profiler at runtime.
+    """
+    Route = "/profiler"
+    Endpoints = [
+        Endpoint(
+            method="get",
+            tags=["rbac"],
+            responses=[
+                EndpointResponse(
+                    status_code=200,
+                    Entity=ProfilerStatus,
+                ),
+            ],
+        ),
+        Endpoint(
+            method="post",
+            tags=["rbac"],
+            responses=[
+                EndpointResponse(
+                    status_code=200,
+                    Entity=ProfilerStatus,
+                ),
+            ],
+        ),
+        Endpoint(
+            method="delete",
+            tags=["rbac"],
+            responses=[
+                EndpointResponse(
+                    status_code=200,
+                    Entity=ProfilerStatus,
+                ),
+            ],
+        ),
+    ]
+    Permissions = {
+        "get": "slimebones.orwynn-rbac.profiler.permission.profiler:get",
+        "post": "slimebones.orwynn-rbac.profiler.permission.profiler:update",
+        "delete": "slimebones.orwynn-rbac.profiler.permission.profiler:delete",
+    }
+
+    def __init__(
+        self,
+        sv: AccessService,
+    ) -> None:
+        super().__init__()
+        self._sv: AccessService = sv
+
+    def get(self) -> dict:
+        return self._sv.profiler.status.api
+
+    def post(self, config: ProfilerConfig) -> dict:
+        self._sv.profiler.enable(config)
+        return self._sv.profiler.status.api
+
+    def delete(self) -> dict:
+        self._sv.profiler.disable()
+        return self._sv.profiler.status.api
+
+
+class ProfilerStacksController(HttpController):
+    """
+    Returns stacks collected by the access check profiler in the collapsed
+    format accepted by flamegraph tools.
+    """
+    Route = "/profiler/stacks"
+    Endpoints = [
+        Endpoint(
+            method="get",
+            tags=["rbac"],
+        ),
+        Endpoint(
+            method="delete",
+            tags=["rbac"],
+        ),
+    ]
+    Permissions = {
+        "get": "slimebones.orwynn-rbac.profiler.permission.stacks:get",
+        "delete": "slimebones.orwynn-rbac.profiler.permission.stacks:delete",
+    }
+
+    def __init__(
+        self,
+        sv: AccessService,
+    ) -> None:
+        super().__init__()
+        self._sv: AccessService = sv
+
+    def get(self) -> HttpResponse:
+        return HttpResponse(
+            content=self._sv.profiler.get_collapsed_stacks(),
+            media_type="text/plain",
+        )
+
+    def delete(self) -> dict:
+        self._sv.profiler.clear()
+        return self._sv.profiler.status.api
@@ -17,3 +17,17 @@ class PermissionAbstractAction(Enum):
     Update = "update"
     Delete = "delete"
     Do = "do"
+
+
+class AccessDecision(Enum):
+    """
+    Outcome of an access check.
+
+    Items:
+        Allowed: the user has an access to the route and method
+        Forbidden: the user has no access to the route and method
+        RouteNotFound: no controller is registered for the route and method
+    """
+    Allowed = "allowed"
+    Forbidden = "forbidden"
+    RouteNotFound = "route-not-found"
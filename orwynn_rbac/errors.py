@@ -113,3 +113,39 @@ class NonDynamicPermissionError(Exception):
             f"permission with name <{permission_name}> should be dynamic in" \
             f" order to {in_order_to}"
         super().__init__(message)
+
+
+class InvalidPermissionTokenError(Exception):
+    """
+    Permission token is malformed, has a wrong signature or is expired.
+    """
+    def __init__(
+        self,
+        *,
+        explanation: str,
+    ) -> None:
+        message: str = f"invalid permission token: {explanation}"
+        super().__init__(message)
+
+
+class PermissionTokenKeyNotSetError(Exception):
+    """
+    Permission tokens are used without a signing key set.
+    """
+    def __init__(self) -> None:
+        message: str = \
+            "permission token key is not set, pass it to the RBACBoot"
+        super().__init__(message)
+
+
+class MalformedSidecarFrameError(Exception):
+    """
+    Frame received by the decision sidecar or its client cannot be decoded.
+    """
+    def __init__(
+        self,
+        *,
+        explanation: str,
+    ) -> None:
+        message: str = f"malformed sidecar frame: {explanation}"
+        super().__init__(message)
@@ -0,0 +1,200 @@
+import functools
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Iterator, TypeVar
+
+from orwynn.model import Model
+from pykit.errors import NotFoundError
+
+from orwynn_rbac.tracing import span
+
+TFunc = TypeVar("TFunc", bound=Callable[..., Any])
+
+# upper bounds of latency histogram buckets in seconds
+LatencyBuckets: list[float] = [
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+]
+
+
+class OperationStats(Model):
+    """
+    Statistics of one storage operation.
+
+    Attributes:
+        count:
+            Amount of made operations.
+        error_count:
+            Amount of failed operations. Not found results are not counted
+            as failures.
+        seconds:
+            Total duration of all operations.
+        bucket_counts:
+            Amount of operations lasted no longer than each of the
+            `LatencyBuckets` bounds, so the counts are cumulative.
+    """
+    count: int
+    error_count: int
+    seconds: float
+    bucket_counts: list[int]
+
+
+class QueryStats(Model):
+    """
+    Statistics of storage operations by their names.
+    """
+    operations: dict[str, OperationStats]
+
+    @property
+    def total(self) -> int:
+        return sum(o.count for o in self.operations.values())
+
+
+class QueryCounter:
+    """
+    Counts storage operations made within a `count_queries` scope.
+    """
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self._counts: Counter[str] = Counter()
+
+    @property
+    def counts(self) -> dict[str, int]:
+        """
+        Amounts of made operations by their names.
+        """
+        with self._lock:
+            return dict(self._counts)
+
+    @property
+    def total(self) -> int:
+        with self._lock:
+            return sum(self._counts.values())
+
+    def add(self, operation: str) -> None:
+        with self._lock:
+            self._counts[operation] += 1
+
+
+_QueryCountersVar: ContextVar[tuple[QueryCounter, ...]] = ContextVar(
+    "orwynn_rbac_query_counters",
+    default=(),
+)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """
+    Counts storage operations made in the current context.
+
+    Operations made by other requests are not counted, while ones made in
+    threads started with `asyncio.to_thread` are. Scopes can be nested.
+
+    Example:
+    ```python
+    with count_queries() as counter:
+        access_service.check_user(user_id, "/items", "get")
+    assert counter.total <= 2
+    ```
+    """
+    counter: QueryCounter = QueryCounter()
+    token: Token = _QueryCountersVar.set(
+        (*_QueryCountersVar.get(), counter),
+    )
+    try:
+        yield counter
+    finally:
+        _QueryCountersVar.reset(token)
+
+
+class _OperationRecord:
+    __slots__ = ("count", "error_count", "seconds", "bucket_counts")
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.error_count: int = 0
+        self.seconds: float = 0.0
+        self.bucket_counts: list[int] = [0] * len(LatencyBuckets)
+
+
+class QueryInstrumentation:
+    """
+    Collects counters and latency histograms of storage operations.
+    """
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self._records: dict[str, _OperationRecord] = {}
+
+    @property
+    def stats(self) -> QueryStats:
+        with self._lock:
+            return QueryStats(operations={
+                name: OperationStats(
+                    count=r.count,
+                    error_count=r.error_count,
+                    seconds=r.seconds,
+                    bucket_counts=list(r.bucket_counts),
+                )
+                for name, r in self._records.items()
+            })
+
+    def record(
+        self,
+        operation: str,
+        seconds: float,
+        *,
+        is_failed: bool = False,
+    ) -> None:
+        for counter in _QueryCountersVar.get():
+            counter.add(operation)
+
+        with self._lock:
+            record: _OperationRecord | None = self._records.get(operation)
+            if record is None:
+                record = _OperationRecord()
+                self._records[operation] = record
+
+            record.count += 1
+            record.seconds += seconds
+            if is_failed:
+                record.error_count += 1
+            for i, bound in enumerate(LatencyBuckets):
+                if seconds <= bound:
+                    record.bucket_counts[i] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+
+def instrumented(method: TFunc) -> TFunc:
+    """
+    Records calls of a storage method to the storage's instrumentation and
+    traces them.
+    """
+    operation: str = method.__name__
+    span_name: str = f"rbac.storage.{operation}"
+
+    @functools.wraps(method)
+    def wrapped(self: Any, *args: Any, **kwargs: Any) -> Any:
+        is_failed: bool = False
+        started_at: float = time.perf_counter()
+        try:
+            with span(span_name):
+                return method(self, *args, **kwargs)
+        except NotFoundError:
+            raise
+        except Exception:
+            is_failed = True
+            raise
+        finally:
+            self.instrumentation.record(
+                operation,
+                time.perf_counter() - started_at,
+                is_failed=is_failed,
+            )
+
+    return wrapped  # type: ignore
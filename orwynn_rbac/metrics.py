@@ -0,0 +1,295 @@
+import threading
+from collections.abc import Callable, Iterator
+
+from orwynn_rbac.cache import CacheStats
+from orwynn_rbac.enums import AccessDecision
+from orwynn_rbac.instrumentation import LatencyBuckets, QueryStats
+from orwynn_rbac.models import PermissionSyncReport
+
+# upper bounds of access check latency histogram buckets in seconds
+CheckLatencyBuckets: list[float] = [
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0,
+]
+MetricPrefix: str = "orwynn_rbac"
+
+_Decisions: list[AccessDecision] = list(AccessDecision)
+_DecisionSlots: dict[AccessDecision, int] = {
+    decision: slot for slot, decision in enumerate(_Decisions)
+}
+_BucketsSlot: int = len(_Decisions)
+_CountSlot: int = _BucketsSlot + len(CheckLatencyBuckets)
+_SecondsSlot: int = _CountSlot + 1
+_SlotCount: int = _SecondsSlot + 1
+
+
+class ShardedCounters:
+    """
+    Fixed amount of numeric slots incremented without locks.
+
+    Every thread increments its own shard, and shards are summed on read, so
+    concurrent writers never contend and no increment is lost.
+
+    Args:
+        size:
+            Amount of slots.
+    """
+    def __init__(
+        self,
+        size: int,
+    ) -> None:
+        self._size: int = size
+        self._local: threading.local = threading.local()
+        # shards of finished threads are kept, so sums never decrease
+        self._shards: list[list[float]] = []
+
+    def add(self, slot: int, value: float = 1) -> None:
+        shard: list[float] | None = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = [0] * self._size
+            self._local.shard = shard
+            # appending to a list is atomic
+            self._shards.append(shard)
+        shard[slot] += value
+
+    def sum(self) -> list[float]:
+        result: list[float] = [0] * self._size
+        for shard in list(self._shards):
+            for slot, value in enumerate(shard):
+                result[slot] += value
+        return result
+
+
+class RBACMetrics:
+    """
+    Collects metrics of access checks, caches and boot of the RBAC module and
+    renders them in the Prometheus text format.
+
+    Attributes:
+        boot_sync_seconds:
+            Duration of the last permissions sync made on boot.
+        boot_sync_report:
+            Report of the last permissions sync made on boot.
+    """
+    def __init__(self) -> None:
+        self._counters: ShardedCounters = ShardedCounters(_SlotCount)
+        self._caches: dict[str, Callable[[], CacheStats]] = {}
+        self._gauges: dict[str, tuple[str, Callable[[], float | None]]] = {}
+        self._query_stats: Callable[[], QueryStats] | None = None
+
+        self.boot_sync_seconds: float | None = None
+        self.boot_sync_report: PermissionSyncReport | None = None
+
+    def record_decision(
+        self,
+        decision: AccessDecision,
+        seconds: float | None = None,
+    ) -> None:
+        """
+        Records an access decision and, if given, duration of the check made
+        it.
+        """
+        counters: ShardedCounters = self._counters
+        counters.add(_DecisionSlots[decision])
+
+        if seconds is None:
+            return
+        counters.add(_CountSlot)
+        counters.add(_SecondsSlot, seconds)
+        # buckets are summed into cumulative ones on render
+        for i, bound in enumerate(CheckLatencyBuckets):
+            if seconds <= bound:
+                counters.add(_BucketsSlot + i)
+                break
+
+    def record_boot_sync(
+        self,
+        seconds: float,
+        report: PermissionSyncReport,
+    ) -> None:
+        self.boot_sync_seconds = seconds
+        self.boot_sync_report = report
+
+    def add_cache(
+        self,
+        name: str,
+        get_stats: Callable[[], CacheStats],
+    ) -> None:
+        """
+        Adds a cache which stats are rendered with the given name.
+        """
+        self._caches[name] = get_stats
+
+    def add_gauge(
+        self,
+        name: str,
+        description: str,
+        get_value: Callable[[], float | None],
+    ) -> None:
+        """
+        Adds a gauge which value is taken on render. None values are not
+        rendered.
+        """
+        self._gauges[name] = (description, get_value)
+
+    def use_query_stats(self, get_stats: Callable[[], QueryStats]) -> None:
+        self._query_stats = get_stats
+
+    def get_decision_counts(self) -> dict[AccessDecision, int]:
+        sums: list[float] = self._counters.sum()
+        return {
+            decision: int(sums[slot])
+            for decision, slot in _DecisionSlots.items()
+        }
+
+    def render(self) -> str:
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        return "".join(
+            line + "\n"
+            for line in (
+                *self._render_checks(),
+                *self._render_caches(),
+                *self._render_gauges(),
+                *self._render_boot(),
+                *self._render_queries(),
+            )
+        )
+
+    def _render_checks(self) -> Iterator[str]:
+        sums: list[float] = self._counters.sum()
+
+        yield from _header(
+            "decisions_total", "counter", "Access decisions by outcome.",
+        )
+        for decision, slot in _DecisionSlots.items():
+            yield _sample(
+                "decisions_total",
+                int(sums[slot]),
+                outcome=decision.value,
+            )
+
+        yield from _header(
+            "check_duration_seconds",
+            "histogram",
+            "Duration of single access checks.",
+        )
+        cumulative: int = 0
+        for i, bound in enumerate(CheckLatencyBuckets):
+            cumulative += int(sums[_BucketsSlot + i])
+            yield _sample(
+                "check_duration_seconds_bucket", cumulative, le=str(bound),
+            )
+        yield _sample(
+            "check_duration_seconds_bucket", int(sums[_CountSlot]), le="+Inf",
+        )
+        yield _sample("check_duration_seconds_sum", sums[_SecondsSlot])
+        yield _sample("check_duration_seconds_count", int(sums[_CountSlot]))
+
+    def _render_caches(self) -> Iterator[str]:
+        stats_by_name: dict[str, CacheStats] = {
+            name: get_stats() for name, get_stats in self._caches.items()
+        }
+
+        for field, kind, description in (
+            ("hits", "counter", "Cache hits."),
+            ("misses", "counter", "Cache misses."),
+            ("evictions", "counter", "Entries evicted on cache overflow."),
+            ("size", "gauge", "Current amount of cache entries."),
+        ):
+            name: str = \
+                f"cache_{field}" + ("_total" if kind == "counter" else "")
+            yield from _header(name, kind, description)
+            for cache, stats in stats_by_name.items():
+                yield _sample(name, getattr(stats, field), cache=cache)
+
+    def _render_gauges(self) -> Iterator[str]:
+        for name, (description, get_value) in self._gauges.items():
+            value: float | None = get_value()
+            if value is None:
+                continue
+            yield from _header(name, "gauge", description)
+            yield _sample(name, value)
+
+    def _render_boot(self) -> Iterator[str]:
+        if self.boot_sync_seconds is not None:
+            yield from _header(
+                "boot_sync_duration_seconds",
+                "gauge",
+                "Duration of the last permissions sync made on boot.",
+            )
+            yield _sample("boot_sync_duration_seconds", self.boot_sync_seconds)
+
+        report: PermissionSyncReport | None = self.boot_sync_report
+        if report is not None:
+            yield from _header(
+                "boot_sync_writes",
+                "gauge",
+                "Permissions written by the last sync made on boot.",
+            )
+            for kind, ids in (
+                ("created", report.created_ids),
+                ("updated", report.updated_ids),
+                ("deleted", report.deleted_ids),
+            ):
+                yield _sample("boot_sync_writes", len(ids), kind=kind)
+
+    def _render_queries(self) -> Iterator[str]:
+        if self._query_stats is None:
+            return
+        stats: QueryStats = self._query_stats()
+
+        yield from _header(
+            "storage_operation_errors_total",
+            "counter",
+            "Failed storage operations.",
+        )
+        for operation, o in stats.operations.items():
+            yield _sample(
+                "storage_operation_errors_total",
+                o.error_count,
+                operation=operation,
+            )
+
+        yield from _header(
+            "storage_operation_duration_seconds",
+            "histogram",
+            "Duration of storage operations.",
+        )
+        name: str = "storage_operation_duration_seconds"
+        for operation, o in stats.operations.items():
+            for bound, count in zip(
+                LatencyBuckets, o.bucket_counts, strict=True,
+            ):
+                yield _sample(
+                    f"{name}_bucket",
+                    count,
+                    operation=operation,
+                    le=str(bound),
+                )
+            yield _sample(
+                f"{name}_bucket", o.count, operation=operation, le="+Inf",
+            )
+            yield _sample(f"{name}_sum", o.seconds, operation=operation)
+            yield _sample(f"{name}_count", o.count, operation=operation)
+
+
+def _header(name: str, kind: str, description: str) -> Iterator[str]:
+    yield f"# HELP {MetricPrefix}_{name} {description}"
+    yield f"# TYPE {MetricPrefix}_{name} {kind}"
+
+
+def _sample(name: str, value: float, **labels: str) -> str:
+    rendered_labels: str = ",".join(
+        f"{k}=\"{_escape(v)}\"" for k, v in labels.items()
+    )
+    if rendered_labels:
+        rendered_labels = "{" + rendered_labels + "}"
+    return f"{MetricPrefix}_{name}{rendered_labels} {value}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace(
+        "\n", "\\n",
+    )
@@ -0,0 +1,291 @@
+import asyncio
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from orwynn.http import HttpMiddleware, HttpRequest, HttpResponse
+from pykit.errors import ForbiddenResourceError, NotFoundError
+
+from orwynn_rbac.cache import CacheStats, TTLCache
+from orwynn_rbac.enums import AccessDecision
+from orwynn_rbac.models import AccessContext, RoleSubject
+from orwynn_rbac.services import AccessService
+from orwynn_rbac.utils import RouteUtils
+
+if TYPE_CHECKING:
+    from orwynn_rbac.policy import CompiledPolicy
+
+AccessContextStateAttribute: str = "rbac_access"
+
+T = TypeVar("T")
+
+
+class AccessMiddleware(HttpMiddleware):
+    """
+    Checks an access for every covered request.
+
+    Resolved `AccessContext` is stored on the request state, so the
+    downstream code can get it with `get_access_context(request)` instead of
+    querying user's roles and permissions again.
+
+    Configured by subclassing:
+    ```python
+    class MyAccessMiddleware(AccessMiddleware):
+        PublicRoutes = ["/health", "/docs"]
+        DecisionCacheTTL = 1.0
+
+        def get_user_id(self, request: HttpRequest) -> str | None:
+            return decode_token(request.headers.get("authorization"))
+    ```
+
+    Attributes:
+        UserIdHeader:
+            Header the default `get_user_id` takes the user id from.
+        TokenHeader:
+            Header the default `get_token` takes a permission token from.
+            If a request has a token, it is checked with
+            `AccessService.check_token` instead of the user id. Tokens are not
+            used by default.
+        IsRoleResolved:
+            Whether to check requests with `AccessService.check_subject`,
+            i.e. to take user's roles from the role resolver set for the
+            service and role names given by `get_role_names`.
+        PublicRoutes:
+            Routes bypassing the access check. Format brackets match the rest
+            of the route, same as for `covered_routes`.
+        DecisionCacheSize:
+            Maximum amount of cached decisions per worker. Zero disables the
+            cache.
+        DecisionCacheTTL:
+            Seconds a decision is cached. The whole cache is also dropped on
+            any write to roles or permissions made by this process, while
+            writes made by other processes are seen after the TTL passes.
+        IsCheckedInThread:
+            Whether to run blocking storage calls of the check in a thread
+            instead of the event loop. Can be disabled for in-memory
+            storages.
+    """
+    UserIdHeader: str = "user-id"
+    TokenHeader: str | None = None
+    IsRoleResolved: bool = False
+    PublicRoutes: list[str] = []
+    DecisionCacheSize: int = 8192
+    DecisionCacheTTL: float | None = 5.0
+    IsCheckedInThread: bool = True
+
+    def __init__(
+        self,
+        covered_routes: list[str],
+        access_service: AccessService,
+    ) -> None:
+        super().__init__(covered_routes)
+        self.access_service: AccessService = access_service
+
+        # compiled once instead of on every request as the base middleware
+        # does
+        self._covered_routes_regex = \
+            RouteUtils.compile_middleware_routes_regex(covered_routes)
+        self._public_routes_regex = \
+            RouteUtils.compile_middleware_routes_regex(self.PublicRoutes)
+
+        # forbidden decisions are cached as None
+        self._cache: TTLCache[
+            tuple[str | None, str, str], AccessContext | None,
+        ] = TTLCache(self.DecisionCacheSize, self.DecisionCacheTTL)
+        self._cache_revision: int = access_service.revision
+        access_service.metrics.add_cache(
+            "middleware_decisions", lambda: self._cache.stats,
+        )
+
+    @property
+    def cache_stats(self) -> CacheStats:
+        return self._cache.stats
+
+    def get_user_id(self, request: HttpRequest) -> str | None:
+        """
+        Returns id of the user made the request or None for an unauthorized
+        client.
+        """
+        return request.headers.get(self.UserIdHeader, None)
+
+    def get_token(self, request: HttpRequest) -> str | None:
+        """
+        Returns a permission token minted by `AccessService.mint_token` or
+        None if the request has no token.
+        """
+        if self.TokenHeader is None:
+            return None
+        return request.headers.get(self.TokenHeader, None)
+
+    def get_role_names(self, request: HttpRequest) -> list[str] | None:
+        """
+        Returns names of user's roles supplied with the request, e.g. by
+        claims of an identity provider, or None if no names are supplied.
+
+        Used only if `IsRoleResolved` is set.
+        """
+        return None
+
+    def map_error(self, err: Exception) -> Exception:
+        """
+        Maps an error raised by the access check to the error to be raised
+        from the middleware.
+
+        Returns the given error by default.
+        """
+        return err
+
+    async def dispatch(
+        self,
+        request: HttpRequest,
+        call_next: Callable,
+    ) -> HttpResponse:
+        if not self._covered_routes_regex.fullmatch(request.url.path):
+            return await call_next(request)
+        return await self.process(request, call_next)
+
+    async def process(
+        self,
+        request: HttpRequest,
+        call_next: Callable,
+    ) -> HttpResponse:
+        route: str = request.url.path
+
+        if self._public_routes_regex.fullmatch(route):
+            return await call_next(request)
+
+        # all further checks within the request reuse the resolved access
+        with self.access_service.request_scope():
+            try:
+                context: AccessContext
+                token: str | None = self.get_token(request)
+                if self.IsRoleResolved and token is None:
+                    context = await self.check_subject(request)
+                elif token is None:
+                    context = await self.check(
+                        self.get_user_id(request), route, request.method,
+                    )
+                else:
+                    context = await self._run(
+                        self.access_service.check_token,
+                        token,
+                        route,
+                        request.method,
+                    )
+            except Exception as err:  # noqa: BLE001
+                mapped_err: Exception = self.map_error(err)
+                if mapped_err is err:
+                    raise
+                raise mapped_err from err
+
+            setattr(request.state, AccessContextStateAttribute, context)
+
+            response: HttpResponse = await call_next(request)
+
+        return response
+
+    async def check(
+        self,
+        user_id: str | None,
+        route: str,
+        method: str,
+    ) -> AccessContext:
+        """
+        Checks an access using cached decisions.
+
+        Decisions served from the cache are recorded to the service metrics
+        here, since they never reach `AccessService.check_user`.
+
+        Raises:
+            ForbiddenResourceError:
+                User does not have an access.
+            NotFoundError:
+                No controller found for the route and method.
+        """
+        started_at: float = time.perf_counter()
+        revision: int = self.access_service.revision
+        if revision != self._cache_revision:
+            self._cache.clear()
+            self._cache_revision = revision
+
+        key: tuple[str | None, str, str] = (user_id, route, method)
+        is_found: bool
+        context: AccessContext | None
+        is_found, context = self._cache.get(key)
+
+        if not is_found:
+            context = await self._run(self._check, *key)
+
+            # a decision made concurrently with a write might be stale
+            if self.access_service.revision == revision:
+                self._cache.set(key, context)
+        else:
+            self.access_service.metrics.record_decision(
+                AccessDecision.Forbidden if context is None
+                else AccessDecision.Allowed,
+                time.perf_counter() - started_at,
+            )
+
+        if context is None:
+            raise ForbiddenResourceError(
+                user=user_id,
+                method=method,
+                route=route,
+            )
+
+        return context
+
+    async def check_subject(self, request: HttpRequest) -> AccessContext:
+        role_names: list[str] | None = self.get_role_names(request)
+
+        # the service compiles a stale policy in a thread by itself
+        policy: CompiledPolicy | None = None
+        if not self.IsCheckedInThread:
+            policy = self.access_service.get_compiled_policy()
+
+        return await self.access_service.check_subject(
+            RoleSubject(
+                user_id=self.get_user_id(request),
+                role_names=None if role_names is None else tuple(role_names),
+            ),
+            request.url.path,
+            request.method,
+            policy=policy,
+        )
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        if self.IsCheckedInThread:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    def _check(
+        self,
+        user_id: str | None,
+        route: str,
+        method: str,
+    ) -> AccessContext | None:
+        try:
+            return self.access_service.check_user(user_id, route, method)
+        except ForbiddenResourceError:
+            return None
+
+
+def get_access_context(request: HttpRequest) -> AccessContext:
+    """
+    Returns access context stored by the `AccessMiddleware`.
+
+    Raises:
+        NotFoundError:
+            The request has not been checked by the middleware.
+    """
+    context: AccessContext | None = getattr(
+        request.state, AccessContextStateAttribute, None,
+    )
+
+    if context is None:
+        raise NotFoundError(
+            title="access context for request",
+            value=request.url.path,
+        )
+
+    return context
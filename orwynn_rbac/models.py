@@ -1,5 +1,7 @@
 from orwynn.model import Model
 
+from orwynn_rbac.enums import AccessDecision
+
 
 class DefaultRole(Model):
     """
@@ -28,10 +30,244 @@ class RoleCreateMany(Model):
 class HTTPAction(Model):
     """
     Represents a target route and used method of an action.
+
+    Attributes:
+        controller_key:
+            Stable identifier of the target controller, see
+            `PermissionUtils.get_controller_key`.
+        method:
+            Used method.
     """
-    controller_no: int
+    controller_key: str
     method: str
 
     @property
     def mongovalue(self) -> dict:
         return self.dict()
+
+
+class PermissionSyncReport(Model):
+    """
+    Permission changes made by synchronizing stored permissions with
+    controllers.
+
+    Attributes:
+        created_ids:
+            Ids of added permissions.
+        updated_ids:
+            Ids of permissions which actions have been changed.
+        deleted_ids:
+            Ids of permissions no longer used by any controller.
+        unchanged_ids:
+            Ids of permissions left as they are.
+    """
+    created_ids: list[str]
+    updated_ids: list[str]
+    deleted_ids: list[str]
+    unchanged_ids: list[str]
+
+    @property
+    def is_changed(self) -> bool:
+        return bool(self.created_ids or self.updated_ids or self.deleted_ids)
+
+
+class DefaultRoleChange(Model):
+    """
+    Change of a stored role needed to match its default definition.
+
+    Attributes:
+        name:
+            Name of the role.
+        id:
+            Id of the role. None for a role to be created in a dry run.
+        is_created:
+            Whether the role is missing and should be created.
+        added_permission_names:
+            Names of permissions to be added to the role.
+        removed_permission_names:
+            Names of permissions to be removed from the role. Ids of
+            permissions which no longer exist are given as is.
+        updated_fields:
+            Names of other fields to be overwritten, e.g. "title".
+    """
+    name: str
+    id: str | None = None
+    is_created: bool = False
+    added_permission_names: list[str] = []
+    removed_permission_names: list[str] = []
+    updated_fields: list[str] = []
+
+
+class DefaultRolesReport(Model):
+    """
+    Report of reconciling stored roles with default ones.
+
+    Attributes:
+        changes:
+            Changes of roles differing from their definitions.
+        is_dry_run:
+            Whether the changes have only been computed, but not applied.
+    """
+    changes: list[DefaultRoleChange]
+    is_dry_run: bool
+
+    @property
+    def is_changed(self) -> bool:
+        return bool(self.changes)
+
+
+class PolicyRoute(Model):
+    """
+    Controller's routes and permission names required for each of its
+    methods.
+
+    Method mapped to None is uncovered, i.e. requires "dynamic:uncovered"
+    permission.
+    """
+    abstract_routes: list[str]
+    permission_names: dict[str, str | None]
+    # route of the controller, without any prefixes added by modules
+    route: str = ""
+
+
+class PolicySnapshot(Model):
+    """
+    Serializable state of the compiled access policy.
+
+    Attributes:
+        routes:
+            Controller routes in the order of their registration.
+        permission_names_by_role_id:
+            Permission names given by each non-dynamic role.
+        role_ids_by_user_id:
+            Roles assigned to each user.
+        unauthorized_permission_names:
+            Permission names given to unauthorized users.
+        authorized_permission_names:
+            Permission names given to authorized users without any role.
+        role_ids_by_name:
+            Ids of non-dynamic roles by their names.
+        dynamic_role_ids_by_name:
+            Ids of builtin dynamic roles by their names.
+    """
+    routes: list[PolicyRoute]
+    permission_names_by_role_id: dict[str, list[str]]
+    role_ids_by_user_id: dict[str, list[str]]
+    unauthorized_permission_names: list[str]
+    authorized_permission_names: list[str]
+    role_ids_by_name: dict[str, str] = {}
+    dynamic_role_ids_by_name: dict[str, str] = {}
+
+
+class AccessContext(Model):
+    """
+    Access resolved for a user while checking a request.
+
+    Attributes:
+        user_id:
+            Id of the checked user or None for an unauthorized client.
+        role_ids:
+            Ids of all user's roles, including the linked dynamic ones.
+        permission_names:
+            Names of all permissions given by the roles.
+        controller_route:
+            Route of the matched controller.
+        method:
+            Lowercased method of the request.
+    """
+    class Config:
+        frozen = True
+
+    user_id: str | None
+    role_ids: frozenset[str]
+    permission_names: frozenset[str]
+    controller_route: str
+    method: str
+
+    def has_permission(self, name: str) -> bool:
+        return name in self.permission_names
+
+
+class RoleSubject(Model):
+    """
+    Subject which roles are resolved by a `RoleResolver`.
+
+    Attributes:
+        user_id:
+            Id of the user or None for an unauthorized client.
+        role_names(optional):
+            Names of user's roles supplied externally, e.g. by claims of an
+            identity provider. None if not supplied.
+    """
+    class Config:
+        frozen = True
+
+    user_id: str | None
+    role_names: tuple[str, ...] | None = None
+
+
+class ExplainStep(Model):
+    """
+    Step of an explained access check.
+
+    Attributes:
+        name:
+            Name of the step.
+        seconds:
+            Duration of the step.
+        query_count:
+            Amount of storage operations made within the step. Zero means
+            the step has been served from memory.
+        caches:
+            Names of caches the step has been served from.
+    """
+    name: str
+    seconds: float
+    query_count: int
+    caches: list[str] = []
+
+
+class AccessExplanation(Model):
+    """
+    Explanation of how an access decision has been made.
+
+    Attributes:
+        user_id:
+            Id of the checked user or None for an unauthorized client.
+        route:
+            Checked route.
+        method:
+            Lowercased checked method.
+        decision:
+            Outcome of the check.
+        controller_key:
+            Key of the matched controller, None if no controller matched.
+        controller_route:
+            Route of the matched controller, None if no controller matched.
+        required_permission_name:
+            Permission the controller requires for the method, None if the
+            method is uncovered or no controller matched.
+        is_uncovered:
+            Whether the method is uncovered, i.e. requires
+            "dynamic:uncovered" permission.
+        role_ids:
+            Ids of all user's roles, including the linked dynamic ones.
+        granting_role_ids:
+            Ids of user's roles supplied the required permission.
+        steps:
+            Steps of the check in the order they have been made.
+        seconds:
+            Duration of the whole check.
+    """
+    user_id: str | None
+    route: str
+    method: str
+    decision: AccessDecision
+    controller_key: str | None = None
+    controller_route: str | None = None
+    required_permission_name: str | None = None
+    is_uncovered: bool = False
+    role_ids: list[str] = []
+    granting_role_ids: list[str] = []
+    steps: list[ExplainStep]
+    seconds: float
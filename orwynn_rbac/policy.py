@@ -0,0 +1,251 @@
+import hashlib
+import json
+from typing import Iterable
+
+from orwynn_rbac.enums import AccessDecision
+from orwynn_rbac.models import PolicyRoute, PolicySnapshot
+from orwynn_rbac.utils import MethodRouteMatcher, RouteUtils
+
+UncoveredPermissionName: str = "dynamic:uncovered"
+
+
+class CompiledPolicy:
+    """
+    Access policy compiled into plain in-memory structures.
+
+    Decides access without any database or DI call, so it can be shared by
+    processes which do not boot the application, e.g. the decision sidecar.
+
+    Permissions required by controllers are matched by names, since all
+    permission actions are generated from the same controllers during the
+    boot.
+    """
+    def __init__(self, snapshot: PolicySnapshot) -> None:
+        self._snapshot: PolicySnapshot = snapshot
+
+        self._routes: list[tuple[dict[str, str | None], PolicyRoute]] = [
+            (
+                {
+                    method.lower(): permission_name
+                    for method, permission_name
+                    in route.permission_names.items()
+                },
+                route,
+            )
+            for route in snapshot.routes
+        ]
+        self._route_matcher: MethodRouteMatcher = MethodRouteMatcher(
+            [
+                (route.abstract_routes, permission_names_by_method.keys())
+                for permission_names_by_method, route in self._routes
+            ],
+            RouteUtils.get_controller_route_pattern,
+        )
+        self._permission_names_by_role_id: dict[str, frozenset[str]] = {
+            role_id: frozenset(names)
+            for role_id, names
+            in snapshot.permission_names_by_role_id.items()
+        }
+        self._role_ids_by_user_id: dict[str, frozenset[str]] = {
+            user_id: frozenset(role_ids)
+            for user_id, role_ids in snapshot.role_ids_by_user_id.items()
+        }
+        self._unauthorized_permission_names: frozenset[str] = \
+            frozenset(snapshot.unauthorized_permission_names)
+        self._authorized_permission_names: frozenset[str] = \
+            frozenset(snapshot.authorized_permission_names)
+        self._role_ids_by_name: dict[str, str] = snapshot.role_ids_by_name
+        self._dynamic_role_ids_by_name: dict[str, str] = \
+            snapshot.dynamic_role_ids_by_name
+
+        # users usually share the same sets of roles, so permission names are
+        # merged once per such set
+        self._permission_names_by_role_ids: dict[
+            frozenset[str], frozenset[str],
+        ] = {}
+
+        self._version: str = self._hash(snapshot.dict())
+        self._permissions_version: str = self._hash(
+            snapshot.dict(exclude={"role_ids_by_user_id"}),
+        )
+
+    @property
+    def snapshot(self) -> PolicySnapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> str:
+        """
+        Fingerprint of the policy's content.
+        """
+        return self._version
+
+    @property
+    def permissions_version(self) -> str:
+        """
+        Fingerprint of the policy's content except role memberships of
+        users.
+
+        Changed only if routes or permissions given by roles are changed.
+        """
+        return self._permissions_version
+
+    def decide(
+        self,
+        user_id: str | None,
+        route: str,
+        method: str,
+    ) -> AccessDecision:
+        """
+        Decides whether the user has an access to the route and method.
+
+        If user id is None, it is considered that the request is made from an
+        unauthorized client.
+        """
+        permission_names_by_method: dict[str, str | None] | None = \
+            self.match_route(route, method)
+
+        if permission_names_by_method is None:
+            return AccessDecision.RouteNotFound
+
+        if self.is_permitted(
+            self.get_permission_names_for_user_id(user_id),
+            permission_names_by_method,
+            method,
+        ):
+            return AccessDecision.Allowed
+        return AccessDecision.Forbidden
+
+    def is_permitted(
+        self,
+        permission_names: frozenset[str],
+        permission_names_by_method: dict[str, str | None],
+        method: str,
+    ) -> bool:
+        """
+        Checks whether given permission names are enough for the method of a
+        matched route.
+        """
+        required_permission_name: str | None = \
+            permission_names_by_method[method.lower()]
+        if required_permission_name is None:
+            required_permission_name = UncoveredPermissionName
+
+        return required_permission_name in permission_names
+
+    def match_route(
+        self,
+        route: str,
+        method: str,
+    ) -> dict[str, str | None] | None:
+        """
+        Finds the first registered route supporting the method.
+
+        Returns:
+            Required permission names by method of the matched route or None,
+            if nothing is matched.
+        """
+        matched: tuple[dict[str, str | None], PolicyRoute] | None = \
+            self._match(route, method)
+        return None if matched is None else matched[0]
+
+    def match_policy_route(
+        self,
+        route: str,
+        method: str,
+    ) -> PolicyRoute | None:
+        """
+        Finds the first registered route supporting the method.
+        """
+        matched: tuple[dict[str, str | None], PolicyRoute] | None = \
+            self._match(route, method)
+        return None if matched is None else matched[1]
+
+    def _match(
+        self,
+        route: str,
+        method: str,
+    ) -> tuple[dict[str, str | None], PolicyRoute] | None:
+        i: int | None = self._route_matcher.match(route, method)
+        if i is None:
+            return None
+        return self._routes[i]
+
+    def get_permission_names_for_user_id(
+        self,
+        user_id: str | None,
+    ) -> frozenset[str]:
+        if user_id is None:
+            return self._unauthorized_permission_names
+
+        return self.get_permission_names_for_user_role_ids(
+            self._role_ids_by_user_id.get(user_id, frozenset()),
+        )
+
+    def get_role_ids_for_names(
+        self,
+        role_names: Iterable[str],
+    ) -> frozenset[str]:
+        """
+        Returns ids of non-dynamic roles with given names. Unknown names are
+        skipped.
+        """
+        return frozenset(
+            self._role_ids_by_name[name] for name in role_names
+            if name in self._role_ids_by_name
+        )
+
+    def link_dynamic_role_ids(
+        self,
+        user_id: str | None,
+        role_ids: frozenset[str],
+    ) -> frozenset[str]:
+        """
+        Returns given role ids with builtin dynamic roles linked to users
+        without any role: unauthorized role for None user id and authorized
+        role for the rest.
+        """
+        if role_ids:
+            return role_ids
+
+        role_id: str | None = self._dynamic_role_ids_by_name.get(
+            "dynamic:unauthorized" if user_id is None
+            else "dynamic:authorized",
+        )
+        return frozenset() if role_id is None else frozenset((role_id,))
+
+    def get_permission_names_for_user_role_ids(
+        self,
+        role_ids: frozenset[str],
+    ) -> frozenset[str]:
+        """
+        Returns permission names of an authorized user having given roles.
+
+        A user without any role gets permissions of authorized users.
+        """
+        if not role_ids:
+            return self._authorized_permission_names
+
+        return self.get_permission_names_for_role_ids(role_ids)
+
+    def get_permission_names_for_role_ids(
+        self,
+        role_ids: frozenset[str],
+    ) -> frozenset[str]:
+        permission_names: frozenset[str] | None = \
+            self._permission_names_by_role_ids.get(role_ids)
+
+        if permission_names is None:
+            permission_names = frozenset().union(*(
+                self._permission_names_by_role_id.get(role_id, ())
+                for role_id in role_ids
+            ))
+            self._permission_names_by_role_ids[role_ids] = permission_names
+
+        return permission_names
+
+    @staticmethod
+    def _hash(data: dict) -> str:
+        return hashlib.sha256(
+            json.dumps(data, sort_keys=True).encode(),
+        ).hexdigest()[:16]
@@ -0,0 +1,281 @@
+import contextlib
+import itertools
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+from typing import ContextManager
+
+import pydantic
+from orwynn.model import Model
+from pykit.errors import LogicError
+
+
+class ProfilerConfig(Model):
+    """
+    Configuration of the access check profiler.
+
+    Attributes:
+        sample_every:
+            Every N-th check is profiled from its start. None disables
+            sampling by count.
+        latency_threshold:
+            Seconds after which any running check is profiled until it
+            finishes. None disables profiling of slow checks.
+        interval:
+            Seconds between stack samples of profiled checks.
+    """
+    sample_every: int | None = pydantic.Field(100, ge=1)
+    latency_threshold: float | None = pydantic.Field(None, gt=0)
+    interval: float = pydantic.Field(0.001, gt=0)
+
+
+class ProfilerStatus(Model):
+    """
+    Attributes:
+        is_enabled:
+            Whether the profiler is running.
+        config:
+            Config the profiler is running with.
+        profiled_check_count:
+            Amount of checks sampled at least once since the last clear.
+        sample_count:
+            Amount of taken stack samples since the last clear.
+    """
+    is_enabled: bool
+    config: ProfilerConfig | None
+    profiled_check_count: int
+    sample_count: int
+
+
+class _ProfiledCheck:
+    __slots__ = (
+        "checks",
+        "thread_id",
+        "frame",
+        "started_at",
+        "is_sampled",
+        "is_seen",
+    )
+
+    def __init__(
+        self,
+        checks: dict[int, "_ProfiledCheck"],
+        *,
+        is_sampled: bool,
+    ) -> None:
+        # running profiled checks shared with the profiler
+        self.checks: dict[int, _ProfiledCheck] = checks
+        self.is_sampled: bool = is_sampled
+        self.is_seen: bool = False
+
+    def __enter__(self) -> None:
+        self.thread_id: int = threading.get_ident()
+        # frame of the function made the check
+        self.frame: FrameType = sys._getframe(1)  # noqa: SLF001
+        self.started_at: float = time.perf_counter()
+        self.checks[id(self)] = self
+
+    def __exit__(self, *args: object) -> None:
+        self.checks.pop(id(self), None)
+
+
+_NoopCheck: ContextManager[None] = contextlib.nullcontext()
+
+
+class CheckProfiler:
+    """
+    Samples stacks of running access checks.
+
+    While enabled, a background thread periodically takes stacks of the
+    threads running profiled checks and aggregates them into collapsed
+    stacks, which are rendered by flamegraph tools:
+    ```sh
+    flamegraph.pl stacks.txt > rbac.svg
+    ```
+
+    A check is profiled if it is every N-th check or if it runs longer than
+    the latency threshold. Only frames made within a check are counted, so
+    the root of every stack is the check itself.
+
+    When disabled, a check pays for entering a shared no-op context
+    manager.
+    """
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self._config: ProfilerConfig | None = None
+        self._stop_event: threading.Event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self._check_counter: itertools.count = itertools.count()
+        self._checks: dict[int, _ProfiledCheck] = {}
+        self._stacks: Counter[str] = Counter()
+        self._profiled_check_count: int = 0
+
+        self.is_enabled: bool = False
+
+    @property
+    def status(self) -> ProfilerStatus:
+        with self._lock:
+            return ProfilerStatus(
+                is_enabled=self.is_enabled,
+                config=self._config,
+                profiled_check_count=self._profiled_check_count,
+                sample_count=sum(self._stacks.values()),
+            )
+
+    def enable(self, config: ProfilerConfig) -> None:
+        """
+        Starts profiling with the given config, restarting the profiler if
+        it is already running. Collected stacks are kept.
+
+        Raises:
+            LogicError:
+                Neither sampling by count nor latency threshold is set.
+        """
+        if config.sample_every is None and config.latency_threshold is None:
+            err_message: str = \
+                "either sample_every or latency_threshold should be set"
+            raise LogicError(err_message)
+
+        stop_event: threading.Event = threading.Event()
+        thread: threading.Thread = threading.Thread(
+            target=self._run,
+            args=(config, stop_event),
+            name="orwynn-rbac-profiler",
+            daemon=True,
+        )
+
+        with self._lock:
+            previous_thread: threading.Thread | None = self._stop()
+            self._config = config
+            self._stop_event = stop_event
+            self._thread = thread
+            thread.start()
+            self.is_enabled = True
+
+        if previous_thread is not None:
+            previous_thread.join()
+
+    def disable(self) -> None:
+        """
+        Stops profiling. Collected stacks are kept.
+        """
+        with self._lock:
+            thread: threading.Thread | None = self._stop()
+
+        if thread is not None:
+            thread.join()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self._profiled_check_count = 0
+
+    def get_collapsed_stacks(self) -> str:
+        """
+        Returns collected stacks in the collapsed format, one
+        "frame;frame;frame count" line per distinct stack.
+        """
+        with self._lock:
+            return "".join(
+                f"{stack} {count}\n"
+                for stack, count in sorted(self._stacks.items())
+            )
+
+    def dump(self, path: Path) -> None:
+        """
+        Writes collected stacks to a file in the collapsed format.
+        """
+        Path(path).write_text(self.get_collapsed_stacks(), encoding="utf-8")
+
+    def profile_check(self) -> ContextManager[None]:
+        """
+        Profiles a check made within the returned context manager, if the
+        check is chosen to be profiled.
+
+        Stacks are collapsed up to the function entered the context
+        manager.
+        """
+        config: ProfilerConfig | None = self._config
+        if not self.is_enabled or config is None:
+            return _NoopCheck
+
+        is_sampled: bool = (
+            config.sample_every is not None
+            and next(self._check_counter) % config.sample_every == 0
+        )
+        if not is_sampled and config.latency_threshold is None:
+            return _NoopCheck
+
+        return _ProfiledCheck(self._checks, is_sampled=is_sampled)
+
+    def _stop(self) -> threading.Thread | None:
+        """
+        Signals the running sampler thread to stop and returns it, so it is
+        joined after the lock is released, since the thread takes the lock
+        on every sample.
+        """
+        self.is_enabled = False
+        self._stop_event.set()
+        thread: threading.Thread | None = self._thread
+        self._thread = None
+        self._checks.clear()
+        return thread
+
+    def _run(
+        self,
+        config: ProfilerConfig,
+        stop_event: threading.Event,
+    ) -> None:
+        while not stop_event.wait(config.interval):
+            self._sample(config)
+
+    def _sample(self, config: ProfilerConfig) -> None:
+        now: float = time.perf_counter()
+        checks: list[_ProfiledCheck] = [
+            c for c in list(self._checks.values())
+            if c.is_sampled or (
+                config.latency_threshold is not None
+                and now - c.started_at >= config.latency_threshold
+            )
+        ]
+        if not checks:
+            return
+
+        frames: dict[int, FrameType] = sys._current_frames()  # noqa: SLF001
+        for check in checks:
+            frame: FrameType | None = frames.get(check.thread_id)
+            stack: str | None = \
+                None if frame is None else _collapse(frame, check.frame)
+            if stack is None:
+                # the check has finished after it has been listed
+                continue
+
+            with self._lock:
+                self._stacks[stack] += 1
+                if not check.is_seen:
+                    check.is_seen = True
+                    self._profiled_check_count += 1
+
+
+def _collapse(frame: FrameType, root: FrameType) -> str | None:
+    """
+    Returns frames from the root to the given one joined with ";" or None
+    if the frame is not called within the root.
+    """
+    names: list[str] = []
+    current: FrameType | None = frame
+
+    while current is not None:
+        names.append(
+            f"{current.f_globals.get('__name__', '?')}"
+            f":{current.f_code.co_name}",
+        )
+        if current is root:
+            return ";".join(reversed(names))
+        current = current.f_back
+
+    return None
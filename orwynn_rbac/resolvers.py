@@ -0,0 +1,133 @@
+import abc
+import asyncio
+
+from orwynn_rbac.models import RoleSubject
+from orwynn_rbac.policy import CompiledPolicy
+from orwynn_rbac.storage import RBACStorage
+
+
+class RoleResolver(abc.ABC):
+    """
+    Resolves ids of non-dynamic roles of subjects.
+
+    Subjects are resolved in batches, so a resolver backed by a remote
+    source can make one call for all of them.
+    """
+    @abc.abstractmethod
+    async def resolve(
+        self,
+        subjects: list[RoleSubject],
+        policy: CompiledPolicy,
+        storage: RBACStorage,
+    ) -> list[frozenset[str] | None]:
+        """
+        Args:
+            subjects:
+                Subjects to resolve.
+            policy:
+                Current compiled policy.
+            storage:
+                Storage used by the RBAC services.
+
+        Returns:
+            Role ids for each subject in order of given subjects or None if
+            the resolver has no data about the subject.
+        """
+
+
+class StorageRoleResolver(RoleResolver):
+    """
+    Takes roles of users from a storage.
+
+    All users are resolved with one storage query made in a thread.
+    Unauthorized subjects have no roles.
+    """
+    async def resolve(
+        self,
+        subjects: list[RoleSubject],
+        policy: CompiledPolicy,
+        storage: RBACStorage,
+    ) -> list[frozenset[str] | None]:
+        user_ids: list[str] = list({
+            s.user_id for s in subjects if s.user_id is not None
+        })
+
+        role_ids_by_user_id: dict[str, set[str]] = {}
+        if user_ids:
+            role_ids_by_user_id = await asyncio.to_thread(
+                storage.get_role_ids_for_users,
+                user_ids,
+            )
+
+        return [
+            frozenset(role_ids_by_user_id.get(s.user_id, ()))
+            if s.user_id is not None else frozenset()
+            for s in subjects
+        ]
+
+
+class ClaimsRoleResolver(RoleResolver):
+    """
+    Takes roles from names supplied with subjects, e.g. by an identity
+    provider.
+
+    Names are looked up in the compiled policy without any storage call.
+    Unknown names are skipped. Subjects without supplied names are not
+    resolved.
+    """
+    async def resolve(
+        self,
+        subjects: list[RoleSubject],
+        policy: CompiledPolicy,
+        storage: RBACStorage,
+    ) -> list[frozenset[str] | None]:
+        return [
+            None if s.role_names is None
+            else policy.get_role_ids_for_names(s.role_names)
+            for s in subjects
+        ]
+
+
+class CombinedRoleResolver(RoleResolver):
+    """
+    Asks given resolvers in order, passing to the next resolver only
+    subjects not resolved by the previous ones.
+
+    Example:
+    ```python
+    # trust the claims if given, otherwise read from the storage
+    CombinedRoleResolver([ClaimsRoleResolver(), StorageRoleResolver()])
+    ```
+    """
+    def __init__(
+        self,
+        resolvers: list[RoleResolver],
+    ) -> None:
+        self._resolvers: list[RoleResolver] = resolvers
+
+    async def resolve(
+        self,
+        subjects: list[RoleSubject],
+        policy: CompiledPolicy,
+        storage: RBACStorage,
+    ) -> list[frozenset[str] | None]:
+        result: list[frozenset[str] | None] = [None] * len(subjects)
+        unresolved: list[int] = list(range(len(subjects)))
+
+        for resolver in self._resolvers:
+            if not unresolved:
+                break
+
+            resolved: list[frozenset[str] | None] = await resolver.resolve(
+                [subjects[i] for i in unresolved], policy, storage,
+            )
+
+            next_unresolved: list[int] = []
+            for i, role_ids in zip(unresolved, resolved, strict=True):
+                if role_ids is None:
+                    next_unresolved.append(i)
+                else:
+                    result[i] = role_ids
+            unresolved = next_unresolved
+
+        return result
@@ -1,12 +1,16 @@
+import asyncio
 import contextlib
-from typing import TYPE_CHECKING, Any, Iterable
+import threading
+import time
+from contextvars import ContextVar, Token
+from typing import TYPE_CHECKING, Any, Iterable, Iterator
 
-from bson import ObjectId
 from orwynn.controller import Controller
 from orwynn.di.di import Di
 from orwynn.log import Log
-from orwynn.mongo import MongoUtils
+from orwynn.mongo import MongoConfig, MongoUtils
 from orwynn.service import Service
+from orwynn.url import URLMethod
 from pykit import validation
 from pykit.errors import (
     AlreadyEventError,
@@ -15,15 +19,52 @@ from pykit.errors import (
     LogicError,
     NotFoundError,
 )
-from pykit.func import FuncSpec
 
+from orwynn_rbac.bloom import BloomFilter
+from orwynn_rbac.cache import TTLCache
 from orwynn_rbac.constants import DynamicPermissionNames
 from orwynn_rbac.documents import Permission, Role
 from orwynn_rbac.dtos import PermissionCDTO, PermissionUDTO, RoleCDTO, RoleUDTO
-from orwynn_rbac.errors import NonDynamicPermissionError
-from orwynn_rbac.models import DefaultRole, HTTPAction, RoleCreate
+from orwynn_rbac.enums import AccessDecision
+from orwynn_rbac.errors import (
+    InvalidPermissionTokenError,
+    PermissionTokenKeyNotSetError,
+)
+from orwynn_rbac.instrumentation import (
+    QueryCounter,
+    QueryStats,
+    count_queries,
+)
+from orwynn_rbac.metrics import RBACMetrics
+from orwynn_rbac.models import (
+    AccessContext,
+    AccessExplanation,
+    DefaultRole,
+    DefaultRoleChange,
+    DefaultRolesReport,
+    ExplainStep,
+    HTTPAction,
+    PermissionSyncReport,
+    PolicyRoute,
+    PolicySnapshot,
+    RoleCreate,
+    RoleSubject,
+)
+from orwynn_rbac.policy import CompiledPolicy
+from orwynn_rbac.profiler import CheckProfiler
+from orwynn_rbac.resolvers import RoleResolver, StorageRoleResolver
 from orwynn_rbac.search import PermissionSearch, RoleSearch
-from orwynn_rbac.utils import NamingUtils, PermissionUtils, UpdateOperator
+from orwynn_rbac.singleflight import SingleFlight
+from orwynn_rbac.storage import MongoRBACStorage, RBACStorage
+from orwynn_rbac.tokens import PermissionToken, PermissionTokenSigner
+from orwynn_rbac.tracing import span
+from orwynn_rbac.utils import (
+    MethodRouteMatcher,
+    NamingUtils,
+    PermissionUtils,
+    RouteUtils,
+    UpdateOperator,
+)
 
 if TYPE_CHECKING:
     from orwynn_rbac.types import ControllerPermissions
@@ -35,42 +76,30 @@ class PermissionService(Service):
     """
     # Roles are managed with a sql table, permissions and actions at runtime.
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        mongo_config: MongoConfig,
+    ) -> None:
         self._log = Log
+        self._storage: RBACStorage = MongoRBACStorage.from_config(
+            mongo_config,
+        )
+
+    def use_storage(self, storage: RBACStorage) -> None:
+        """
+        Sets storage backend for permissions.
+        """
+        self._storage = storage
+
+    @property
+    def storage(self) -> RBACStorage:
+        return self._storage
 
     def get(
         self,
         search: PermissionSearch,
     ) -> list[Permission]:
-        query: dict[str, Any] = {}
-
-        if search.ids is not None:
-            query["id"] = {
-                "$in": search.ids,
-            }
-        if search.names is not None:
-            query["name"] = {
-                "$in": search.names,
-            }
-        if search.actions is not None:
-            converted_actions: list[dict[str, Any]] = [
-                {
-                    "controller_no": action.controller_no,
-                    "method": action.method,
-                } for action in search.actions
-            ]
-
-            query["actions"] = {
-                "$in": converted_actions,
-            }
-        if search.is_dynamic:
-            query["is_dynamic"] = search.is_dynamic
-
-        return MongoUtils.process_query(
-            query,
-            search,
-            Permission,
-        )
+        return self._storage.get_permissions(search)
 
     def get_cdto(self, search: PermissionSearch) -> PermissionCDTO:
         return PermissionCDTO.convert(
@@ -90,7 +119,7 @@ class PermissionService(Service):
         self,
         *,
         controllers: list[Controller],
-    ) -> tuple[set[str], set[str]]:
+    ) -> PermissionSyncReport:
         """
         Initializes permissions and their actions for the system.
 
@@ -101,63 +130,84 @@ class PermissionService(Service):
 
         All unused permissions are deleted.
 
+        Stored permissions are read once and compared with the collected
+        ones, so only added, changed and removed permissions are written,
+        with at most one bulk write of each kind.
+
         Returns:
-            Set of permission ids affected in initialization and set of
-            permissions ids deleted during the initialization.
+            Report of permission changes made by the initialization.
         """
-        affected_ids: set[str] = set()
-
-        affected_ids.update(self._create_dynamic_or_skip())
-        affected_ids.update(self._create_for_controllers(controllers))
-
-        deleted_ids: set[str] = self._delete_unused(affected_ids)
-
-        return affected_ids, deleted_ids
-
-    def _delete_unused(
-        self,
-        affected_ids: set[str],
-    ) -> set[str]:
-        ids: set[str] = set()
-
-        permissions: Iterable[Permission] = Permission.get({
-            "id": {
-                "$nin": list(affected_ids),
-            },
-        })
-
-        for permission in permissions:
-            ids.add(permission.getid())
-            permission.remove()
-
-        return ids
+        actions_by_name: dict[str, list[dict] | None] = {
+            name: None for name in sorted(DynamicPermissionNames)
+        }
+        actions_by_name.update(self._collect_actions(controllers))
+
+        stored_permissions: list[Permission] = []
+        with contextlib.suppress(NotFoundError):
+            stored_permissions = self.get(PermissionSearch())
+
+        stored_by_name: dict[str, Permission] = {}
+        deleted_ids: list[str] = []
+        for permission in stored_permissions:
+            if (
+                permission.name in actions_by_name
+                and permission.name not in stored_by_name
+            ):
+                stored_by_name[permission.name] = permission
+            else:
+                deleted_ids.append(permission.getid())
+
+        created_permissions: list[Permission] = []
+        operations: dict[str, dict[str, Any]] = {}
+        unchanged_ids: list[str] = []
+        for name, pure_actions in actions_by_name.items():
+            stored: Permission | None = stored_by_name.get(name, None)
+
+            if stored is None:
+                created_permissions.append(Permission(
+                    name=name,
+                    actions=pure_actions,
+                    is_dynamic=pure_actions is None,
+                ))
+            elif self._is_actions_changed(stored, pure_actions):
+                operations[stored.getid()] = {
+                    "$set": {
+                        "actions": pure_actions,
+                    },
+                }
+            else:
+                unchanged_ids.append(stored.getid())
+
+        created_ids: list[str] = []
+        if created_permissions:
+            created_ids = [
+                p.getid()
+                for p in self._storage.create_permissions(created_permissions)
+            ]
+        if operations:
+            self._storage.update_permissions(operations)
+        if deleted_ids:
+            self._storage.delete_permissions(deleted_ids)
+
+        return PermissionSyncReport(
+            created_ids=created_ids,
+            updated_ids=list(operations.keys()),
+            deleted_ids=deleted_ids,
+            unchanged_ids=unchanged_ids,
+        )
 
-    def _create_dynamic_or_skip(
+    def _collect_actions(
         self,
-    ) -> set[str]:
+        controllers: list[Controller],
+    ) -> dict[str, list[dict]]:
         """
-        Creates dynamic permissions if these do not exist yet.
+        Returns pure actions of controllers by required permission names.
         """
-        affected_ids: set[str] = set()
-
-        for name in DynamicPermissionNames:
-            affected_ids.add(self._create_one_or_overwrite(
-                name=name,
-                pure_actions=None,
-            ).getid())
-
-        return affected_ids
-
-    def _create_for_controllers(
-        self,
-        controllers: list[Controller],
-    ) -> set[str]:
-        affected_ids: set[str] = set()
         pure_actions_by_permission_name: dict[str, list[dict]] = {}
 
-        # controllers are numbered exactly as they are placed in DI's generated
-        # array. It is not entirely safe, but it is a solution for now
-        for controller_no, controller in enumerate(controllers):
+        # controllers are identified by route and class, so actions do not
+        # depend on the order DI has registered the controllers in
+        for controller in controllers:
             try:
                 controller_permissions: ControllerPermissions = \
                     PermissionUtils.collect_controller_permissions(controller)
@@ -174,101 +224,176 @@ class PermissionService(Service):
                 pure_actions_by_permission_name[permission_name].append(
                     validation.apply(
                         MongoUtils.convert_compatible(HTTPAction(
-                            controller_no=controller_no,
+                            controller_key=PermissionUtils.get_controller_key(
+                                controller,
+                            ),
                             method=method,
                         )),
                         dict,
                     ),
                 )
 
-        for permission_name, actions \
-                in pure_actions_by_permission_name.items():
-            affected_ids.add(self._create_one_or_overwrite(
-                name=permission_name,
-                pure_actions=actions,
-            ).getid())
-
-        return affected_ids
+        return pure_actions_by_permission_name
 
-    def _create_one_or_overwrite(
-        self,
-        *,
-        name: str,
+    @staticmethod
+    def _is_actions_changed(
+        permission: Permission,
         pure_actions: list[dict] | None,
-    ) -> Permission:
+    ) -> bool:
         """
-        Saves a permission in the system with given actions, or overwrites
-        all actions for an existing one.
-
-        Action can be None only if the permission associated with the
-        given name is dynamic, otherwise NotDynamicForActionPermissionError
-        is raised.
+        Checks whether stored actions of the permission differ from given
+        ones, regardless of their order.
         """
-        permission: Permission
-
-        if pure_actions is None and not NamingUtils.has_dynamic_prefix(name):
-            raise NonDynamicPermissionError(
-                permission_name=name,
-                in_order_to="create without actions",
-            )
-
-        try:
-            permission = self.get(PermissionSearch(names=[name]))[0]
-        except NotFoundError:
-            permission = Permission(
-                name=name,
-                actions=pure_actions,
-                is_dynamic=pure_actions is None,
-            ).create()
-        else:
-            permission = permission.update(set={
-                "actions": pure_actions,
-            })
+        if permission.actions is None or pure_actions is None:
+            return permission.actions is not pure_actions
 
-        return permission
+        return sorted(
+            (a.controller_key, a.method) for a in permission.actions
+        ) != sorted(
+            (a["controller_key"], a["method"]) for a in pure_actions
+        )
 
 
 class RoleService(Service):
     """
     Manages roles.
+
+    Keeps a bloom filter of ids of users having at least one role, so users
+    without roles can be recognized without a storage query.
+
+    Attributes:
+        MembersFilterTTL:
+            Seconds the filter of users having roles is reused for, after
+            which it is rebuilt in a background thread. Roles set by this
+            process are added to the filter immediately. A user getting the
+            first role from another process is not seen for up to this
+            amount of seconds plus the rebuild duration, and is given only
+            the "dynamic:authorized" role's permissions meanwhile.
     """
+    MembersFilterTTL: float = 60.0
+
     def __init__(
         self,
         permission_service: PermissionService,
     ) -> None:
         super().__init__()
         self._permission_service: PermissionService = permission_service
+        self._storage: RBACStorage = permission_service.storage
+
+        # held while the first filter is built, so checks wait for it
+        self._members_filter_lock: threading.Lock = threading.Lock()
+        self._members_filter: BloomFilter | None = None
+        self._members_filter_built_at: float = 0.0
+        # guards members added while the filter is rebuilt
+        self._members_lock: threading.Lock = threading.Lock()
+        self._added_members_during_rebuild: list[set[str]] = []
+        self._is_members_filter_rebuilding: bool = False
+
+    def use_storage(self, storage: RBACStorage) -> None:
+        """
+        Sets storage backend for roles and their permissions.
+        """
+        self._storage = storage
+        self._permission_service.use_storage(storage)
+        self._members_filter = None
+
+    @property
+    def storage(self) -> RBACStorage:
+        return self._storage
 
     def get(
         self,
         search: RoleSearch,
     ) -> list[Role]:
-        query: dict[str, Any] = {}
+        return self._storage.get_roles(search)
 
-        if search.ids is not None:
-            query["id"] = {
-                "$in": search.ids,
-            }
-        if search.names is not None:
-            query["name"] = {
-                "$in": search.names,
-            }
-        if search.permission_ids is not None:
-            query["permission_ids"] = {
-                "$in": search.permission_ids,
-            }
-        if search.user_ids is not None:
-            query["user_ids"] = {
-                "$in": search.user_ids,
-            }
-        if search.is_dynamic:
-            query["is_dynamic"] = search.is_dynamic
+    def rebuild_members_filter(self) -> None:
+        """
+        Rebuilds the filter of users having roles from all stored roles.
+        """
+        # members added by this process while roles are read are not lost
+        added_members: set[str] = set()
+        with self._members_lock:
+            self._added_members_during_rebuild.append(added_members)
 
-        return MongoUtils.process_query(
-            query,
-            search,
-            Role,
-        )
+        try:
+            user_ids: set[str] = set()
+            with contextlib.suppress(NotFoundError):
+                for role in self.get(RoleSearch()):
+                    user_ids.update(role.user_ids)
+
+            # spare capacity for users getting roles until the next rebuild
+            members_filter: BloomFilter = BloomFilter(
+                max(len(user_ids) * 2, 1024),
+            )
+            for user_id in user_ids:
+                members_filter.add(user_id)
+        finally:
+            with self._members_lock:
+                self._added_members_during_rebuild.remove(added_members)
+
+        with self._members_lock:
+            for user_id in added_members:
+                members_filter.add(user_id)
+            self._members_filter = members_filter
+            self._members_filter_built_at = time.monotonic()
+
+    def may_have_roles(self, user_id: str) -> bool:
+        """
+        Checks whether the user might have a role.
+
+        False is returned only if the user definitely has no roles, at least
+        according to the storage state at the last filter rebuild and
+        writes made by this process since.
+
+        Only the first filter is built in place, an expired one keeps being
+        used while it is rebuilt in background.
+        """
+        members_filter: BloomFilter | None = self._members_filter
+        if members_filter is None:
+            with self._members_filter_lock:
+                # the filter might be built by a concurrent thread
+                if self._members_filter is None:
+                    self.rebuild_members_filter()
+            members_filter = self._members_filter
+            assert members_filter is not None  # noqa: S101
+        elif (
+            time.monotonic() - self._members_filter_built_at
+            >= self.MembersFilterTTL
+        ):
+            self._start_members_filter_rebuild()
+
+        return user_id in members_filter
+
+    def _start_members_filter_rebuild(self) -> None:
+        with self._members_lock:
+            if self._is_members_filter_rebuilding:
+                return
+            self._is_members_filter_rebuilding = True
+
+        threading.Thread(
+            target=self._rebuild_members_filter_in_background,
+            name="orwynn-rbac-members-filter-rebuild",
+            daemon=True,
+        ).start()
+
+    def _rebuild_members_filter_in_background(self) -> None:
+        try:
+            self.rebuild_members_filter()
+        except Exception as err:  # noqa: BLE001
+            Log.error(f"[orwynn_rbac] members filter rebuild failed: {err!r}")
+        finally:
+            with self._members_lock:
+                self._is_members_filter_rebuilding = False
+
+    def _add_members(self, user_ids: Iterable[str]) -> None:
+        with self._members_lock:
+            members_filter: BloomFilter | None = self._members_filter
+            for user_id in user_ids:
+                if members_filter is not None:
+                    members_filter.add(user_id)
+                for added_members in self._added_members_during_rebuild:
+                    added_members.add(user_id)
 
     def get_udto(
         self,
@@ -300,7 +425,7 @@ class RoleService(Service):
                 Affected user already has some of the specified roles.
         """
         roles: list[Role] = self.get(search)
-        updates: list[FuncSpec] = []
+        operations: dict[str, dict[str, Any]] = {}
 
         for role in roles:
             if user_id in role.user_ids:
@@ -310,18 +435,12 @@ class RoleService(Service):
                     event=f"has a role {role}",
                 )
 
-            updates.append(
-                FuncSpec(
-                    func=role.update,
-                    kwargs={
-                        "operators": {"$push": {"user_ids": user_id}},
-                    },
-                ),
-            )
+            operations[role.getid()] = {"$push": {"user_ids": user_id}}
 
-        final_roles: list[Role] = [
-            u.call() for u in updates
-        ]
+        # the user is added before the write, so a concurrent check does not
+        # consider them as having no roles after the write
+        self._add_members([user_id])
+        final_roles: list[Role] = self._storage.update_roles(operations)
 
         if len(final_roles) != len(roles):
             err_message: str = \
@@ -363,9 +482,9 @@ class RoleService(Service):
                 description=d.description,
                 permission_ids=[p.getid() for p in permissions],
                 is_dynamic=NamingUtils.has_dynamic_prefix(d.name),
-            ).create())
+            ))
 
-        return roles
+        return self._storage.create_roles(roles)
 
     def create_cdto(
         self,
@@ -377,12 +496,9 @@ class RoleService(Service):
         self,
         search: RoleSearch,
     ) -> list[Role]:
-        roles: list[Role] = self.get(search)
-
-        for role in roles:
-            role.remove()
-
-        return roles
+        return self._storage.delete_roles(
+            [r.getid() for r in self.get(search)],
+        )
 
     def delete_udto(
         self,
@@ -410,16 +526,10 @@ class RoleService(Service):
             "user_ids": (str, ["$push", "$pull"]),
         })
 
-        # TODO(ryzhovalex):
-        #   remove when Document.update start supporting
-        #   direct query dict
-        return role._parse_document(  # noqa: SLF001
-            role._get_mongo().update_one(  # noqa: SLF001
-                role._get_collection(),  # noqa: SLF001
-                {"_id": ObjectId(role.getid())},
-                query,
-            ),
-        )
+        if "$push" in query and "user_ids" in query["$push"]:
+            self._add_members([query["$push"]["user_ids"]])
+
+        return self._storage.update_roles({role.getid(): query})[0]
 
     def patch_one_udto(
         self,
@@ -442,14 +552,154 @@ class RoleService(Service):
             Log.info("[orwynn_rbac] no permissions to unlink from roles")
             return
 
-        for r in roles:
-            r.update(operators={
+        self._storage.update_roles({
+            r.getid(): {
                 "$pull": {
                     "permission_ids": {
                         "$in": permission_ids,
                     },
                 },
-            })
+            } for r in roles
+        })
+
+    def reconcile_defaults(
+        self,
+        default_roles: list[DefaultRole],
+        unauthorized_user_permissions: list[str] | None = None,
+        authorized_user_permissions: list[str] | None = None,
+        *,
+        is_dry_run: bool = False,
+    ) -> DefaultRolesReport:
+        """
+        Makes stored roles match given default definitions.
+
+        Stored permissions and roles are read with one query each. Missing
+        roles are created with one insert, and permissions, titles and
+        descriptions of existing roles are corrected with one bulk update.
+        Users of roles and roles not given in definitions are left as they
+        are, so the call is idempotent and makes no writes if nothing has
+        changed.
+
+        Note that permissions of the builtin dynamic roles are also reset
+        to the given ones, discarding changes made by API clients.
+
+        Args:
+            default_roles:
+                List of default roles to reconcile.
+            unauthorized_user_permissions(optional):
+                Permission names of the "dynamic:unauthorized" role.
+            authorized_user_permissions(optional):
+                Permission names of the "dynamic:authorized" role.
+            is_dry_run(optional):
+                Whether to only report the changes without applying them.
+
+        Returns:
+            Report of made or, for a dry run, needed changes.
+
+        Raises:
+            NotFoundError:
+                Some permission names of a default role do not exist.
+        """
+        final_default_roles: list[DefaultRole] = self._get_final_default_roles(
+            default_roles,
+            unauthorized_user_permissions,
+            authorized_user_permissions,
+        )
+
+        permission_ids_by_name: dict[str, str] = {}
+        with contextlib.suppress(NotFoundError):
+            permission_ids_by_name = {
+                p.name: p.getid()
+                for p in self._permission_service.get(PermissionSearch())
+            }
+        permission_names_by_id: dict[str, str] = {
+            id: name for name, id in permission_ids_by_name.items()
+        }
+
+        stored_by_name: dict[str, Role] = {}
+        with contextlib.suppress(NotFoundError):
+            for role in self.get(RoleSearch(
+                names=[r.name for r in final_default_roles],
+            )):
+                stored_by_name.setdefault(role.name, role)
+
+        changes: list[DefaultRoleChange] = []
+        created_roles: list[Role] = []
+        operations: dict[str, dict[str, Any]] = {}
+
+        for default_role in final_default_roles:
+            missing_names: list[str] = [
+                name for name in default_role.permission_names
+                if name not in permission_ids_by_name
+            ]
+            if missing_names:
+                raise NotFoundError(
+                    title=\
+                        "some/all permissions for default role permission"
+                        " names",
+                    value=missing_names,
+                    options={
+                        "default_role_name": default_role.name,
+                    },
+                )
+            permission_ids: list[str] = [
+                permission_ids_by_name[name]
+                for name in default_role.permission_names
+            ]
+
+            stored: Role | None = stored_by_name.get(default_role.name, None)
+            if stored is None:
+                created_roles.append(Role(
+                    name=default_role.name,
+                    title=default_role.title,
+                    description=default_role.description,
+                    permission_ids=permission_ids,
+                    is_dynamic=NamingUtils.has_dynamic_prefix(
+                        default_role.name,
+                    ),
+                ))
+                changes.append(DefaultRoleChange(
+                    name=default_role.name,
+                    is_created=True,
+                    added_permission_names=default_role.permission_names,
+                ))
+                continue
+
+            operation: dict[str, Any] = self._get_reconcile_operation(
+                stored, default_role, permission_ids,
+            )
+            if not operation:
+                continue
+
+            operations[stored.getid()] = operation
+            changes.append(DefaultRoleChange(
+                name=stored.name,
+                id=stored.getid(),
+                added_permission_names=[
+                    permission_names_by_id[id] for id in permission_ids
+                    if id not in stored.permission_ids
+                ],
+                removed_permission_names=[
+                    permission_names_by_id.get(id, id)
+                    for id in stored.permission_ids
+                    if id not in permission_ids
+                ],
+                updated_fields=list(operation.get("$set", {}).keys()),
+            ))
+
+        if not is_dry_run:
+            created_ids: list[str] = [
+                r.getid() for r in self._storage.create_roles(created_roles)
+            ] if created_roles else []
+            if operations:
+                self._storage.update_roles(operations)
+
+            created_changes: list[DefaultRoleChange] = \
+                [c for c in changes if c.is_created]
+            for change, id in zip(created_changes, created_ids, strict=True):
+                change.id = id
+
+        return DefaultRolesReport(changes=changes, is_dry_run=is_dry_run)
 
     def _init_defaults_internal(
         self,
@@ -465,9 +715,30 @@ class RoleService(Service):
         Args:
             default_roles:
                 List of default roles to initialize.
+
+        Returns:
+            Created roles.
         """
-        roles: list[Role] = []
+        report: DefaultRolesReport = self.reconcile_defaults(
+            default_roles,
+            unauthorized_user_permissions,
+            authorized_user_permissions,
+        )
+
+        created_ids: list[str] = [
+            c.id for c in report.changes
+            if c.is_created and c.id is not None
+        ]
+        if not created_ids:
+            return []
+        return self.get(RoleSearch(ids=created_ids))
 
+    @staticmethod
+    def _get_final_default_roles(
+        default_roles: list[DefaultRole],
+        unauthorized_user_permissions: list[str] | None,
+        authorized_user_permissions: list[str] | None,
+    ) -> list[DefaultRole]:
         final_default_roles: list[DefaultRole] = [
             DefaultRole(
                 name="dynamic:unauthorized",
@@ -487,40 +758,49 @@ class RoleService(Service):
 
         final_default_roles.extend(default_roles)
 
-        for default_role in final_default_roles:
-            default_role_permissions: list[Permission]
-            try:
-                default_role_permissions = self._permission_service.get(
-                    PermissionSearch(
-                        names=default_role.permission_names,
-                    ),
-                )
-            except NotFoundError:
-                default_role_permissions = []
+        return final_default_roles
 
-            permission_ids: list[str] = [
-                p.getid() for p in default_role_permissions
-            ]
+    @staticmethod
+    def _get_reconcile_operation(
+        stored: Role,
+        default_role: DefaultRole,
+        permission_ids: list[str],
+    ) -> dict[str, Any]:
+        """
+        Returns update operation making the stored role match its default
+        definition or an empty dict if the role already matches it.
+        """
+        operation: dict[str, Any] = {}
 
-            if len(permission_ids) != len(default_role.permission_names):
-                raise NotFoundError(
-                    title=\
-                        "some/all permissions for default role permission"
-                        " names",
-                    value=default_role.permission_names,
-                    options={
-                        "default_role_name": default_role.name,
-                    },
-                )
+        fields_to_set: dict[str, Any] = {
+            field: getattr(default_role, field)
+            for field in ("title", "description")
+            if getattr(stored, field) != getattr(default_role, field)
+        }
 
-            roles.append(self.create([RoleCreate(
-                name=default_role.name,
-                title=default_role.title,
-                description=default_role.description,
-                permission_ids=permission_ids,
-            )])[0])
+        added_ids: list[str] = [
+            id for id in permission_ids if id not in stored.permission_ids
+        ]
+        removed_ids: list[str] = [
+            id for id in stored.permission_ids if id not in permission_ids
+        ]
+        # Mongo rejects $addToSet and $pull of the same field in one update,
+        # so the whole list is overwritten if both are needed
+        if added_ids and removed_ids:
+            fields_to_set["permission_ids"] = permission_ids
+        elif added_ids:
+            operation["$addToSet"] = {
+                "permission_ids": {"$each": added_ids},
+            }
+        elif removed_ids:
+            operation["$pull"] = {
+                "permission_ids": {"$in": removed_ids},
+            }
+
+        if fields_to_set:
+            operation["$set"] = fields_to_set
 
-        return roles
+        return operation
 
     def convert_one_to_udto(
         self,
@@ -556,10 +836,122 @@ class RoleService(Service):
     #         )
 
 
+class _ResolvedUser:
+    """
+    Roles and permissions resolved for a user.
+    """
+    __slots__ = ("role_ids", "permissions", "_names_by_action")
+
+    def __init__(
+        self,
+        role_ids: frozenset[str],
+        permissions: list[Permission],
+    ) -> None:
+        self.role_ids: frozenset[str] = role_ids
+        self.permissions: list[Permission] = permissions
+        self._names_by_action: dict[tuple[str, str], set[str]] | None = None
+
+    def get_permission_names_for_action(
+        self,
+        controller_key: str,
+        method: str,
+    ) -> set[str]:
+        """
+        Returns names of user's permissions having the action.
+
+        Permissions are indexed by their actions on the first call.
+        """
+        if self._names_by_action is None:
+            names_by_action: dict[tuple[str, str], set[str]] = {}
+            for p in self.permissions:
+                for a in p.actions or []:
+                    names_by_action.setdefault(
+                        (a.controller_key, a.method.lower()), set(),
+                    ).add(p.name)
+            self._names_by_action = names_by_action
+
+        return self._names_by_action.get((controller_key, method), set())
+
+
+class _AccessMemo:
+    """
+    Request-scoped memo of resolved users and decisions.
+
+    Forbidden decisions are stored as None contexts.
+    """
+    def __init__(self) -> None:
+        self.users: dict[str | None, _ResolvedUser] = {}
+        self.contexts: dict[
+            tuple[str | None, str, str], AccessContext | None,
+        ] = {}
+
+
+# stands for any authorized user without roles while their dynamic roles
+# are linked
+_AnyAuthorizedUserId: str = "<any-authorized-user>"
+
+_AccessMemoVar: ContextVar[_AccessMemo | None] = ContextVar(
+    "orwynn_rbac_access_memo", default=None,
+)
+
+
+class _ExplainStepRecorder:
+    """
+    Times a step of an explained check and counts storage operations made
+    within it.
+    """
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.caches: list[str] = []
+        self._counter: QueryCounter
+        self._counter_scope: contextlib.AbstractContextManager[QueryCounter]
+
+    @property
+    def query_count(self) -> int:
+        return self._counter.total
+
+    def __enter__(self) -> "_ExplainStepRecorder":
+        self._counter_scope = count_queries()
+        self._counter = self._counter_scope.__enter__()
+        self._started_at: float = time.perf_counter()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.seconds: float = time.perf_counter() - self._started_at
+        self._counter_scope.__exit__(None, None, None)
+
+    def to_step(self) -> ExplainStep:
+        return ExplainStep(
+            name=self.name,
+            seconds=self.seconds,
+            query_count=self.query_count,
+            caches=self.caches,
+        )
+
+
 class AccessService(Service):
     """
     Checks if user has an access to action.
+
+    Concurrent permission lookups for the same user are coalesced into one
+    lookup within the worker.
+
+    Attributes:
+        CompiledPolicyTTL:
+            Seconds the compiled policy and permissions of authorized users
+            without roles are reused for. They are also recomputed on any
+            write to roles or permissions made by this process. An expired
+            policy is recompiled in background and served until then.
+        PermissionTokenTTL:
+            Default seconds a minted permission token is valid for.
+        UnmatchedRouteCacheSize:
+            Maximum amount of remembered routes not matched by any
+            controller.
     """
+    CompiledPolicyTTL: float = 5.0
+    PermissionTokenTTL: int = 900
+    UnmatchedRouteCacheSize: int = 4096
+
     def __init__(
         self,
         role_service: RoleService,
@@ -570,144 +962,1073 @@ class AccessService(Service):
         self._role_service = role_service
         self._permission_service = permission_service
 
+        self._users_flight: SingleFlight[_ResolvedUser] = SingleFlight()
+
+        self._policy_lock: threading.Lock = threading.Lock()
+        self._policy: CompiledPolicy | None = None
+        self._policy_revision: int = -1
+        self._policy_compiled_at: float = 0.0
+        self._is_policy_refreshing: bool = False
+
+        self._authorized_user_lock: threading.Lock = threading.Lock()
+        self._authorized_user: _ResolvedUser | None = None
+        self._authorized_user_revision: int = -1
+        self._authorized_user_resolved_at: float = 0.0
+
+        self._token_signer: PermissionTokenSigner | None = None
+
+        self._controller_matcher_key: tuple[int, ...] = ()
+        self._controller_matcher: MethodRouteMatcher = MethodRouteMatcher([])
+        self._unmatched_routes: TTLCache[tuple[str, str], bool] = \
+            TTLCache(self.UnmatchedRouteCacheSize)
+        self._role_resolver: RoleResolver = StorageRoleResolver()
+
+        self.metrics: RBACMetrics = RBACMetrics()
+        self.metrics.add_cache(
+            "unmatched_routes", lambda: self._unmatched_routes.stats,
+        )
+        self.metrics.add_gauge(
+            "policy_age_seconds",
+            "Seconds passed since the access policy has been compiled.",
+            self._get_policy_age,
+        )
+        self.metrics.use_query_stats(lambda: self.query_stats)
+
+        self.profiler: CheckProfiler = CheckProfiler()
+
+    def use_storage(self, storage: RBACStorage) -> None:
+        """
+        Sets storage backend for all RBAC services.
+        """
+        # role service passes the storage to the permission service itself
+        self._role_service.use_storage(storage)
+
+    def use_token_key(self, key: bytes) -> None:
+        """
+        Sets a key permission tokens are signed with.
+        """
+        self._token_signer = PermissionTokenSigner(key)
+
+    @property
+    def revision(self) -> int:
+        """
+        Revision of the used storage.
+
+        Changed on every write of roles or permissions made by this process.
+        """
+        return self._role_service.storage.revision
+
+    @property
+    def query_stats(self) -> QueryStats:
+        """
+        Counters and latency histograms of operations made by the used
+        storage.
+        """
+        return self._role_service.storage.instrumentation.stats
+
     def check_user(
         self,
         user_id: str | None,
         route: str,
         method: str,
-    ) -> None:
+    ) -> AccessContext:
         """
         Checks whether the user has an access to the route and method.
 
         If user id is None, it is considered that the request is made from an
         unauthorized client.
 
+        Returns:
+            Access context resolved during the check, so the caller does not
+            need to query user's roles and permissions again.
+
         Raises:
             ForbiddenError:
                 User does not have an access.
+            NotFoundError:
+                No controller found for the route and method.
         """
-        controllers: list[Controller] = Di.ie().controllers
+        started_at: float = time.perf_counter()
+        memo: _AccessMemo | None = _AccessMemoVar.get()
+        memo_key: tuple[str | None, str, str] = (user_id, route, method)
 
-        permissions: list[Permission] = self._get_permissions_for_user_id(
-            user_id,
+        context: AccessContext | None
+        try:
+            if memo is not None and memo_key in memo.contexts:
+                context = memo.contexts[memo_key]
+            else:
+                with self.profiler.profile_check(), span(
+                    "rbac.check_user", route=route, method=method,
+                ):
+                    context = self._check_user(user_id, route, method)
+                if memo is not None:
+                    memo.contexts[memo_key] = context
+        except NotFoundError:
+            self.metrics.record_decision(
+                AccessDecision.RouteNotFound,
+                time.perf_counter() - started_at,
+            )
+            raise
+
+        self.metrics.record_decision(
+            AccessDecision.Forbidden if context is None
+            else AccessDecision.Allowed,
+            time.perf_counter() - started_at,
         )
 
-        # also pass empty permission list, since it can be an uncovered
-        # controller where everyone is allowed
-        if not self._is_any_permission_matched(
-            permissions,
-            route,
-            method,
-            controllers,
-        ):
+        if context is None:
             raise ForbiddenResourceError(
                 user=user_id,
                 method=method,
                 route=route,
             )
 
-    def _get_unauthorized_permissions(self) -> list[Permission]:
-        try:
-            return self._permission_service.get(PermissionSearch(
-                ids=list(self._role_service.get(
-                    RoleSearch(names=["dynamic:unauthorized"]),
-                )[0].permission_ids),
-            ))
-        except NotFoundError:
-            return []
+        return context
 
-    def _get_permissions_for_user_id(
+    def explain(
         self,
         user_id: str | None,
-    ) -> list[Permission]:
-        if user_id is None:
-            # check if the requested route allows for unauthorized users
-            return self._get_unauthorized_permissions()
-        else:
-            user_roles: list[Role] = []
-            try:
-                user_roles = self._role_service.get(
-                    RoleSearch(user_ids=[user_id]),
-                )
-            except NotFoundError:
-                # check if the requested route allows for authorized users
-                # without any permissions
-                try:
-                    return self._permission_service.get(PermissionSearch(
-                        ids=list(self._role_service.get(
-                            RoleSearch(names=["dynamic:authorized"]),
-                        )[0].permission_ids),
+        route: str,
+        method: str,
+    ) -> AccessExplanation:
+        """
+        Makes the same check as `check_user`, but explains the decision
+        instead of raising on it.
+
+        Every step of the check is timed and reports storage operations made
+        and caches used, so both wrong and slow decisions can be diagnosed.
+        Explained checks are not recorded to metrics.
+
+        Finding roles supplied the required permission takes one more
+        storage query, which is reported as a separate step.
+        """
+        started_at: float = time.perf_counter()
+        method = method.lower()
+        steps: list[_ExplainStepRecorder] = []
+
+        def explanation(
+            decision: AccessDecision,
+            **kwargs: Any,
+        ) -> AccessExplanation:
+            return AccessExplanation(
+                user_id=user_id,
+                route=route,
+                method=method,
+                decision=decision,
+                steps=[s.to_step() for s in steps],
+                seconds=time.perf_counter() - started_at,
+                **kwargs,
+            )
+
+        with _ExplainStepRecorder("route_resolution") as step:
+            steps.append(step)
+            if self._unmatched_routes.get((route, method))[0]:
+                step.caches.append("unmatched_routes")
+            matched: tuple[str, Controller] | None = self._match_controller(
+                route, method, Di.ie().controllers,
+            )
+        if matched is None:
+            return explanation(AccessDecision.RouteNotFound)
+        controller_key, controller = matched
+
+        with _ExplainStepRecorder("user_resolution") as step:
+            steps.append(step)
+            memo: _AccessMemo | None = _AccessMemoVar.get()
+            if memo is not None and user_id in memo.users:
+                step.caches.append("request_memo")
+            elif (
+                user_id is not None
+                and not self._role_service.may_have_roles(user_id)
+            ):
+                step.caches.append("members_filter")
+            user: _ResolvedUser = self._resolve_user_id(user_id)
+            if "members_filter" in step.caches and step.query_count == 0:
+                step.caches.append("authorized_user")
+
+        with _ExplainStepRecorder("permission_matching") as step:
+            steps.append(step)
+            ControllerPermissions: dict[str, str] = \
+                getattr(controller, "Permissions", None) or {}
+            required_permission_name: str | None = \
+                ControllerPermissions.get(method, None)
+            is_permitted: bool = self._is_controller_permitted(
+                user, controller_key, controller, method,
+            )
+
+        granting_role_ids: list[str] = []
+        if is_permitted:
+            with _ExplainStepRecorder("role_attribution") as step:
+                steps.append(step)
+                granting_role_ids = self._get_granting_role_ids(
+                    user, controller_key, method, required_permission_name,
+                )
+
+        return explanation(
+            AccessDecision.Allowed if is_permitted
+            else AccessDecision.Forbidden,
+            controller_key=controller_key,
+            controller_route=controller.Route,
+            required_permission_name=required_permission_name,
+            is_uncovered=required_permission_name is None,
+            role_ids=sorted(user.role_ids),
+            granting_role_ids=granting_role_ids,
+        )
+
+    @contextlib.contextmanager
+    def request_scope(self) -> Iterator[None]:
+        """
+        Memoizes resolved permissions and decisions within the scope.
+
+        Nested checks made in the same request (i.e. in the same context)
+        reuse already made decisions and resolved permissions instead of
+        resolving them again.
+
+        Example:
+        ```python
+        with access_service.request_scope():
+            access_service.check_user(user_id, route, method)
+            response = await call_next(request)
+        ```
+        """
+        token: Token = _AccessMemoVar.set(_AccessMemo())
+        try:
+            yield
+        finally:
+            _AccessMemoVar.reset(token)
+
+    def check_many(
+        self,
+        checks: list[tuple[str | None, str, str]],
+    ) -> list[AccessDecision]:
+        """
+        Checks many (user id, route, method) tuples at once.
+
+        Routes are matched first, so users of unknown routes are not
+        resolved. Roles and permissions of all distinct remaining users are
+        resolved with one query each, instead of resolving them separately
+        for every check.
+
+        Returns:
+            Access decision for each check in the order of given checks.
+        """
+        controllers: list[Controller] = Di.ie().controllers
+
+        matched_controllers: list[tuple[str, Controller] | None] = [
+            self._match_controller(route, method, controllers)
+            for _, route, method in checks
+        ]
+
+        users: dict[str | None, _ResolvedUser] = self._resolve_user_ids({
+            check[0]
+            for check, matched in zip(checks, matched_controllers, strict=True)
+            if matched is not None
+        })
+
+        decisions: list[AccessDecision] = []
+        for (user_id, _, method), matched in zip(
+            checks, matched_controllers, strict=True,
+        ):
+            if matched is None:
+                decisions.append(AccessDecision.RouteNotFound)
+            elif self._is_controller_permitted(
+                users[user_id], *matched, method,
+            ):
+                decisions.append(AccessDecision.Allowed)
+            else:
+                decisions.append(AccessDecision.Forbidden)
+
+        for decision in decisions:
+            self.metrics.record_decision(decision)
+
+        return decisions
+
+    def compile_policy(self) -> CompiledPolicy:
+        """
+        Compiles current controllers, roles and permissions into an
+        in-memory policy.
+
+        Reads all roles and permissions with one query each.
+        """
+        permission_names_by_id: dict[str, str] = {}
+        with contextlib.suppress(NotFoundError):
+            permission_names_by_id = {
+                p.getid(): p.name
+                for p in self._permission_service.get(PermissionSearch())
+            }
+
+        roles: list[Role] = []
+        with contextlib.suppress(NotFoundError):
+            roles = self._role_service.get(RoleSearch())
+
+        permission_names_by_role_id: dict[str, list[str]] = {}
+        role_ids_by_user_id: dict[str, list[str]] = {}
+        role_ids_by_name: dict[str, str] = {}
+        dynamic_role_ids_by_name: dict[str, str] = {}
+        dynamic_permission_names: dict[str, list[str]] = {}
+
+        for role in roles:
+            permission_names: list[str] = [
+                permission_names_by_id[id] for id in role.permission_ids
+                if id in permission_names_by_id
+            ]
+
+            if role.is_dynamic:
+                dynamic_permission_names[role.name] = permission_names
+                dynamic_role_ids_by_name[role.name] = role.getid()
+                continue
+
+            permission_names_by_role_id[role.getid()] = permission_names
+            role_ids_by_name[role.name] = role.getid()
+            for user_id in role.user_ids:
+                role_ids_by_user_id.setdefault(user_id, []).append(
+                    role.getid(),
+                )
+
+        return CompiledPolicy(PolicySnapshot(
+            routes=[
+                self._compile_policy_route(c)
+                for c in Di.ie().controllers
+            ],
+            permission_names_by_role_id=permission_names_by_role_id,
+            role_ids_by_user_id=role_ids_by_user_id,
+            unauthorized_permission_names=dynamic_permission_names.get(
+                "dynamic:unauthorized", [],
+            ),
+            authorized_permission_names=dynamic_permission_names.get(
+                "dynamic:authorized", [],
+            ),
+            role_ids_by_name=role_ids_by_name,
+            dynamic_role_ids_by_name=dynamic_role_ids_by_name,
+        ))
+
+    def get_compiled_policy(self) -> CompiledPolicy:
+        """
+        Returns the compiled policy.
+
+        The policy is compiled in place only on the first call and after
+        roles or permissions have been changed by this process. A policy
+        compiled more than `CompiledPolicyTTL` seconds ago is recompiled in
+        a background thread, while the current one keeps being returned, so
+        checks do not wait for storage reads.
+        """
+        with self._policy_lock:
+            revision: int = self.revision
+            if self._policy is None or self._policy_revision != revision:
+                self._set_policy(self.compile_policy(), revision)
+            elif (
+                not self._is_policy_refreshing
+                and time.monotonic() - self._policy_compiled_at
+                >= self.CompiledPolicyTTL
+            ):
+                self._is_policy_refreshing = True
+                threading.Thread(
+                    target=self._refresh_policy,
+                    name="orwynn-rbac-policy-refresh",
+                    daemon=True,
+                ).start()
+
+            return self._policy
+
+    def mint_token(
+        self,
+        user_id: str,
+        ttl: int | None = None,
+    ) -> str:
+        """
+        Mints a signed permission token for the user, e.g. on login.
+
+        The token carries user's role ids, so access can be checked by
+        `check_token` without any storage call. Since the token is not
+        revoked on user's role changes, its lifetime should be short.
+
+        Args:
+            user_id:
+                Id of the user to mint token for.
+            ttl(optional):
+                Seconds the token is valid for. Defaults to
+                `PermissionTokenTTL`.
+
+        Raises:
+            PermissionTokenKeyNotSetError:
+                No key to sign the token with is set.
+        """
+        signer: PermissionTokenSigner = self._get_token_signer()
+
+        return signer.mint(PermissionToken(
+            user_id=user_id,
+            permissions_version=self.get_compiled_policy().permissions_version,
+            role_ids=sorted(
+                self._role_service.storage.get_role_ids_for_users(
+                    [user_id],
+                ).get(user_id, set()),
+            ),
+            expires_at=int(time.time()) + (
+                self.PermissionTokenTTL if ttl is None else ttl
+            ),
+        ))
+
+    def check_token(
+        self,
+        token: str,
+        route: str,
+        method: str,
+    ) -> AccessContext:
+        """
+        Checks whether the user the token is minted for has an access to the
+        route and method.
+
+        The check is made against the in-memory compiled policy. Only if the
+        token's permissions version is stale, i.e. routes or permissions of
+        roles have been changed since the token was minted, user's roles are
+        taken from the storage.
+
+        Raises:
+            ForbiddenError:
+                User does not have an access or the token is malformed, has
+                a wrong signature or is expired. `InvalidPermissionTokenError`
+                explaining the latter is chained as the cause.
+            NotFoundError:
+                No controller found for the route and method.
+        """
+        try:
+            payload: PermissionToken = self._get_token_signer().verify(token)
+        except InvalidPermissionTokenError as err:
+            raise ForbiddenResourceError(
+                user=None,
+                method=method,
+                route=route,
+            ) from err
+        policy: CompiledPolicy = self.get_compiled_policy()
+
+        if payload.permissions_version != policy.permissions_version:
+            return self.check_user(payload.user_id, route, method)
+
+        return self.check_role_ids(
+            payload.user_id,
+            frozenset(payload.role_ids),
+            route,
+            method,
+            policy=policy,
+        )
+
+    def use_role_resolver(self, resolver: RoleResolver) -> None:
+        """
+        Sets a resolver of user roles for `check_subject` and
+        `check_subjects`.
+        """
+        self._role_resolver = resolver
+
+    async def check_subject(
+        self,
+        subject: RoleSubject,
+        route: str,
+        method: str,
+        *,
+        policy: CompiledPolicy | None = None,
+    ) -> AccessContext:
+        """
+        Checks whether the subject has an access to the route and method.
+
+        Subject's roles are resolved by the set role resolver, and their
+        permissions are taken from the compiled policy. If the policy has to
+        be compiled, it is compiled in a thread.
+
+        Args:
+            policy(optional):
+                Compiled policy to check against. Defaults to the current
+                one.
+
+        Raises:
+            ForbiddenError:
+                Subject does not have an access.
+            NotFoundError:
+                No controller found for the route and method.
+        """
+        policy = policy or await self._get_compiled_policy_in_thread()
+        role_ids: frozenset[str] | None = (await self._role_resolver.resolve(
+            [subject], policy, self._role_service.storage,
+        ))[0]
+
+        return self.check_role_ids(
+            subject.user_id,
+            role_ids or frozenset(),
+            route,
+            method,
+            policy=policy,
+        )
+
+    async def check_subjects(
+        self,
+        checks: list[tuple[RoleSubject, str, str]],
+    ) -> list[AccessDecision]:
+        """
+        Checks many (subject, route, method) tuples with one call of the
+        role resolver.
+
+        Returns:
+            Access decision for each check in the order of given checks.
+        """
+        policy: CompiledPolicy = await self._get_compiled_policy_in_thread()
+        all_role_ids: list[frozenset[str] | None] = \
+            await self._role_resolver.resolve(
+                [c[0] for c in checks], policy, self._role_service.storage,
+            )
+
+        decisions: list[AccessDecision] = [
+            self._decide_role_ids(
+                policy,
+                subject.user_id,
+                role_ids or frozenset(),
+                route,
+                method,
+            )[0]
+            for (subject, route, method), role_ids in zip(
+                checks, all_role_ids, strict=True,
+            )
+        ]
+
+        for decision in decisions:
+            self.metrics.record_decision(decision)
+
+        return decisions
+
+    def check_role_ids(  # noqa: PLR0913
+        self,
+        user_id: str | None,
+        role_ids: frozenset[str],
+        route: str,
+        method: str,
+        *,
+        policy: CompiledPolicy | None = None,
+    ) -> AccessContext:
+        """
+        Checks whether a user having given roles has an access to the route
+        and method.
+
+        Permissions of the roles are taken from the compiled policy without
+        any storage call.
+
+        Args:
+            user_id:
+                Id of the user or None for an unauthorized client, which
+                roles are ignored.
+            role_ids:
+                Ids of user's non-dynamic roles. A user without roles gets
+                permissions of authorized users.
+            route:
+                Route to check.
+            method:
+                Method to check.
+            policy(optional):
+                Compiled policy to check against. Defaults to the cached
+                one.
+
+        Raises:
+            ForbiddenError:
+                User does not have an access.
+            NotFoundError:
+                No controller found for the route and method.
+        """
+        started_at: float = time.perf_counter()
+
+        decision: AccessDecision
+        context: AccessContext | None
+        decision, context = self._decide_role_ids(
+            policy or self.get_compiled_policy(),
+            user_id,
+            role_ids,
+            route,
+            method,
+        )
+        self.metrics.record_decision(
+            decision, time.perf_counter() - started_at,
+        )
+
+        if decision is AccessDecision.RouteNotFound:
+            raise NotFoundError(
+                title="no controllers found for route",
+                value=route,
+            )
+        if context is None:
+            raise ForbiddenResourceError(
+                user=user_id,
+                method=method,
+                route=route,
+            )
+
+        return context
+
+    def _decide_role_ids(  # noqa: PLR0913
+        self,
+        policy: CompiledPolicy,
+        user_id: str | None,
+        role_ids: frozenset[str],
+        route: str,
+        method: str,
+    ) -> tuple[AccessDecision, AccessContext | None]:
+        """
+        Returns:
+            Decision and the access context if the access is allowed.
+        """
+        policy_route: PolicyRoute | None = policy.match_policy_route(
+            route, method,
+        )
+        if policy_route is None:
+            return AccessDecision.RouteNotFound, None
+
+        if user_id is None:
+            role_ids = frozenset()
+        permission_names: frozenset[str] = (
+            policy.get_permission_names_for_user_id(None)
+            if user_id is None
+            else policy.get_permission_names_for_user_role_ids(role_ids)
+        )
+
+        if not policy.is_permitted(
+            permission_names,
+            policy_route.permission_names,
+            method,
+        ):
+            return AccessDecision.Forbidden, None
+
+        return AccessDecision.Allowed, AccessContext(
+            user_id=user_id,
+            # the same roles as in contexts of checks resolving users from
+            # the storage
+            role_ids=policy.link_dynamic_role_ids(user_id, role_ids),
+            permission_names=permission_names,
+            controller_route=policy_route.route,
+            method=method.lower(),
+        )
+
+    async def _get_compiled_policy_in_thread(self) -> CompiledPolicy:
+        """
+        Returns the compiled policy, compiling it in a thread if it has to
+        be compiled in place, so the event loop is not blocked by storage
+        reads.
+        """
+        if self._policy is None or self._policy_revision != self.revision:
+            return await asyncio.to_thread(self.get_compiled_policy)
+        return self.get_compiled_policy()
+
+    def _set_policy(self, policy: CompiledPolicy, revision: int) -> None:
+        self._policy = policy
+        self._policy_revision = revision
+        self._policy_compiled_at = time.monotonic()
+
+    def _refresh_policy(self) -> None:
+        try:
+            revision: int = self.revision
+            policy: CompiledPolicy = self.compile_policy()
+            with self._policy_lock:
+                # a policy compiled in place for a newer revision is kept
+                if self._policy_revision == revision:
+                    self._set_policy(policy, revision)
+        except Exception as err:  # noqa: BLE001
+            Log.error(f"[orwynn_rbac] policy refresh failed: {err!r}")
+        finally:
+            with self._policy_lock:
+                self._is_policy_refreshing = False
+
+    def _get_policy_age(self) -> float | None:
+        if self._policy is None:
+            return None
+        return time.monotonic() - self._policy_compiled_at
+
+    def _get_token_signer(self) -> PermissionTokenSigner:
+        if self._token_signer is None:
+            raise PermissionTokenKeyNotSetError
+        return self._token_signer
+
+    def _compile_policy_route(self, controller: Controller) -> PolicyRoute:
+        ControllerPermissions: dict[str, str] = \
+            getattr(controller, "Permissions", None) or {}
+
+        return PolicyRoute(
+            abstract_routes=sorted(controller.final_routes),
+            permission_names={
+                m.value: ControllerPermissions.get(m.value, None)
+                for m in URLMethod
+                if self._controller_has_method(controller, m.value)
+            },
+            route=controller.Route,
+        )
+
+    def _check_user(
+        self,
+        user_id: str | None,
+        route: str,
+        method: str,
+    ) -> AccessContext | None:
+        controllers: list[Controller] = Di.ie().controllers
+
+        # unknown routes are rejected before any storage call
+        controller_key: str
+        controller: Controller
+        with span("rbac.route_resolution"):
+            controller_key, controller = self._find_controller(
+                route, method, controllers,
+            )
+
+        with span("rbac.user_resolution"):
+            user: _ResolvedUser = self._resolve_user_id(user_id)
+
+        # also pass empty permission list, since it can be an uncovered
+        # controller where everyone is allowed
+        with span("rbac.permission_matching"):
+            is_permitted: bool = self._is_controller_permitted(
+                user, controller_key, controller, method,
+            )
+        if not is_permitted:
+            return None
+
+        return AccessContext(
+            user_id=user_id,
+            role_ids=user.role_ids,
+            permission_names=frozenset(p.name for p in user.permissions),
+            controller_route=controller.Route,
+            method=method.lower(),
+        )
+
+    def _resolve_user_id(
+        self,
+        user_id: str | None,
+    ) -> _ResolvedUser:
+        memo: _AccessMemo | None = _AccessMemoVar.get()
+        if memo is not None and user_id in memo.users:
+            return memo.users[user_id]
+
+        user: _ResolvedUser = self._users_flight.do(
+            user_id,
+            lambda: self._resolve_user_ids([user_id])[user_id],
+        )
+
+        if memo is not None:
+            memo.users[user_id] = user
+        return user
+
+    def _resolve_user_ids(
+        self,
+        user_ids: Iterable[str | None],
+    ) -> dict[str | None, _ResolvedUser]:
+        """
+        Resolves roles and permissions for each of the given users.
+
+        Users definitely having no roles get cached permissions of the
+        authorized users. For the rest, roles of all users are fetched with
+        one query, builtin dynamic roles are fetched with one more query only
+        if some user needs them, and permissions of all found roles are
+        fetched with one query.
+        """
+        result: dict[str | None, _ResolvedUser] = {}
+        requested_user_ids: set[str | None] = set()
+        for id in user_ids:
+            if id is None or self._role_service.may_have_roles(id):
+                requested_user_ids.add(id)
+            else:
+                result[id] = self._get_authorized_user()
+        if not requested_user_ids:
+            return result
+
+        permission_ids_by_role_id: dict[str, list[str]] = {}
+
+        with span("rbac.role_lookup", user_count=len(requested_user_ids)):
+            role_ids_by_user_id: dict[str | None, set[str]] = \
+                self._get_role_ids_by_user_id(
+                    requested_user_ids, permission_ids_by_role_id,
+                )
+            self._link_dynamic_roles(
+                role_ids_by_user_id, permission_ids_by_role_id,
+            )
+
+        permission_ids: set[str] = set()
+        for role_permission_ids in permission_ids_by_role_id.values():
+            permission_ids.update(role_permission_ids)
+        permissions_by_id: dict[str, Permission] = {}
+        if permission_ids:
+            with span(
+                "rbac.permission_lookup",
+                permission_count=len(permission_ids),
+            ), contextlib.suppress(NotFoundError):
+                permissions_by_id = {
+                    p.getid(): p
+                    for p in self._permission_service.get(PermissionSearch(
+                        ids=list(permission_ids),
                     ))
-                except NotFoundError:
-                    return []
+                }
+
+        for id, role_ids in role_ids_by_user_id.items():
+            user_permission_ids: set[str] = set()
+            for role_id in role_ids:
+                user_permission_ids.update(permission_ids_by_role_id[role_id])
+            result[id] = _ResolvedUser(
+                role_ids=frozenset(role_ids),
+                permissions=[
+                    permissions_by_id[permission_id]
+                    for permission_id in user_permission_ids
+                    if permission_id in permissions_by_id
+                ],
+            )
 
-            permission_ids: set[str] = set()
+        return result
 
-            for role in user_roles:
-                permission_ids.update(set(role.permission_ids))
+    def _get_authorized_user(self) -> _ResolvedUser:
+        """
+        Returns cached roles and permissions of authorized users without
+        roles.
+        """
+        with self._authorized_user_lock:
+            revision: int = self.revision
+            if (
+                self._authorized_user is None
+                or self._authorized_user_revision != revision
+                or (
+                    time.monotonic() - self._authorized_user_resolved_at
+                    >= self.CompiledPolicyTTL
+                )
+            ):
+                permission_ids_by_role_id: dict[str, list[str]] = {}
+                # any non-None user id without roles is linked to the
+                # authorized role
+                role_ids_by_user_id: dict[str | None, set[str]] = {
+                    _AnyAuthorizedUserId: set(),
+                }
+                self._link_dynamic_roles(
+                    role_ids_by_user_id, permission_ids_by_role_id,
+                )
 
-            try:
-                return self._permission_service.get(PermissionSearch(
-                    ids=list(permission_ids),
-                ))
-            except NotFoundError:
-                return []
+                permission_ids: list[str] = [
+                    id for ids in permission_ids_by_role_id.values()
+                    for id in ids
+                ]
+                permissions: list[Permission] = []
+                if permission_ids:
+                    with contextlib.suppress(NotFoundError):
+                        permissions = self._permission_service.get(
+                            PermissionSearch(ids=permission_ids),
+                        )
+
+                self._authorized_user = _ResolvedUser(
+                    role_ids=frozenset(
+                        role_ids_by_user_id[_AnyAuthorizedUserId],
+                    ),
+                    permissions=permissions,
+                )
+                self._authorized_user_revision = revision
+                self._authorized_user_resolved_at = time.monotonic()
+
+            return self._authorized_user
+
+    def _get_granting_role_ids(
+        self,
+        user: _ResolvedUser,
+        controller_key: str,
+        method: str,
+        required_permission_name: str | None,
+    ) -> list[str]:
+        """
+        Returns ids of user's roles supplied the required permission, or
+        "dynamic:uncovered" permission if none is required.
+        """
+        permission_ids: set[str] = {
+            p.getid() for p in user.permissions
+            if (
+                p.name == "dynamic:uncovered"
+                if required_permission_name is None
+                else p.name == required_permission_name and any(
+                    a.controller_key == controller_key
+                    and a.method.lower() == method
+                    for a in p.actions or []
+                )
+            )
+        }
+        if not permission_ids or not user.role_ids:
+            return []
+
+        roles: list[Role] = []
+        with contextlib.suppress(NotFoundError):
+            roles = self._role_service.get(
+                RoleSearch(ids=list(user.role_ids)),
+            )
+
+        return sorted(
+            role.getid() for role in roles
+            if permission_ids.intersection(role.permission_ids)
+        )
+
+    def _get_role_ids_by_user_id(
+        self,
+        user_ids: set[str | None],
+        permission_ids_by_role_id: dict[str, list[str]],
+    ) -> dict[str | None, set[str]]:
+        role_ids_by_user_id: dict[str | None, set[str]] = {
+            id: set() for id in user_ids
+        }
+        authorized_user_ids: list[str] = [
+            id for id in user_ids if id is not None
+        ]
+        if not authorized_user_ids:
+            return role_ids_by_user_id
+
+        roles: list[Role] = []
+        with contextlib.suppress(NotFoundError):
+            roles = self._role_service.get(
+                RoleSearch(user_ids=authorized_user_ids),
+            )
+
+        for role in roles:
+            permission_ids_by_role_id[role.getid()] = role.permission_ids
+            for id in role.user_ids:
+                if id in role_ids_by_user_id:
+                    role_ids_by_user_id[id].add(role.getid())
+
+        return role_ids_by_user_id
+
+    def _link_dynamic_roles(
+        self,
+        role_ids_by_user_id: dict[str | None, set[str]],
+        permission_ids_by_role_id: dict[str, list[str]],
+    ) -> None:
+        """
+        Links builtin dynamic roles to users without any role: unauthorized
+        role for None user id and authorized role for the rest.
+        """
+        dynamic_role_names: dict[str | None, str] = {
+            id: "dynamic:unauthorized" if id is None else "dynamic:authorized"
+            for id, role_ids in role_ids_by_user_id.items() if not role_ids
+        }
+        if not dynamic_role_names:
+            return
+
+        dynamic_roles: list[Role] = []
+        with contextlib.suppress(NotFoundError):
+            dynamic_roles = self._role_service.get(RoleSearch(
+                names=list(set(dynamic_role_names.values())),
+            ))
+
+        role_ids_by_name: dict[str, str] = {}
+        for role in dynamic_roles:
+            permission_ids_by_role_id[role.getid()] = role.permission_ids
+            role_ids_by_name[role.name] = role.getid()
+
+        for id, name in dynamic_role_names.items():
+            if name in role_ids_by_name:
+                role_ids_by_user_id[id].add(role_ids_by_name[name])
 
     # TODO(ryzhovalex):
     #   replace this with HttpController.has_method when it comes out
     def _controller_has_method(self, c: Controller, method: str) -> bool:
         return getattr(c, method.lower(), None) is not None
 
-    def _is_any_permission_matched(
+    def _find_controller(
+        self,
+        route: str,
+        method: str,
+        controllers: list[Controller],
+    ) -> tuple[str, Controller]:
+        """
+        Finds the first controller matching the route and supporting the
+        method.
+
+        Returns:
+            Key of the controller and the controller itself.
+
+        Raises:
+            NotFoundError:
+                No controller found.
+        """
+        matched: tuple[str, Controller] | None = self._match_controller(
+            route, method, controllers,
+        )
+        if matched is None:
+            raise NotFoundError(
+                title="no controllers found for route",
+                value=route,
+            )
+        return matched
+
+    def _match_controller(
         self,
-        permissions: list[Permission],
         route: str,
         method: str,
         controllers: list[Controller],
+    ) -> tuple[str, Controller] | None:
+        """
+        Finds the first controller matching the route and supporting the
+        method using precompiled route patterns.
+
+        Unmatched routes are remembered in a bounded cache, so repeated
+        requests to unknown routes are rejected without matching.
+        """
+        method = method.lower()
+        key: tuple[str, str] = (route, method)
+
+        if self._unmatched_routes.get(key)[0]:
+            return None
+
+        i: int | None = self._get_controller_matcher(controllers).match(
+            route, method,
+        )
+        if i is None:
+            self._unmatched_routes.set(key, True)
+            return None
+
+        controller: Controller = controllers[i]
+        return PermissionUtils.get_controller_key(controller), controller
+
+    def _get_controller_matcher(
+        self,
+        controllers: list[Controller],
+    ) -> MethodRouteMatcher:
+        """
+        Returns matcher of controller routes by supported methods.
+
+        Compiled once for the same set of controllers.
+        """
+        key: tuple[int, ...] = tuple(id(c) for c in controllers)
+
+        if key != self._controller_matcher_key:
+            self._controller_matcher = MethodRouteMatcher(
+                [
+                    (
+                        c.final_routes,
+                        [
+                            m.value for m in URLMethod
+                            if self._controller_has_method(c, m.value)
+                        ],
+                    )
+                    for c in controllers
+                ],
+                RouteUtils.get_controller_route_pattern,
+            )
+            self._controller_matcher_key = key
+            self._unmatched_routes.clear()
+
+        return self._controller_matcher
+
+    def _is_controller_permitted(
+        self,
+        user: _ResolvedUser,
+        controller_key: str,
+        c: Controller,
+        method: str,
     ) -> bool:
-        # find matching controller
-        for i, c in enumerate(controllers):
-            if (
-                c.is_matching_route(route)
-                and self._controller_has_method(c, method)
-            ):
-                ControllerPermissions: dict[str, str] | None = getattr(
-                    c, "Permissions", None,
-                )
+        ControllerPermissions: dict[str, str] | None = getattr(
+            c, "Permissions", None,
+        )
 
-                if ControllerPermissions is None:
-                    # controller without permissions is considered uncovered
-                    return "dynamic:uncovered" in {p.name for p in permissions}
-
-                try:
-                    ControllerPermissions[method.lower()]
-                except KeyError:
-                    # such method is uncovered
-                    return "dynamic:uncovered" in {p.name for p in permissions}
-
-
-                # find matching permission for the controller
-                for p in permissions:
-                    if not p.actions:
-                        continue
-
-                    # TODO(ryzhovalex):
-                    #   memorize supported controller numbers for this
-                    #   permission set
-                    for a in p.actions:
-                        if (
-                            a.controller_no == i
-                            and method.lower() == a.method.lower()
-                            and (
-                                ControllerPermissions[a.method.lower()]
-                                == p.name
-                            )
-                        ):
-                            return True
-
-                return False
-
-        raise NotFoundError(
-            title="no controllers found for route",
-            value=route,
+        if ControllerPermissions is None:
+            # controller without permissions is considered uncovered
+            return "dynamic:uncovered" in {p.name for p in user.permissions}
+
+        method = method.lower()
+        try:
+            permission_name: str = ControllerPermissions[method]
+        except KeyError:
+            # such method is uncovered
+            return "dynamic:uncovered" in {p.name for p in user.permissions}
+
+        # find matching permission for the controller
+        return permission_name in user.get_permission_names_for_action(
+            controller_key, method,
         )
@@ -0,0 +1,406 @@
+"""
+Access-decision sidecar serving a compiled policy over a Unix socket.
+
+Every message in both directions is a frame: 4-byte big-endian unsigned
+length followed by the payload of such length. Payloads longer than
+`MaxFrameSize` are rejected before they are read.
+
+Request payload:
+    u32 batch id, u16 checks count, and for each check:
+        u16 user id length (0xFFFF for an unauthorized user) + utf-8 user id
+        u16 route length + utf-8 route
+        u8 method length + ascii method
+
+Response payload:
+    u32 batch id, u16 decisions count and one byte per decision in the order
+    of checks: 0 - allowed, 1 - forbidden, 2 - route not found.
+
+Batches are answered in the order they are received, so a client can
+pipeline any amount of batches on one connection.
+
+Run as `python -m orwynn_rbac.sidecar --policy policy.json --socket path`,
+where the policy file is JSON of `AccessService.compile_policy().snapshot`.
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import struct
+from pathlib import Path
+
+from pykit.errors import UnsupportedError
+
+from orwynn_rbac.enums import AccessDecision
+from orwynn_rbac.errors import MalformedSidecarFrameError
+from orwynn_rbac.models import PolicySnapshot
+from orwynn_rbac.policy import CompiledPolicy
+
+AccessCheck = tuple[str | None, str, str]
+
+AnonymousUserIdLength: int = 0xFFFF
+MaxChecksPerBatch: int = 0xFFFF
+MaxFrameSize: int = 4 * 1024 * 1024
+
+_FrameHeader: struct.Struct = struct.Struct(">I")
+_BatchHeader: struct.Struct = struct.Struct(">IH")
+_U16: struct.Struct = struct.Struct(">H")
+
+_CodeByDecision: dict[AccessDecision, int] = {
+    AccessDecision.Allowed: 0,
+    AccessDecision.Forbidden: 1,
+    AccessDecision.RouteNotFound: 2,
+}
+_DecisionByCode: list[AccessDecision] = [
+    AccessDecision.Allowed,
+    AccessDecision.Forbidden,
+    AccessDecision.RouteNotFound,
+]
+
+
+class SidecarProtocol:
+    """
+    Encodes and decodes sidecar frames.
+    """
+    @staticmethod
+    def encode_request(batch_id: int, checks: list[AccessCheck]) -> bytes:
+        if len(checks) > MaxChecksPerBatch:
+            raise UnsupportedError(
+                title="checks per batch amount",
+                value=len(checks),
+            )
+
+        parts: list[bytes] = [_BatchHeader.pack(batch_id, len(checks))]
+
+        for user_id, route, method in checks:
+            if user_id is None:
+                parts.append(_U16.pack(AnonymousUserIdLength))
+            else:
+                encoded_user_id: bytes = user_id.encode()
+                parts.append(_U16.pack(len(encoded_user_id)))
+                parts.append(encoded_user_id)
+
+            encoded_route: bytes = route.encode()
+            parts.append(_U16.pack(len(encoded_route)))
+            parts.append(encoded_route)
+
+            encoded_method: bytes = method.encode("ascii")
+            parts.append(bytes((len(encoded_method),)))
+            parts.append(encoded_method)
+
+        payload: bytes = b"".join(parts)
+        if len(payload) > MaxFrameSize:
+            raise UnsupportedError(
+                title="request frame size",
+                value=len(payload),
+            )
+        return _FrameHeader.pack(len(payload)) + payload
+
+    @staticmethod
+    def decode_request(payload: bytes) -> tuple[int, list[AccessCheck]]:
+        """
+        Raises:
+            MalformedSidecarFrameError:
+                The payload is not a valid request.
+        """
+        try:
+            return SidecarProtocol._decode_request(payload)
+        except (struct.error, UnicodeDecodeError, IndexError) as err:
+            raise MalformedSidecarFrameError(explanation=repr(err)) from err
+
+    @staticmethod
+    def _decode_request(payload: bytes) -> tuple[int, list[AccessCheck]]:
+        batch_id: int
+        count: int
+        batch_id, count = _BatchHeader.unpack_from(payload, 0)
+        offset: int = _BatchHeader.size
+
+        checks: list[AccessCheck] = []
+        for _ in range(count):
+            user_id: str | None = None
+            (length,) = _U16.unpack_from(payload, offset)
+            offset += 2
+            if length != AnonymousUserIdLength:
+                user_id = payload[offset:offset + length].decode()
+                offset += length
+
+            (length,) = _U16.unpack_from(payload, offset)
+            offset += 2
+            route: str = payload[offset:offset + length].decode()
+            offset += length
+
+            length = payload[offset]
+            offset += 1
+            method: str = payload[offset:offset + length].decode("ascii")
+            offset += length
+
+            checks.append((user_id, route, method))
+
+        if offset != len(payload):
+            raise MalformedSidecarFrameError(
+                explanation=f"{len(payload)} bytes given, {offset} decoded",
+            )
+
+        return batch_id, checks
+
+    @staticmethod
+    def encode_response(
+        batch_id: int,
+        decisions: list[AccessDecision],
+    ) -> bytes:
+        payload: bytes = _BatchHeader.pack(batch_id, len(decisions)) + bytes(
+            _CodeByDecision[d] for d in decisions
+        )
+        return _FrameHeader.pack(len(payload)) + payload
+
+    @staticmethod
+    def decode_response(payload: bytes) -> tuple[int, list[AccessDecision]]:
+        """
+        Raises:
+            MalformedSidecarFrameError:
+                The payload is not a valid response.
+        """
+        batch_id: int
+        count: int
+        try:
+            batch_id, count = _BatchHeader.unpack_from(payload, 0)
+            codes: bytes = payload[_BatchHeader.size:]
+            if len(codes) != count:
+                raise MalformedSidecarFrameError(
+                    explanation=f"{count} decisions expected,"
+                    f" {len(codes)} given",
+                )
+            return batch_id, [_DecisionByCode[code] for code in codes]
+        except (struct.error, IndexError) as err:
+            raise MalformedSidecarFrameError(explanation=repr(err)) from err
+
+    @staticmethod
+    async def read_frame(reader: asyncio.StreamReader) -> bytes:
+        """
+        Raises:
+            MalformedSidecarFrameError:
+                The frame is longer than `MaxFrameSize`.
+        """
+        length: int
+        (length,) = _FrameHeader.unpack(
+            await reader.readexactly(_FrameHeader.size),
+        )
+        # checked before reading, so a forged length cannot make the reader
+        # buffer gigabytes
+        if length > MaxFrameSize:
+            raise MalformedSidecarFrameError(
+                explanation=f"frame of {length} bytes exceeds the limit of"
+                f" {MaxFrameSize} bytes",
+            )
+        return await reader.readexactly(length)
+
+
+class DecisionServer:
+    """
+    Serves access decisions of a compiled policy over a Unix socket.
+    """
+    def __init__(
+        self,
+        policy: CompiledPolicy,
+        socket_path: str,
+    ) -> None:
+        self._policy: CompiledPolicy = policy
+        self._socket_path: str = socket_path
+        self._server: asyncio.AbstractServer | None = None
+
+    @property
+    def policy(self) -> CompiledPolicy:
+        return self._policy
+
+    def use_policy(self, policy: CompiledPolicy) -> None:
+        """
+        Replaces the served policy. Batches in progress finish with the old
+        one.
+        """
+        self._policy = policy
+
+    async def start(self) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            Path(self._socket_path).unlink()
+        self._server = await asyncio.start_unix_server(
+            self._handle,
+            path=self._socket_path,
+        )
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        assert self._server is not None  # noqa: S101
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def decide_batch(self, checks: list[AccessCheck]) -> list[AccessDecision]:
+        policy: CompiledPolicy = self._policy
+        return [policy.decide(*check) for check in checks]
+
+    async def _handle(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        try:
+            while True:
+                batch_id: int
+                checks: list[AccessCheck]
+                batch_id, checks = SidecarProtocol.decode_request(
+                    await SidecarProtocol.read_frame(reader),
+                )
+
+                writer.write(SidecarProtocol.encode_response(
+                    batch_id,
+                    self.decide_batch(checks),
+                ))
+                await writer.drain()
+        except (
+            asyncio.IncompleteReadError,
+            ConnectionError,
+            MalformedSidecarFrameError,
+        ):
+            # the connection is closed on a malformed frame, since the
+            # position of the next frame in the stream cannot be trusted
+            pass
+        finally:
+            writer.close()
+
+
+class DecisionClient:
+    """
+    Pipelined client of the decision sidecar.
+
+    Any amount of concurrent `check_many` calls share one connection and
+    are not waiting for each other's responses.
+    """
+    def __init__(self, socket_path: str) -> None:
+        self._socket_path: str = socket_path
+        self._batch_ids: itertools.count = itertools.count()
+        self._pending: dict[int, asyncio.Future[list[AccessDecision]]] = {}
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._read_task: asyncio.Task | None = None
+
+    async def connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_unix_connection(
+            self._socket_path,
+        )
+        self._read_task = asyncio.create_task(self._read_responses())
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            with contextlib.suppress(ConnectionError):
+                await self._writer.wait_closed()
+        if self._read_task is not None:
+            self._read_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._read_task
+
+    async def __aenter__(self) -> "DecisionClient":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def check(
+        self,
+        user_id: str | None,
+        route: str,
+        method: str,
+    ) -> AccessDecision:
+        return (await self.check_many([(user_id, route, method)]))[0]
+
+    async def check_many(
+        self,
+        checks: list[AccessCheck],
+    ) -> list[AccessDecision]:
+        """
+        Sends all checks in one round trip.
+
+        Connects again if the connection has not been made yet or has been
+        lost.
+        """
+        if self._read_task is None or self._read_task.done():
+            await self.close()
+            await self.connect()
+        assert self._writer is not None  # noqa: S101
+
+        batch_id: int = next(self._batch_ids) & 0xFFFFFFFF
+        future: asyncio.Future[list[AccessDecision]] = \
+            asyncio.get_running_loop().create_future()
+        self._pending[batch_id] = future
+
+        try:
+            self._writer.write(
+                SidecarProtocol.encode_request(batch_id, checks),
+            )
+            await self._writer.drain()
+        except BaseException:
+            self._pending.pop(batch_id, None)
+            raise
+
+        return await future
+
+    async def _read_responses(self) -> None:
+        assert self._reader is not None  # noqa: S101
+
+        error: Exception = ConnectionError("sidecar connection is closed")
+        try:
+            while True:
+                batch_id: int
+                decisions: list[AccessDecision]
+                batch_id, decisions = SidecarProtocol.decode_response(
+                    await SidecarProtocol.read_frame(self._reader),
+                )
+                future: asyncio.Future | None = self._pending.pop(
+                    batch_id, None,
+                )
+                if future is not None and not future.done():
+                    future.set_result(decisions)
+        except Exception as err:  # noqa: BLE001
+            error = err
+        finally:
+            # no response is read after the reader exits, so any waiting
+            # check would wait forever
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+
+
+def load_policy(path: str) -> CompiledPolicy:
+    return CompiledPolicy(
+        PolicySnapshot.parse_raw(Path(path).read_text()),
+    )
+
+
+async def serve(policy_path: str, socket_path: str) -> None:
+    await DecisionServer(load_policy(policy_path), socket_path).serve_forever()
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Orwynn RBAC Access-Decision Sidecar",
+    )
+    parser.add_argument(
+        "--policy", type=str, required=True, help="compiled policy file",
+    )
+    parser.add_argument(
+        "--socket", type=str, required=True, help="unix socket path",
+    )
+    namespace: argparse.Namespace = parser.parse_args()
+
+    asyncio.run(serve(namespace.policy, namespace.socket))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import threading
+from concurrent.futures import Future
+from typing import Callable, Generic, Hashable, TypeVar
+
+TResult = TypeVar("TResult")
+
+
+class SingleFlight(Generic[TResult]):
+    """
+    Coalesces concurrent calls with the same key into one call.
+
+    The first caller for a key executes the function, all callers arriving
+    while it is in flight wait for the same pending result (or error). Once
+    the call is finished, the next caller for the key executes it again -
+    results are not cached.
+
+    Thread-safe, so it coalesces calls made from different worker threads.
+    """
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self._calls: dict[Hashable, Future[TResult]] = {}
+
+    def do(
+        self,
+        key: Hashable,
+        func: Callable[[], TResult],
+    ) -> TResult:
+        with self._lock:
+            future: Future[TResult] | None = self._calls.get(key)
+            is_leader: bool = future is None
+            if future is None:
+                future = Future()
+                self._calls[key] = future
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            result: TResult = func()
+        except BaseException as err:
+            future.set_exception(err)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def is_in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
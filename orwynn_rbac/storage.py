@@ -0,0 +1,902 @@
+import abc
+import contextlib
+import threading
+from typing import TYPE_CHECKING, Any, Iterable, Self, TypeVar
+
+from bson import ObjectId
+from orwynn.mongo import Document, DocumentSearch, MongoConfig, MongoUtils
+from pykit.errors import NotFoundError, UnsupportedError
+from pymongo import MongoClient, UpdateOne
+
+from orwynn_rbac.documents import Permission, Role
+from orwynn_rbac.instrumentation import QueryInstrumentation, instrumented
+from orwynn_rbac.search import PermissionSearch, RoleSearch
+
+if TYPE_CHECKING:
+    from pymongo.collection import Collection
+    from pymongo.database import Database
+    from pymongo.results import UpdateResult
+
+TDocument = TypeVar("TDocument", bound=Document)
+
+
+class RBACStorage(abc.ABC):
+    """
+    Persists permissions and roles.
+
+    Every `get_*` method follows `MongoUtils.process_query` semantics: an
+    empty result raises NotFoundError and the search expectation is checked.
+
+    Update operations are given as Mongo-like update queries, the only
+    supported operators are "$set", "$push", "$pull" and "$addToSet".
+
+    Every operation made by the builtin storages is recorded to the
+    `instrumentation` of the storage.
+    """
+    def __init__(self) -> None:
+        self._revision: int = 0
+        self.instrumentation: QueryInstrumentation = QueryInstrumentation()
+
+    @property
+    def revision(self) -> int:
+        """
+        Number increased on every write made through this storage object.
+
+        Writes made by other processes are not counted, so caches depending
+        on the revision should also expire by time.
+        """
+        return self._revision
+
+    def _bump_revision(self) -> None:
+        self._revision += 1
+
+    def ensure_indexes(self) -> None:  # noqa: B027
+        """
+        Creates indexes backing queries made by the RBAC services.
+
+        Called on every boot, so should be idempotent. Does nothing by
+        default.
+        """
+
+    def migrate(self) -> int:
+        """
+        Migrates documents stored by older versions of the module to the
+        current schema.
+
+        Called on every boot before any document is read, so should be
+        idempotent. Does nothing by default.
+
+        Returns:
+            Amount of migrated documents.
+        """
+        return 0
+
+    @abc.abstractmethod
+    def get_permissions(
+        self,
+        search: PermissionSearch,
+    ) -> list[Permission]:
+        """
+        Returns permissions matching the search.
+        """
+
+    @abc.abstractmethod
+    def create_permissions(
+        self,
+        permissions: list[Permission],
+    ) -> list[Permission]:
+        """
+        Inserts permissions and returns them with assigned ids.
+        """
+
+    @abc.abstractmethod
+    def update_permissions(
+        self,
+        operations: dict[str, dict[str, Any]],
+    ) -> list[Permission]:
+        """
+        Applies an update operation for each permission id in one bulk write.
+
+        Returns:
+            Updated permissions in order of given ids.
+        """
+
+    @abc.abstractmethod
+    def delete_permissions(
+        self,
+        ids: list[str],
+    ) -> list[Permission]:
+        """
+        Deletes permissions by ids and returns the deleted ones.
+        """
+
+    @abc.abstractmethod
+    def get_roles(
+        self,
+        search: RoleSearch,
+    ) -> list[Role]:
+        """
+        Returns roles matching the search.
+        """
+
+    @abc.abstractmethod
+    def create_roles(
+        self,
+        roles: list[Role],
+    ) -> list[Role]:
+        """
+        Inserts roles and returns them with assigned ids.
+        """
+
+    @abc.abstractmethod
+    def update_roles(
+        self,
+        operations: dict[str, dict[str, Any]],
+    ) -> list[Role]:
+        """
+        Applies an update operation for each role id in one bulk write.
+
+        Returns:
+            Updated roles in order of given ids.
+        """
+
+    @abc.abstractmethod
+    def delete_roles(
+        self,
+        ids: list[str],
+    ) -> list[Role]:
+        """
+        Deletes roles by ids and returns the deleted ones.
+        """
+
+    @abc.abstractmethod
+    def get_role_ids_for_users(
+        self,
+        user_ids: list[str],
+    ) -> dict[str, set[str]]:
+        """
+        Returns role ids assigned to each of the given users.
+
+        Users without any role are not included in the result.
+        """
+
+    def dump(self) -> dict[str, list[dict[str, Any]]]:
+        """
+        Returns snapshot of all stored permissions and roles.
+
+        The snapshot can be loaded into `MemoryRBACStorage.from_snapshot`.
+        """
+        permissions: list[Permission] = []
+        roles: list[Role] = []
+
+        with contextlib.suppress(NotFoundError):
+            permissions = self.get_permissions(PermissionSearch())
+        with contextlib.suppress(NotFoundError):
+            roles = self.get_roles(RoleSearch())
+
+        return {
+            "permissions": [
+                MongoUtils.convert_compatible(p.dict()) for p in permissions
+            ],
+            "roles": [r.dict() for r in roles],
+        }
+
+    @abc.abstractmethod
+    def load(
+        self,
+        snapshot: dict[str, list[dict[str, Any]]],
+    ) -> None:
+        """
+        Replaces all stored documents with ones from a snapshot made by
+        `RBACStorage.dump`.
+
+        Ids of the documents are preserved.
+        """
+
+
+class MongoRBACStorage(RBACStorage):
+    """
+    Stores permissions and roles in Mongo collections.
+
+    Args:
+        database:
+            Database documents are stored in. Should be the same database
+            the app's `Mongo` service is connected to, since documents are
+            also read through it.
+
+    Attributes:
+        IndexedFields:
+            Fields indexed by `ensure_indexes` for each document class.
+    """
+    IndexedFields: dict[type[Document], list[str]] = {
+        Permission: ["name", "actions"],
+        Role: ["name", "user_ids", "permission_ids"],
+    }
+
+    def __init__(self, database: "Database") -> None:
+        super().__init__()
+        self._database: Database = database
+
+    @classmethod
+    def from_config(cls, config: MongoConfig) -> Self:
+        """
+        Creates a storage connected to the database of the app's Mongo
+        config.
+        """
+        return cls(MongoClient(config.url)[config.database_name])
+
+    def ensure_indexes(self) -> None:
+        for DocumentClass, fields in self.IndexedFields.items():
+            collection: Collection = self._get_collection(DocumentClass)
+            for field in fields:
+                collection.create_index(field)
+
+    def migrate(self) -> int:
+        # actions stored before controller keys have been introduced
+        # identified controllers by "controller_no", which is not valid
+        # anymore, so such actions are dropped and permissions sync
+        # rewrites them with current ones
+        result: UpdateResult = self._get_collection(Permission).update_many(
+            {"actions.controller_no": {"$exists": True}},
+            {"$pull": {"actions": {"controller_no": {"$exists": True}}}},
+        )
+        if result.modified_count:
+            self._bump_revision()
+        return result.modified_count
+
+    @instrumented
+    def get_permissions(
+        self,
+        search: PermissionSearch,
+    ) -> list[Permission]:
+        query: dict[str, Any] = {}
+
+        if search.ids is not None:
+            query["id"] = {
+                "$in": search.ids,
+            }
+        if search.names is not None:
+            query["name"] = {
+                "$in": search.names,
+            }
+        if search.actions is not None:
+            converted_actions: list[dict[str, Any]] = [
+                {
+                    "controller_key": action.controller_key,
+                    "method": action.method,
+                } for action in search.actions
+            ]
+
+            query["actions"] = {
+                "$in": converted_actions,
+            }
+        if search.is_dynamic:
+            query["is_dynamic"] = search.is_dynamic
+
+        return MongoUtils.process_query(
+            query,
+            search,
+            Permission,
+        )
+
+    @instrumented
+    def create_permissions(
+        self,
+        permissions: list[Permission],
+    ) -> list[Permission]:
+        return self._create_many(Permission, permissions)
+
+    @instrumented
+    def update_permissions(
+        self,
+        operations: dict[str, dict[str, Any]],
+    ) -> list[Permission]:
+        return self._update_many(Permission, operations)
+
+    @instrumented
+    def delete_permissions(
+        self,
+        ids: list[str],
+    ) -> list[Permission]:
+        return self._delete_many(Permission, ids)
+
+    @instrumented
+    def get_roles(
+        self,
+        search: RoleSearch,
+    ) -> list[Role]:
+        query: dict[str, Any] = {}
+
+        if search.ids is not None:
+            query["id"] = {
+                "$in": search.ids,
+            }
+        if search.names is not None:
+            query["name"] = {
+                "$in": search.names,
+            }
+        if search.permission_ids is not None:
+            query["permission_ids"] = {
+                "$in": search.permission_ids,
+            }
+        if search.user_ids is not None:
+            query["user_ids"] = {
+                "$in": search.user_ids,
+            }
+        if search.is_dynamic:
+            query["is_dynamic"] = search.is_dynamic
+
+        return MongoUtils.process_query(
+            query,
+            search,
+            Role,
+        )
+
+    @instrumented
+    def create_roles(
+        self,
+        roles: list[Role],
+    ) -> list[Role]:
+        return self._create_many(Role, roles)
+
+    @instrumented
+    def update_roles(
+        self,
+        operations: dict[str, dict[str, Any]],
+    ) -> list[Role]:
+        return self._update_many(Role, operations)
+
+    @instrumented
+    def delete_roles(
+        self,
+        ids: list[str],
+    ) -> list[Role]:
+        return self._delete_many(Role, ids)
+
+    @instrumented
+    def get_role_ids_for_users(
+        self,
+        user_ids: list[str],
+    ) -> dict[str, set[str]]:
+        result: dict[str, set[str]] = {}
+
+        if not user_ids:
+            return result
+
+        requested_user_ids: set[str] = set(user_ids)
+        for raw in self._get_collection(Role).find(
+            {"user_ids": {"$in": user_ids}},
+            {"_id": 1, "user_ids": 1},
+        ):
+            role_id: str = str(raw["_id"])
+            for user_id in raw.get("user_ids", []):
+                if user_id in requested_user_ids:
+                    result.setdefault(user_id, set()).add(role_id)
+
+        return result
+
+    def _create_many(
+        self,
+        DocumentClass: type[TDocument],
+        documents: list[TDocument],
+    ) -> list[TDocument]:
+        if not documents:
+            return []
+
+        raw_documents: list[dict[str, Any]] = [
+            DocumentClass._adjust_id_to_mongo(  # noqa: SLF001
+                MongoUtils.convert_compatible(d.dict()),
+            )
+            for d in documents
+        ]
+        # pymongo sets generated "_id" to each inserted raw document
+        self._get_collection(DocumentClass).insert_many(raw_documents)
+        self._bump_revision()
+
+        return [
+            DocumentClass._parse_document(raw)  # noqa: SLF001
+            for raw in raw_documents
+        ]
+
+    def _update_many(
+        self,
+        DocumentClass: type[TDocument],
+        operations: dict[str, dict[str, Any]],
+    ) -> list[TDocument]:
+        if not operations:
+            return []
+
+        collection: Collection = self._get_collection(DocumentClass)
+        collection.bulk_write(
+            [
+                UpdateOne({"_id": ObjectId(id)}, operation)
+                for id, operation in operations.items()
+            ],
+            ordered=False,
+        )
+        self._bump_revision()
+
+        return self._find_ordered(DocumentClass, list(operations.keys()))
+
+    def _delete_many(
+        self,
+        DocumentClass: type[TDocument],
+        ids: list[str],
+    ) -> list[TDocument]:
+        if not ids:
+            return []
+
+        documents: list[TDocument] = self._find_ordered(DocumentClass, ids)
+        self._get_collection(DocumentClass).delete_many({
+            "_id": {"$in": [ObjectId(id) for id in ids]},
+        })
+        self._bump_revision()
+
+        return documents
+
+    def load(
+        self,
+        snapshot: dict[str, list[dict[str, Any]]],
+    ) -> None:
+        DocumentClass: type[Document]
+        for DocumentClass, key in (
+            (Permission, "permissions"),
+            (Role, "roles"),
+        ):
+            collection: Collection = self._get_collection(DocumentClass)
+            collection.delete_many({})
+
+            raw_documents: list[dict[str, Any]] = [
+                DocumentClass._adjust_id_to_mongo(  # noqa: SLF001
+                    MongoUtils.convert_compatible(dict(raw)),
+                )
+                for raw in snapshot.get(key, [])
+            ]
+            if raw_documents:
+                collection.insert_many(raw_documents)
+
+        self._bump_revision()
+
+    def _find_ordered(
+        self,
+        DocumentClass: type[TDocument],
+        ids: list[str],
+    ) -> list[TDocument]:
+        documents_by_id: dict[str, TDocument] = {
+            d.getid(): d for d in DocumentClass.get({"id": {"$in": ids}})
+        }
+
+        return [documents_by_id[id] for id in ids if id in documents_by_id]
+
+    def _get_collection(
+        self,
+        DocumentClass: type[Document],
+    ) -> "Collection":
+        # orwynn.mongo.Mongo exposes neither its database nor bulk
+        # operations and projections, so the storage keeps its own database
+        return self._database[
+            DocumentClass._get_collection()  # noqa: SLF001
+        ]
+
+
+class MemoryRBACStorage(RBACStorage):
+    """
+    Stores permissions and roles in process memory.
+
+    Every searchable field is indexed with dicts of id sets, so lookups never
+    scan all documents unless an empty search is given.
+
+    Returned documents are shared with the storage and should not be mutated
+    in place - every update replaces the stored document with a new one.
+    """
+    def __init__(self) -> None:
+        super().__init__()
+
+        self._lock: threading.RLock = threading.RLock()
+        # id sequence is used to keep insertion order same as Mongo's natural
+        # one
+        self._seq: int = 0
+        self._seq_by_id: dict[str, int] = {}
+
+        self._permissions: dict[str, Permission] = {}
+        self._permission_ids_by_name: dict[str, set[str]] = {}
+        self._permission_ids_by_controller_key: dict[str, set[str]] = {}
+
+        self._roles: dict[str, Role] = {}
+        self._role_ids_by_name: dict[str, set[str]] = {}
+        self._role_ids_by_user_id: dict[str, set[str]] = {}
+        self._role_ids_by_permission_id: dict[str, set[str]] = {}
+
+    @classmethod
+    def from_snapshot(
+        cls,
+        snapshot: dict[str, list[dict[str, Any]]],
+    ) -> "MemoryRBACStorage":
+        """
+        Creates storage filled with documents from a snapshot made by
+        `RBACStorage.dump`.
+
+        Ids of the documents are preserved.
+        """
+        storage: MemoryRBACStorage = cls()
+        storage.load(snapshot)
+        return storage
+
+    def load(
+        self,
+        snapshot: dict[str, list[dict[str, Any]]],
+    ) -> None:
+        with self._lock:
+            self._permissions.clear()
+            self._permission_ids_by_name.clear()
+            self._permission_ids_by_controller_key.clear()
+            self._roles.clear()
+            self._role_ids_by_name.clear()
+            self._role_ids_by_user_id.clear()
+            self._role_ids_by_permission_id.clear()
+
+            for raw in snapshot.get("permissions", []):
+                self._insert_permission(Permission.parse_obj(raw))
+            for raw in snapshot.get("roles", []):
+                self._insert_role(Role.parse_obj(raw))
+
+            self._bump_revision()
+
+    @instrumented
+    def get_permissions(
+        self,
+        search: PermissionSearch,
+    ) -> list[Permission]:
+        with self._lock:
+            candidate_ids: Iterable[str]
+
+            if search.ids is not None:
+                candidate_ids = self._select_ordered(
+                    search.ids, self._permissions,
+                )
+            elif search.names is not None:
+                candidate_ids = self._select_indexed(
+                    search.names, self._permission_ids_by_name,
+                )
+            elif search.actions is not None:
+                candidate_ids = self._select_indexed(
+                    {a.controller_key for a in search.actions},
+                    self._permission_ids_by_controller_key,
+                )
+            else:
+                candidate_ids = self._permissions.keys()
+
+            names: set[str] | None = \
+                set(search.names) if search.names is not None else None
+            actions: set[tuple[str, str]] | None = \
+                {
+                    (a.controller_key, a.method) for a in search.actions
+                } if search.actions is not None else None
+
+            result: list[Permission] = []
+            for id in candidate_ids:
+                permission: Permission = self._permissions[id]
+
+                if names is not None and permission.name not in names:
+                    continue
+                if actions is not None and not any(
+                    (a.controller_key, a.method) in actions
+                    for a in permission.actions or []
+                ):
+                    continue
+                if search.is_dynamic and not permission.is_dynamic:
+                    continue
+
+                result.append(permission)
+
+        return self._finalize(result, search, Permission)
+
+    @instrumented
+    def create_permissions(
+        self,
+        permissions: list[Permission],
+    ) -> list[Permission]:
+        with self._lock:
+            return [
+                self._insert_permission(p.copy(update={"id": self._new_id()}))
+                for p in permissions
+            ]
+
+    @instrumented
+    def update_permissions(
+        self,
+        operations: dict[str, dict[str, Any]],
+    ) -> list[Permission]:
+        result: list[Permission] = []
+
+        with self._lock:
+            for id, operation in operations.items():
+                permission: Permission | None = self._permissions.get(id)
+                if permission is None:
+                    continue
+                self._remove_permission(id)
+                result.append(self._insert_permission(
+                    Permission.parse_obj(
+                        self._apply_operation(permission.dict(), operation),
+                    ),
+                ))
+
+        return result
+
+    @instrumented
+    def delete_permissions(
+        self,
+        ids: list[str],
+    ) -> list[Permission]:
+        with self._lock:
+            return [
+                self._untrack(self._remove_permission(id))
+                for id in ids if id in self._permissions
+            ]
+
+    @instrumented
+    def get_roles(
+        self,
+        search: RoleSearch,
+    ) -> list[Role]:
+        with self._lock:
+            candidate_ids: Iterable[str]
+
+            if search.ids is not None:
+                candidate_ids = self._select_ordered(search.ids, self._roles)
+            elif search.names is not None:
+                candidate_ids = self._select_indexed(
+                    search.names, self._role_ids_by_name,
+                )
+            elif search.user_ids is not None:
+                candidate_ids = self._select_indexed(
+                    search.user_ids, self._role_ids_by_user_id,
+                )
+            elif search.permission_ids is not None:
+                candidate_ids = self._select_indexed(
+                    search.permission_ids, self._role_ids_by_permission_id,
+                )
+            else:
+                candidate_ids = self._roles.keys()
+
+            result: list[Role] = []
+            for id in candidate_ids:
+                role: Role = self._roles[id]
+
+                if (
+                    search.names is not None
+                    and role.name not in search.names
+                ):
+                    continue
+                if (
+                    search.user_ids is not None
+                    and not set(role.user_ids).intersection(search.user_ids)
+                ):
+                    continue
+                if (
+                    search.permission_ids is not None
+                    and not set(role.permission_ids).intersection(
+                        search.permission_ids,
+                    )
+                ):
+                    continue
+                if search.is_dynamic and not role.is_dynamic:
+                    continue
+
+                result.append(role)
+
+        return self._finalize(result, search, Role)
+
+    @instrumented
+    def create_roles(
+        self,
+        roles: list[Role],
+    ) -> list[Role]:
+        with self._lock:
+            return [
+                self._insert_role(r.copy(update={"id": self._new_id()}))
+                for r in roles
+            ]
+
+    @instrumented
+    def update_roles(
+        self,
+        operations: dict[str, dict[str, Any]],
+    ) -> list[Role]:
+        result: list[Role] = []
+
+        with self._lock:
+            for id, operation in operations.items():
+                role: Role | None = self._roles.get(id)
+                if role is None:
+                    continue
+                self._remove_role(id)
+                result.append(self._insert_role(Role.parse_obj(
+                    self._apply_operation(role.dict(), operation),
+                )))
+
+        return result
+
+    @instrumented
+    def delete_roles(
+        self,
+        ids: list[str],
+    ) -> list[Role]:
+        with self._lock:
+            return [
+                self._untrack(self._remove_role(id))
+                for id in ids if id in self._roles
+            ]
+
+    @instrumented
+    def get_role_ids_for_users(
+        self,
+        user_ids: list[str],
+    ) -> dict[str, set[str]]:
+        with self._lock:
+            return {
+                user_id: set(self._role_ids_by_user_id[user_id])
+                for user_id in user_ids
+                if self._role_ids_by_user_id.get(user_id)
+            }
+
+    def _new_id(self) -> str:
+        return str(ObjectId())
+
+    def _track(self, id: str) -> None:
+        if id not in self._seq_by_id:
+            self._seq_by_id[id] = self._seq
+            self._seq += 1
+
+    def _untrack(self, document: TDocument) -> TDocument:
+        del self._seq_by_id[document.getid()]
+        return document
+
+    def _select_ordered(
+        self,
+        ids: Iterable[str],
+        documents: dict[str, Any],
+    ) -> list[str]:
+        return sorted(
+            {id for id in ids if id in documents},
+            key=self._seq_by_id.__getitem__,
+        )
+
+    def _select_indexed(
+        self,
+        keys: Iterable[str],
+        index: dict[str, set[str]],
+    ) -> list[str]:
+        ids: set[str] = set()
+        for key in keys:
+            ids.update(index.get(key, ()))
+        return sorted(ids, key=self._seq_by_id.__getitem__)
+
+    def _insert_permission(self, permission: Permission) -> Permission:
+        id: str = permission.getid()
+
+        self._bump_revision()
+        self._track(id)
+        self._permissions[id] = permission
+        self._permission_ids_by_name.setdefault(
+            permission.name, set(),
+        ).add(id)
+        for action in permission.actions or []:
+            self._permission_ids_by_controller_key.setdefault(
+                action.controller_key, set(),
+            ).add(id)
+
+        return permission
+
+    def _remove_permission(self, id: str) -> Permission:
+        self._bump_revision()
+        permission: Permission = self._permissions.pop(id)
+        self._discard_indexed(
+            self._permission_ids_by_name, permission.name, id,
+        )
+        for action in permission.actions or []:
+            self._discard_indexed(
+                self._permission_ids_by_controller_key,
+                action.controller_key,
+                id,
+            )
+        return permission
+
+    def _insert_role(self, role: Role) -> Role:
+        id: str = role.getid()
+
+        self._bump_revision()
+        self._track(id)
+        self._roles[id] = role
+        self._role_ids_by_name.setdefault(role.name, set()).add(id)
+        for user_id in role.user_ids:
+            self._role_ids_by_user_id.setdefault(user_id, set()).add(id)
+        for permission_id in role.permission_ids:
+            self._role_ids_by_permission_id.setdefault(
+                permission_id, set(),
+            ).add(id)
+
+        return role
+
+    def _remove_role(self, id: str) -> Role:
+        self._bump_revision()
+        role: Role = self._roles.pop(id)
+
+        self._discard_indexed(self._role_ids_by_name, role.name, id)
+        for user_id in role.user_ids:
+            self._discard_indexed(self._role_ids_by_user_id, user_id, id)
+        for permission_id in role.permission_ids:
+            self._discard_indexed(
+                self._role_ids_by_permission_id, permission_id, id,
+            )
+
+        return role
+
+    @staticmethod
+    def _discard_indexed(
+        index: dict[str, set[str]],
+        key: str,
+        id: str,
+    ) -> None:
+        ids: set[str] | None = index.get(key)
+        if ids is None:
+            return
+        ids.discard(id)
+        if not ids:
+            del index[key]
+
+    @staticmethod
+    def _finalize(
+        result: list[TDocument],
+        search: DocumentSearch,
+        DocumentClass: type[TDocument],
+    ) -> list[TDocument]:
+        if len(result) == 0:
+            raise search.get_not_found_error(DocumentClass.__name__)
+        if search.expectation is not None:
+            search.expectation.check(result)
+
+        return result
+
+    @staticmethod
+    def _apply_operation(
+        data: dict[str, Any],
+        operation: dict[str, Any],
+    ) -> dict[str, Any]:
+        """
+        Applies Mongo-like update operation to the document's data.
+        """
+        for operator, fields in operation.items():
+            for field, value in fields.items():
+                match operator:
+                    case "$set":
+                        data[field] = value
+                    case "$push":
+                        data[field] = list(data.get(field) or []) + (
+                            list(value["$each"])
+                            if isinstance(value, dict) else [value]
+                        )
+                    case "$addToSet":
+                        items: list[Any] = list(data.get(field) or [])
+                        for v in (
+                            value["$each"]
+                            if isinstance(value, dict) else [value]
+                        ):
+                            if v not in items:
+                                items.append(v)
+                        data[field] = items
+                    case "$pull":
+                        pulled: list[Any] = \
+                            list(value["$in"]) \
+                            if isinstance(value, dict) else [value]
+                        data[field] = [
+                            v for v in data.get(field) or []
+                            if v not in pulled
+                        ]
+                    case _:
+                        raise UnsupportedError(
+                            title="update operator",
+                            value=operator,
+                        )
+
+        return data
@@ -0,0 +1,24 @@
+from orwynn_rbac.bloom import BloomFilter
+
+
+def test_no_false_negatives():
+    bloom: BloomFilter = BloomFilter(1000)
+    user_ids: list[str] = [f"user-{i}" for i in range(1000)]
+
+    for user_id in user_ids:
+        bloom.add(user_id)
+
+    assert all(user_id in bloom for user_id in user_ids)
+
+
+def test_false_positive_rate():
+    bloom: BloomFilter = BloomFilter(1000, 0.01)
+
+    for i in range(1000):
+        bloom.add(f"user-{i}")
+
+    false_positives: int = sum(
+        f"other-{i}" in bloom for i in range(10000)
+    )
+    # 1% is expected, with some spare for hash distribution
+    assert false_positives < 10000 * 0.02
@@ -0,0 +1,30 @@
+from orwynn_rbac.cache import TTLCache
+
+
+def test_lru_eviction():
+    cache: TTLCache[str, int] = TTLCache(2)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # "a" becomes the most recently used
+    assert cache.get("a") == (True, 1)
+    cache.set("c", 3)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("c") == (True, 3)
+    assert cache.stats.dict() == {
+        "hits": 3, "misses": 1, "evictions": 1, "size": 2,
+    }
+
+
+def test_ttl_expiration():
+    now: float = 0.0
+    cache: TTLCache[str, int | None] = TTLCache(10, 5.0, lambda: now)
+
+    cache.set("a", None)
+    now = 4.9
+    assert cache.get("a") == (True, None)
+    now = 5.0
+    assert cache.get("a") == (False, None)
+    assert len(cache) == 0
@@ -330,3 +330,15 @@ def test_delete_role(
             names=["client"],
         ),
     )
+
+
+def test_cached_decision_dropped_on_write(
+    user_client_2,
+    user_id_2: str,
+    role_service: RoleService,
+):
+    user_client_2.get_jsonify("/rbac/roles", 400)
+
+    role_service.set_for_user(user_id_2, RoleSearch(names=["ceo"]))
+
+    user_client_2.get_jsonify("/rbac/roles", 200)
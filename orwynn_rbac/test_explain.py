@@ -0,0 +1,106 @@
+from orwynn.testing import Client
+
+from orwynn_rbac.enums import AccessDecision
+from orwynn_rbac.models import AccessExplanation
+from orwynn_rbac.search import RoleSearch
+from orwynn_rbac.services import AccessService, RoleService
+
+
+def test_explain_allowed(
+    access_service: AccessService,
+    role_service: RoleService,
+    user_id_1: str,
+):
+    ceo_id: str = role_service.get(RoleSearch(names=["ceo"]))[0].getid()
+
+    explanation: AccessExplanation = access_service.explain(
+        user_id_1, "/rbac/roles", "GET",
+    )
+
+    assert explanation.decision == AccessDecision.Allowed
+    assert explanation.method == "get"
+    assert explanation.controller_route == "/roles"
+    assert explanation.required_permission_name == \
+        "slimebones.orwynn-rbac.role.permission.roles:get"
+    assert not explanation.is_uncovered
+    assert explanation.role_ids == [ceo_id]
+    assert explanation.granting_role_ids == [ceo_id]
+    assert [s.name for s in explanation.steps] == [
+        "route_resolution",
+        "user_resolution",
+        "permission_matching",
+        "role_attribution",
+    ]
+    steps = {s.name: s for s in explanation.steps}
+    assert steps["route_resolution"].query_count == 0
+    assert steps["user_resolution"].query_count > 0
+    assert steps["role_attribution"].query_count == 1
+    assert explanation.seconds >= sum(s.seconds for s in explanation.steps)
+
+
+def test_explain_forbidden(
+    access_service: AccessService,
+    user_id_2: str,
+):
+    explanation: AccessExplanation = access_service.explain(
+        user_id_2, "/rbac/roles", "get",
+    )
+
+    assert explanation.decision == AccessDecision.Forbidden
+    assert explanation.required_permission_name == \
+        "slimebones.orwynn-rbac.role.permission.roles:get"
+    assert explanation.granting_role_ids == []
+    assert "role_attribution" not in [s.name for s in explanation.steps]
+
+
+def test_explain_caches(
+    access_service: AccessService,
+):
+    explanation: AccessExplanation = access_service.explain(
+        None, "/unknown", "get",
+    )
+    assert explanation.decision == AccessDecision.RouteNotFound
+    assert explanation.controller_route is None
+    assert [s.name for s in explanation.steps] == ["route_resolution"]
+    assert explanation.steps[0].caches == []
+
+    explanation = access_service.explain(None, "/unknown", "get")
+    assert explanation.steps[0].caches == ["unmatched_routes"]
+
+    # users without roles are served by the members filter
+    access_service.explain("nobody", "/rbac/roles", "get")
+    explanation = access_service.explain("nobody", "/rbac/roles", "get")
+    assert explanation.decision == AccessDecision.Forbidden
+    assert explanation.steps[1].caches == [
+        "members_filter", "authorized_user",
+    ]
+    assert explanation.steps[1].query_count == 0
+
+    with access_service.request_scope():
+        access_service.explain(None, "/items", "get")
+        explanation = access_service.explain(None, "/items/1", "get")
+    assert explanation.is_uncovered
+    assert explanation.required_permission_name is None
+    assert explanation.steps[1].caches == ["request_memo"]
+    assert explanation.steps[1].query_count == 0
+
+
+def test_explain_endpoint(
+    user_client_1: Client,
+    user_client_2: Client,
+    user_id_2: str,
+):
+    data: dict = user_client_1.get_jsonify(
+        f"/rbac/explain?user_id={user_id_2}&route=/items&method=get",
+        200,
+    )
+    explanation: AccessExplanation = AccessExplanation.recover(data)
+    assert explanation.decision == AccessDecision.Allowed
+    assert explanation.user_id == user_id_2
+    assert explanation.controller_route == "/items"
+    assert len(explanation.granting_role_ids) == 1
+
+    user_client_2.get_jsonify(
+        "/rbac/explain?route=/items&method=get",
+        400,
+    )
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from pykit.errors import NotFoundError
+
+from orwynn_rbac.instrumentation import (
+    LatencyBuckets,
+    QueryInstrumentation,
+    QueryStats,
+    count_queries,
+)
+from orwynn_rbac.search import RoleSearch
+from orwynn_rbac.services import AccessService, RoleService
+from orwynn_rbac.storage import MemoryRBACStorage
+
+
+def test_record():
+    instrumentation: QueryInstrumentation = QueryInstrumentation()
+
+    seconds: float = 0.002
+    instrumentation.record("get_roles", seconds)
+    instrumentation.record("get_roles", 10.0, is_failed=True)
+    instrumentation.record("update_roles", seconds)
+
+    stats: QueryStats = instrumentation.stats
+    assert [(o.count, o.error_count) for o in stats.operations.values()] \
+        == [(2, 1), (1, 0)]
+    # slower operation exceeds all buckets
+    assert stats.operations["get_roles"].bucket_counts == [
+        0 if bound < seconds else 1 for bound in LatencyBuckets
+    ]
+
+    instrumentation.reset()
+    assert instrumentation.stats.total == 0
+
+
+def test_storage_instrumented():
+    storage: MemoryRBACStorage = MemoryRBACStorage()
+
+    with pytest.raises(NotFoundError):
+        storage.get_roles(RoleSearch(names=["unknown"]))
+    storage.get_role_ids_for_users(["1"])
+
+    stats: QueryStats = storage.instrumentation.stats
+    assert sorted(stats.operations.keys()) \
+        == ["get_role_ids_for_users", "get_roles"]
+    # not found results are not failures
+    assert stats.operations["get_roles"].error_count == 0
+
+
+def test_count_queries_nested():
+    storage: MemoryRBACStorage = MemoryRBACStorage()
+
+    with count_queries() as outer:
+        storage.get_role_ids_for_users(["1"])
+        with count_queries() as inner:
+            storage.get_role_ids_for_users(["1"])
+
+    assert inner.counts == {"get_role_ids_for_users": 1}
+    assert outer.counts == {"get_role_ids_for_users": 2}
+
+
+@pytest.mark.asyncio
+async def test_count_queries_isolated():
+    storage: MemoryRBACStorage = MemoryRBACStorage()
+
+    async def query(amount: int) -> int:
+        with count_queries() as counter:
+            for _ in range(amount):
+                await asyncio.to_thread(storage.get_role_ids_for_users, ["1"])
+        return counter.total
+
+    assert await asyncio.gather(query(1), query(3)) == [1, 3]
+
+
+def test_check_user_queries(
+    access_service: AccessService,
+    user_id_1: str,
+):
+    with count_queries() as counter:
+        access_service.check_user(user_id_1, "/rbac/roles", "GET")
+
+    assert counter.counts == {"get_roles": 1, "get_permissions": 1}
+    assert access_service.query_stats.operations["get_roles"].count >= 1
+
+
+def test_set_for_user_queries(
+    role_service: RoleService,
+    role_id_1: str,
+    role_id_2: str,
+):
+    with count_queries() as counter:
+        role_service.set_for_user(
+            "1", RoleSearch(ids=[role_id_1, role_id_2]),
+        )
+
+    # one read and one bulk write for any amount of roles
+    assert counter.counts == {"get_roles": 1, "update_roles": 1}
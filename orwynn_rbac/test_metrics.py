@@ -0,0 +1,114 @@
+import threading
+
+import pytest
+from orwynn.testing import Client
+from pykit.errors import ForbiddenResourceError, NotFoundError
+
+from orwynn_rbac.enums import AccessDecision
+from orwynn_rbac.metrics import RBACMetrics, ShardedCounters
+from orwynn_rbac.services import AccessService
+
+
+def test_sharded_counters_concurrent():
+    counters: ShardedCounters = ShardedCounters(2)
+    amount: int = 10000
+
+    def add():
+        for _ in range(amount):
+            counters.add(0)
+        counters.add(1, 0.5)
+
+    threads: list[threading.Thread] = [
+        threading.Thread(target=add) for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counters.sum() == [amount * 4, 2.0]
+
+
+def test_render_histogram():
+    metrics: RBACMetrics = RBACMetrics()
+
+    metrics.record_decision(AccessDecision.Allowed, 0.00003)
+    metrics.record_decision(AccessDecision.Forbidden, 0.0003)
+    metrics.record_decision(AccessDecision.Forbidden)
+
+    lines: list[str] = metrics.render().splitlines()
+    assert 'orwynn_rbac_decisions_total{outcome="forbidden"} 2' in lines
+    assert 'orwynn_rbac_check_duration_seconds_bucket{le="5e-05"} 1' in lines
+    # buckets are cumulative
+    assert 'orwynn_rbac_check_duration_seconds_bucket{le="0.0005"} 2' \
+        in lines
+    assert 'orwynn_rbac_check_duration_seconds_bucket{le="+Inf"} 2' in lines
+    assert "orwynn_rbac_check_duration_seconds_count 2" in lines
+
+
+def test_decisions_recorded(
+    access_service: AccessService,
+    user_id_1: str,
+    user_id_2: str,
+):
+    before: dict[AccessDecision, int] = \
+        access_service.metrics.get_decision_counts()
+
+    access_service.check_user(user_id_1, "/rbac/roles", "GET")
+    with pytest.raises(ForbiddenResourceError):
+        access_service.check_user(None, "/rbac/roles", "GET")
+    with pytest.raises(NotFoundError):
+        access_service.check_user(user_id_2, "/unknown", "GET")
+
+    after: dict[AccessDecision, int] = \
+        access_service.metrics.get_decision_counts()
+    assert [after[d] - before[d] for d in AccessDecision] == [1, 1, 1]
+
+
+def test_cached_decisions_recorded(
+    user_client_1: Client,
+    client: Client,
+    access_service: AccessService,
+):
+    def get_check_count() -> int:
+        prefix: str = "orwynn_rbac_check_duration_seconds_count "
+        return next(
+            int(line.removeprefix(prefix))
+            for line in access_service.metrics.render().splitlines()
+            if line.startswith(prefix)
+        )
+
+    before: dict[AccessDecision, int] = \
+        access_service.metrics.get_decision_counts()
+    check_count: int = get_check_count()
+
+    # repeated requests are served from the middleware decision cache
+    for _ in range(5):
+        user_client_1.get_jsonify("/rbac/roles", 200)
+    for _ in range(3):
+        client.get("/rbac/roles", 400)
+
+    after: dict[AccessDecision, int] = \
+        access_service.metrics.get_decision_counts()
+    assert after[AccessDecision.Allowed] - before[AccessDecision.Allowed] \
+        == 5  # noqa: PLR2004
+    assert \
+        after[AccessDecision.Forbidden] - before[AccessDecision.Forbidden] \
+        == 3  # noqa: PLR2004
+
+    assert get_check_count() - check_count == 8  # noqa: PLR2004
+
+
+def test_get_metrics(user_client_1: Client):
+    text: str = user_client_1.get("/rbac/metrics", 200).text
+
+    assert "# TYPE orwynn_rbac_decisions_total counter" in text
+    assert 'orwynn_rbac_cache_hits_total{cache="unmatched_routes"}' in text
+    assert 'orwynn_rbac_cache_size{cache="middleware_decisions"}' in text
+    assert 'orwynn_rbac_boot_sync_writes{kind="created"}' in text
+    assert "orwynn_rbac_boot_sync_duration_seconds " in text
+    assert "orwynn_rbac_storage_operation_duration_seconds_count" in text
+
+
+def test_get_metrics_forbidden(client: Client):
+    client.get("/rbac/metrics", 400)
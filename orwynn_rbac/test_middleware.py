@@ -0,0 +1,51 @@
+import pytest
+from orwynn.http import HttpRequest
+from pykit.errors import ForbiddenResourceError
+
+from orwynn_rbac.errors import InvalidPermissionTokenError
+from orwynn_rbac.middleware import AccessMiddleware
+from orwynn_rbac.services import AccessService
+
+
+class TokenAccessMiddleware(AccessMiddleware):
+    TokenHeader = "permission-token"
+    IsCheckedInThread = False
+
+
+def _create_request(route: str, headers: dict[str, str]) -> HttpRequest:
+    return HttpRequest({
+        "type": "http",
+        "method": "GET",
+        "path": route,
+        "query_string": b"",
+        "headers": [
+            (k.encode(), v.encode()) for k, v in headers.items()
+        ],
+    })
+
+
+@pytest.mark.asyncio
+async def test_invalid_token_forbidden(
+    user_id_1: str,
+    access_service: AccessService,
+):
+    access_service.use_token_key(b"testing-key")
+    token: str = access_service.mint_token(user_id_1)
+    middleware: TokenAccessMiddleware = TokenAccessMiddleware(
+        ["*"], access_service,
+    )
+
+    async def call_next(request: HttpRequest):
+        raise AssertionError
+
+    for invalid_token in (token + "x", "garbage"):
+        with pytest.raises(ForbiddenResourceError) as error_info:
+            await middleware.process(
+                _create_request(
+                    "/rbac/roles", {"permission-token": invalid_token},
+                ),
+                call_next,
+            )
+        assert isinstance(
+            error_info.value.__cause__, InvalidPermissionTokenError,
+        )
@@ -0,0 +1,145 @@
+import threading
+import time
+
+import pydantic
+import pytest
+from orwynn.testing import Client
+from pykit.errors import LogicError
+
+from orwynn_rbac.profiler import CheckProfiler, ProfilerConfig, ProfilerStatus
+from orwynn_rbac.services import AccessService
+
+
+def _busy(seconds: float) -> None:
+    finish_at: float = time.perf_counter() + seconds
+    while time.perf_counter() < finish_at:
+        pass
+
+
+def _check(profiler: CheckProfiler, seconds: float) -> None:
+    with profiler.profile_check():
+        _busy(seconds)
+
+
+@pytest.fixture
+def profiler():
+    profiler: CheckProfiler = CheckProfiler()
+    yield profiler
+    profiler.disable()
+
+
+def test_sample_every(profiler: CheckProfiler):
+    profiler.enable(ProfilerConfig(sample_every=2, interval=0.0005))
+
+    for _ in range(4):
+        _check(profiler, 0.02)
+    profiler.disable()
+
+    status: ProfilerStatus = profiler.status
+    assert not status.is_enabled
+    assert status.profiled_check_count == len(range(0, 4, 2))
+    stacks: list[str] = [
+        line.rsplit(" ", 1)[0]
+        for line in profiler.get_collapsed_stacks().splitlines()
+    ]
+    # stacks are rooted at the function made the check
+    assert all(
+        s.startswith("orwynn_rbac.test_profiler:_check") for s in stacks
+    )
+    assert \
+        "orwynn_rbac.test_profiler:_check;orwynn_rbac.test_profiler:_busy" \
+        in stacks
+
+
+def test_latency_threshold(profiler: CheckProfiler):
+    profiler.enable(ProfilerConfig(
+        sample_every=None, latency_threshold=0.01, interval=0.0005,
+    ))
+
+    _check(profiler, 0.001)
+    assert profiler.status.sample_count == 0
+
+    _check(profiler, 0.03)
+    assert profiler.status.profiled_check_count == 1
+
+    profiler.clear()
+    assert profiler.get_collapsed_stacks() == ""
+
+
+def test_enable_nothing(profiler: CheckProfiler):
+    with pytest.raises(LogicError):
+        profiler.enable(ProfilerConfig(sample_every=None))
+
+
+def test_profiler_endpoints(
+    user_client_1: Client,
+    access_service: AccessService,
+):
+    try:
+        data: dict = user_client_1.post_jsonify(
+            "/rbac/profiler",
+            200,
+            json={"sample_every": 1, "interval": 0.0005},
+        )
+        assert ProfilerStatus.recover(data).is_enabled
+
+        user_client_1.get_jsonify("/rbac/roles", 200)
+
+        status: ProfilerStatus = ProfilerStatus.recover(
+            user_client_1.delete_jsonify("/rbac/profiler", 200),
+        )
+        assert not status.is_enabled
+        assert user_client_1.get("/rbac/profiler/stacks", 200).text \
+            == access_service.profiler.get_collapsed_stacks()
+    finally:
+        access_service.profiler.disable()
+        access_service.profiler.clear()
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"sample_every": 0},
+        {"sample_every": -1},
+        {"latency_threshold": 0},
+        {"interval": 0},
+        {"interval": -0.001},
+    ],
+)
+def test_invalid_config(config: dict):
+    with pytest.raises(pydantic.ValidationError):
+        ProfilerConfig(**config)
+
+
+def test_invalid_config_endpoint(
+    user_client_1: Client,
+    access_service: AccessService,
+):
+    user_client_1.post_jsonify(
+        "/rbac/profiler", 422, json={"sample_every": 0},
+    )
+    assert not access_service.profiler.is_enabled
+    # checks keep working
+    user_client_1.get_jsonify("/rbac/roles", 200)
+
+
+def test_concurrent_enable(profiler: CheckProfiler):
+    config: ProfilerConfig = ProfilerConfig(sample_every=1)
+    threads: list[threading.Thread] = [
+        threading.Thread(target=profiler.enable, args=(config,))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    def get_sampler_threads() -> list[threading.Thread]:
+        return [
+            t for t in threading.enumerate()
+            if t.name == "orwynn-rbac-profiler"
+        ]
+
+    assert len(get_sampler_threads()) == 1
+    profiler.disable()
+    assert get_sampler_threads() == []
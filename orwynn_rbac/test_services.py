@@ -1,17 +1,40 @@
+import threading
+import time
 from typing import TYPE_CHECKING
 
+import pytest
 from orwynn.di.di import Di
 from orwynn.url import URLMethod
+from pykit import validation
+from pykit.errors import ForbiddenResourceError, NotFoundError
 
-from orwynn_rbac.models import HTTPAction
+from orwynn_rbac.enums import AccessDecision
+from orwynn_rbac.errors import InvalidPermissionTokenError
+from orwynn_rbac.instrumentation import count_queries
+from orwynn_rbac.models import (
+    AccessContext,
+    DefaultRole,
+    DefaultRolesReport,
+    HTTPAction,
+    PermissionSyncReport,
+    RoleSubject,
+)
+from orwynn_rbac.resolvers import (
+    ClaimsRoleResolver,
+    CombinedRoleResolver,
+    StorageRoleResolver,
+)
 from orwynn_rbac.search import PermissionSearch, RoleSearch
-from orwynn_rbac.services import PermissionService, RoleService
-from orwynn_rbac.testing import DefaultRoles
-from orwynn_rbac.utils import RouteUtils
+from orwynn_rbac.services import AccessService, PermissionService, RoleService
+from orwynn_rbac.testing import DefaultRoles, SyntheticDataset
+from orwynn_rbac.utils import PermissionUtils, RouteUtils
 
 if TYPE_CHECKING:
     from orwynn import Controller
 
+    from orwynn_rbac.documents import Role
+    from orwynn_rbac.policy import CompiledPolicy
+
 
 def test_permission_get_by_ids(
     permission_id_1: str,
@@ -46,21 +69,77 @@ def test_permission_get_by_actions(
     assert {p.getid() for p in permission_service.get(PermissionSearch(
         actions=[
             HTTPAction(
-                controller_no=RouteUtils.find_by_abstract_route(
-                    "/items", controllers,
-                )[0],
+                controller_key=PermissionUtils.get_controller_key(
+                    RouteUtils.find_by_abstract_route(
+                        "/items", controllers,
+                    )[1],
+                ),
                 method=URLMethod.Get.value,
             ),
             HTTPAction(
-                controller_no=RouteUtils.find_by_abstract_route(
-                    "/items/{id}", controllers,
-                )[0],
+                controller_key=PermissionUtils.get_controller_key(
+                    RouteUtils.find_by_abstract_route(
+                        "/items/{id}", controllers,
+                    )[1],
+                ),
                 method=URLMethod.Patch.value,
             ),
         ],
     ))} == {permission_id_1, permission_id_3}
 
 
+def test_permission_sync_unchanged(
+    permission_service: PermissionService,
+    access_service: AccessService,
+):
+    revision: int = access_service.revision
+
+    report: PermissionSyncReport = \
+        permission_service._init_internal(  # noqa: SLF001
+            controllers=Di.ie().controllers,
+        )
+
+    assert not report.is_changed
+    assert access_service.revision == revision
+
+
+def test_permission_sync_changed(
+    permission_service: PermissionService,
+):
+    controller: Controller = RouteUtils.find_by_abstract_route(
+        "/items", Di.ie().controllers,
+    )[1]
+    update_item_permission_id: str = permission_service.get(PermissionSearch(
+        names=["slimebones.orwynn-rbac.testing.permission.item:update"],
+    ))[0].getid()
+
+    controller.Permissions = {  # type: ignore
+        "get": "slimebones.orwynn-rbac.testing.permission.item:update",
+        "post": "slimebones.orwynn-rbac.testing.permission.item:create",
+    }
+    try:
+        report: PermissionSyncReport = \
+            permission_service._init_internal(  # noqa: SLF001
+                controllers=Di.ie().controllers,
+            )
+        created_names: list[str] = [
+            p.name for p in permission_service.get(PermissionSearch(
+                ids=report.created_ids,
+            ))
+        ]
+    finally:
+        del controller.Permissions  # type: ignore
+        permission_service._init_internal(  # noqa: SLF001
+            controllers=Di.ie().controllers,
+        )
+
+    assert created_names == [
+        "slimebones.orwynn-rbac.testing.permission.item:create",
+    ]
+    assert report.updated_ids == [update_item_permission_id]
+    assert len(report.deleted_ids) == 1
+
+
 def test_default_roles(
     role_service: RoleService,
 ):
@@ -73,3 +152,414 @@ def test_default_roles(
     }
 
     assert input_default_role_names == output_default_role_names
+
+
+def test_reconcile_defaults_unchanged(
+    role_service: RoleService,
+    access_service: AccessService,
+):
+    revision: int = access_service.revision
+
+    report: DefaultRolesReport = role_service.reconcile_defaults(DefaultRoles)
+
+    assert not report.is_changed
+    assert access_service.revision == revision
+
+
+def test_reconcile_defaults_changed(
+    role_service: RoleService,
+    access_service: AccessService,
+):
+    default_roles: list[DefaultRole] = [
+        *DefaultRoles[:1],
+        DefaultRole(
+            name="guard",
+            title="Shop Guard",
+            description="Now you may pass",
+            permission_names=[
+                "slimebones.orwynn-rbac.testing.permission.buy-item:do",
+            ],
+        ),
+        DefaultRole(
+            name="seller",
+            permission_names=[
+                "slimebones.orwynn-rbac.testing.permission.item:get",
+            ],
+        ),
+    ]
+    revision: int = access_service.revision
+
+    dry_report: DefaultRolesReport = role_service.reconcile_defaults(
+        default_roles, is_dry_run=True,
+    )
+    assert access_service.revision == revision
+
+    report: DefaultRolesReport = role_service.reconcile_defaults(
+        default_roles,
+    )
+
+    assert [
+        (
+            c.name,
+            c.is_created,
+            c.added_permission_names,
+            c.removed_permission_names,
+            c.updated_fields,
+        )
+        for c in dry_report.changes
+    ] == [
+        (
+            "guard",
+            False,
+            ["slimebones.orwynn-rbac.testing.permission.buy-item:do"],
+            ["slimebones.orwynn-rbac.testing.permission.item:get"],
+            ["description", "permission_ids"],
+        ),
+        (
+            "seller",
+            True,
+            ["slimebones.orwynn-rbac.testing.permission.item:get"],
+            [],
+            [],
+        ),
+    ]
+    assert [c.dict(exclude={"id"}) for c in report.changes] \
+        == [c.dict(exclude={"id"}) for c in dry_report.changes]
+    assert report.changes[1].id == role_service.get(RoleSearch(
+        names=["seller"],
+    ))[0].getid()
+    assert not role_service.reconcile_defaults(default_roles).is_changed
+
+
+def test_check_many(
+    user_id_1: str,
+    user_id_2: str,
+    access_service: AccessService,
+):
+    assert access_service.check_many([
+        (user_id_1, "/rbac/roles", "GET"),
+        (user_id_2, "/rbac/roles", "GET"),
+        (user_id_2, "/items", "GET"),
+        (None, "/items", "GET"),
+        ("unknown", "/items", "GET"),
+        (user_id_2, "/unknown", "GET"),
+    ]) == [
+        AccessDecision.Allowed,
+        AccessDecision.Forbidden,
+        AccessDecision.Allowed,
+        AccessDecision.Forbidden,
+        AccessDecision.Forbidden,
+        AccessDecision.RouteNotFound,
+    ]
+
+
+def test_request_scope_memo(
+    user_id_1: str,
+    access_service: AccessService,
+):
+    with access_service.request_scope():
+        access_service.check_user(user_id_1, "/rbac/roles", "GET")
+
+        calls: list[str | None] = []
+        resolve = access_service._resolve_user_ids  # noqa: SLF001
+        access_service._resolve_user_ids = (  # noqa: SLF001
+            lambda user_ids: calls.extend(user_ids) or resolve(user_ids)
+        )
+        try:
+            access_service.check_user(user_id_1, "/rbac/roles", "GET")
+            access_service.check_user(user_id_1, "/rbac/permissions", "GET")
+        finally:
+            del access_service._resolve_user_ids  # noqa: SLF001
+
+    assert calls == []
+
+
+def test_check_user_context(
+    user_id_1: str,
+    access_service: AccessService,
+    role_service: RoleService,
+):
+    context: AccessContext = access_service.check_user(
+        user_id_1, "/rbac/roles", "GET",
+    )
+
+    assert context.user_id == user_id_1
+    assert context.role_ids == {
+        r.getid() for r in role_service.get(RoleSearch(names=["ceo"]))
+    }
+    assert context.has_permission(
+        "slimebones.orwynn-rbac.role.permission.roles:get",
+    )
+    assert context.controller_route == "/roles"
+    assert context.method == "get"
+
+
+def test_check_token(
+    user_id_1: str,
+    user_id_2: str,
+    access_service: AccessService,
+):
+    access_service.use_token_key(b"testing-key")
+    token_1: str = access_service.mint_token(user_id_1)
+    token_2: str = access_service.mint_token(user_id_2)
+
+    def resolve(*args):
+        raise AssertionError
+
+    # no storage calls are expected for tokens of the actual policy
+    access_service._resolve_user_ids = resolve  # noqa: SLF001
+    try:
+        context: AccessContext = access_service.check_token(
+            token_1, "/rbac/roles", "GET",
+        )
+        validation.expect(
+            access_service.check_token,
+            ForbiddenResourceError,
+            token_2,
+            "/rbac/roles",
+            "GET",
+        )
+    finally:
+        del access_service._resolve_user_ids  # noqa: SLF001
+
+    assert context.user_id == user_id_1
+    assert context.controller_route == "/roles"
+
+
+def test_policy_context_matches_user_context(
+    user_id_1: str,
+    role_service: RoleService,
+    access_service: AccessService,
+):
+    item_permission_names: list[str] = [
+        "slimebones.orwynn-rbac.testing.permission.item:get",
+    ]
+    role_service.reconcile_defaults(
+        DefaultRoles, item_permission_names, item_permission_names,
+    )
+    access_service.use_token_key(b"testing-key")
+
+    # a user with roles, a user linked to the authorized role and an
+    # unauthorized client, which has no token and is checked by role ids
+    for user_id, route in [
+        (user_id_1, "/rbac/roles"),
+        ("nobody", "/items"),
+        (None, "/items"),
+    ]:
+        context: AccessContext = access_service.check_user(
+            user_id, route, "GET",
+        )
+        policy_context: AccessContext = (
+            access_service.check_role_ids(None, frozenset(), route, "GET")
+            if user_id is None
+            else access_service.check_token(
+                access_service.mint_token(user_id), route, "GET",
+            )
+        )
+
+        assert context.role_ids
+        assert policy_context == context
+
+
+def test_check_invalid_token(
+    user_id_1: str,
+    access_service: AccessService,
+):
+    access_service.use_token_key(b"testing-key")
+    token: str = access_service.mint_token(user_id_1)
+
+    with pytest.raises(ForbiddenResourceError) as error_info:
+        access_service.check_token(token + "x", "/rbac/roles", "GET")
+    assert isinstance(error_info.value.__cause__, InvalidPermissionTokenError)
+
+
+def test_compiled_policy_refreshed_in_background(
+    access_service: AccessService,
+):
+    policy: CompiledPolicy = access_service.get_compiled_policy()
+
+    access_service.CompiledPolicyTTL = 0
+    try:
+        # the expired policy is served without waiting for storage reads
+        with count_queries() as counter:
+            assert access_service.get_compiled_policy() is policy
+        assert counter.total == 0
+
+        deadline: float = time.monotonic() + 5
+        while access_service.get_compiled_policy() is policy:
+            assert time.monotonic() < deadline
+            time.sleep(0.001)
+    finally:
+        del access_service.CompiledPolicyTTL
+
+
+@pytest.mark.asyncio
+async def test_check_subjects(
+    user_id_1: str,
+    access_service: AccessService,
+):
+    access_service.use_role_resolver(CombinedRoleResolver([
+        ClaimsRoleResolver(), StorageRoleResolver(),
+    ]))
+    try:
+        decisions: list[AccessDecision] = await access_service.check_subjects([
+            # claimed roles take precedence over stored ones
+            (
+                RoleSubject(user_id=user_id_1, role_names=("guard",)),
+                "/rbac/roles",
+                "GET",
+            ),
+            (RoleSubject(user_id=user_id_1), "/rbac/roles", "GET"),
+            (
+                RoleSubject(user_id="unknown", role_names=("ceo",)),
+                "/rbac/roles",
+                "GET",
+            ),
+            (RoleSubject(user_id=None), "/rbac/roles", "GET"),
+            (RoleSubject(user_id=user_id_1), "/unknown", "GET"),
+        ])
+    finally:
+        access_service.use_role_resolver(StorageRoleResolver())
+
+    assert decisions == [
+        AccessDecision.Forbidden,
+        AccessDecision.Allowed,
+        AccessDecision.Allowed,
+        AccessDecision.Forbidden,
+        AccessDecision.RouteNotFound,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_check_subject_compiles_policy_in_thread(
+    user_id_1: str,
+    access_service: AccessService,
+    role_service: RoleService,
+):
+    compile_thread_ids: list[int] = []
+    compile_policy = access_service.compile_policy
+
+    def record_compile_policy() -> "CompiledPolicy":
+        compile_thread_ids.append(threading.get_ident())
+        return compile_policy()
+
+    # a write makes the policy stale
+    role_service.set_for_user("1", RoleSearch(names=["guard"]))
+    access_service.compile_policy = record_compile_policy  # type: ignore
+    try:
+        await access_service.check_subject(
+            RoleSubject(user_id=user_id_1), "/rbac/roles", "GET",
+        )
+        await access_service.check_subjects([
+            (RoleSubject(user_id=user_id_1), "/rbac/roles", "GET"),
+        ])
+    finally:
+        del access_service.compile_policy  # type: ignore
+
+    assert len(compile_thread_ids) == 1
+    assert compile_thread_ids[0] != threading.get_ident()
+
+
+def test_roleless_user_skips_role_query(
+    user_id_1: str,
+    access_service: AccessService,
+    role_service: RoleService,
+):
+    assert role_service.may_have_roles(user_id_1)
+    assert not role_service.may_have_roles("roleless")
+
+    # warm up the authorized permissions cache
+    access_service.check_many([("roleless", "/rbac/roles", "GET")])
+
+    def get(*args):
+        raise AssertionError
+
+    role_service.get = get
+    try:
+        assert access_service.check_many([
+            ("roleless", "/items", "GET"),
+            ("roleless", "/rbac/roles", "GET"),
+        ]) == [AccessDecision.Forbidden, AccessDecision.Forbidden]
+    finally:
+        del role_service.get
+
+
+def test_members_filter_rebuilt_in_background(
+    role_service: RoleService,
+    role_id_1: str,
+):
+    original_get = role_service.get
+    is_rebuilding: list[bool] = []
+
+    def get(search: RoleSearch) -> list["Role"]:
+        roles: list[Role] = original_get(search)
+        if search == RoleSearch() and not is_rebuilding:
+            is_rebuilding.append(True)
+            # role set by this process while the filter is rebuilt
+            role_service.set_for_user("late", RoleSearch(ids=[role_id_1]))
+        return roles
+
+    # role set by another process
+    role_service.storage.update_roles({
+        role_id_1: {"$addToSet": {"user_ids": "remote"}},
+    })
+    assert not role_service.may_have_roles("remote")
+
+    role_service.MembersFilterTTL = 0
+    role_service.get = get  # type: ignore
+    try:
+        # the expired filter is used until the rebuild finishes
+        with count_queries() as counter:
+            assert not role_service.may_have_roles("remote")
+        assert counter.total == 0
+
+        deadline: float = time.monotonic() + 5
+        while not role_service.may_have_roles("remote"):
+            assert time.monotonic() < deadline
+            time.sleep(0.001)
+    finally:
+        del role_service.get  # type: ignore
+        del role_service.MembersFilterTTL
+
+    assert role_service.may_have_roles("late")
+
+
+def test_unknown_route_skips_user_lookup(
+    user_id_1: str,
+    access_service: AccessService,
+):
+    def resolve(user_ids):
+        assert not set(user_ids)
+        return {}
+
+    access_service._resolve_user_ids = resolve  # noqa: SLF001
+    try:
+        for _ in range(2):
+            validation.expect(
+                access_service.check_user,
+                NotFoundError,
+                user_id_1,
+                "/wp-admin.php",
+                "GET",
+            )
+        assert access_service.check_many([
+            (user_id_1, "/wp-admin.php", "GET"),
+        ]) == [AccessDecision.RouteNotFound]
+    finally:
+        del access_service._resolve_user_ids  # noqa: SLF001
+
+
+@pytest.mark.parametrize(
+    "synthetic_dataset",
+    [{"users": 1000, "roles": 30, "permissions": 100}],
+    indirect=True,
+)
+def test_check_many_synthetic(
+    synthetic_dataset: SyntheticDataset,
+    access_service: AccessService,
+):
+    # synthetic users have roles, but no access to real controllers
+    assert access_service.check_many([
+        (user_id, "/items", "get")
+        for user_id in synthetic_dataset.user_ids[:100]
+    ]) == [AccessDecision.Forbidden] * 100
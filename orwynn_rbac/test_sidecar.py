@@ -0,0 +1,218 @@
+import asyncio
+
+import pytest
+from pykit.errors import UnsupportedError
+
+from orwynn_rbac.enums import AccessDecision
+from orwynn_rbac.errors import MalformedSidecarFrameError
+from orwynn_rbac.models import PolicyRoute, PolicySnapshot
+from orwynn_rbac.policy import CompiledPolicy
+from orwynn_rbac.sidecar import (
+    DecisionClient,
+    DecisionServer,
+    MaxFrameSize,
+    SidecarProtocol,
+)
+
+GetItemPermissionName: str = \
+    "slimebones.orwynn-rbac.testing.permission.item:get"
+UpdateItemPermissionName: str = \
+    "slimebones.orwynn-rbac.testing.permission.item:update"
+
+
+@pytest.fixture
+def policy() -> CompiledPolicy:
+    return CompiledPolicy(PolicySnapshot(
+        routes=[
+            PolicyRoute(
+                abstract_routes=["/items"],
+                permission_names={
+                    "get": GetItemPermissionName,
+                    "post": None,
+                },
+            ),
+            PolicyRoute(
+                abstract_routes=["/items/{id}"],
+                permission_names={
+                    "patch": UpdateItemPermissionName,
+                },
+            ),
+        ],
+        permission_names_by_role_id={
+            "guard": [GetItemPermissionName],
+            "seller": [UpdateItemPermissionName, "dynamic:uncovered"],
+        },
+        role_ids_by_user_id={
+            "joebishop": ["guard"],
+            "apunahasapeemapetilon": ["guard", "seller"],
+        },
+        unauthorized_permission_names=[],
+        authorized_permission_names=[GetItemPermissionName],
+    ))
+
+
+def test_policy_decide(policy: CompiledPolicy):
+    assert policy.decide("joebishop", "/items", "GET") \
+        == AccessDecision.Allowed
+    assert policy.decide("joebishop", "/items/1", "PATCH") \
+        == AccessDecision.Forbidden
+    assert policy.decide("apunahasapeemapetilon", "/items/1", "PATCH") \
+        == AccessDecision.Allowed
+    # uncovered method
+    assert policy.decide("apunahasapeemapetilon", "/items", "POST") \
+        == AccessDecision.Allowed
+    assert policy.decide("unknown", "/items", "GET") \
+        == AccessDecision.Allowed
+    assert policy.decide(None, "/items", "GET") \
+        == AccessDecision.Forbidden
+    assert policy.decide("joebishop", "/items/1", "GET") \
+        == AccessDecision.RouteNotFound
+
+
+def test_protocol_roundtrip():
+    checks = [("joebishop", "/items", "get"), (None, "/items/1", "patch")]
+
+    frame: bytes = SidecarProtocol.encode_request(7, checks)
+
+    assert SidecarProtocol.decode_request(frame[4:]) == (7, checks)
+
+
+@pytest.mark.asyncio
+async def test_sidecar_pipelined(policy: CompiledPolicy, tmp_path):
+    socket_path: str = str(tmp_path / "rbac.sock")
+    server: DecisionServer = DecisionServer(policy, socket_path)
+    await server.start()
+
+    try:
+        async with DecisionClient(socket_path) as client:
+            assert await client.check_many([
+                ("joebishop", "/items", "get"),
+                ("joebishop", "/items/1", "patch"),
+                (None, "/unknown", "get"),
+            ]) == [
+                AccessDecision.Allowed,
+                AccessDecision.Forbidden,
+                AccessDecision.RouteNotFound,
+            ]
+    finally:
+        await server.close()
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        b"",
+        b"\x00\x00\x00\x07\x00\x01",
+        # invalid utf-8 user id
+        b"\x00\x00\x00\x07\x00\x01\x00\x01\xff\x00\x00\x00",
+        # trailing bytes
+        SidecarProtocol.encode_request(7, [(None, "/items", "get")])[4:]
+        + b"\x00",
+    ],
+)
+def test_decode_malformed_request(payload: bytes):
+    with pytest.raises(MalformedSidecarFrameError):
+        SidecarProtocol.decode_request(payload)
+
+
+@pytest.mark.asyncio
+async def test_sidecar_malformed_frame(policy: CompiledPolicy, tmp_path):
+    socket_path: str = str(tmp_path / "rbac.sock")
+    server: DecisionServer = DecisionServer(policy, socket_path)
+    await server.start()
+
+    try:
+        reader: asyncio.StreamReader
+        writer: asyncio.StreamWriter
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        writer.write(b"\x00\x00\x00\x01\xff")
+        await writer.drain()
+        # the connection is closed without any response
+        assert await asyncio.wait_for(reader.read(), 1) == b""
+        writer.close()
+
+        async with DecisionClient(socket_path) as client:
+            assert await client.check(None, "/items", "get") \
+                == AccessDecision.Forbidden
+    finally:
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_sidecar_oversized_frame(policy: CompiledPolicy, tmp_path):
+    socket_path: str = str(tmp_path / "rbac.sock")
+    server: DecisionServer = DecisionServer(policy, socket_path)
+    await server.start()
+
+    try:
+        reader: asyncio.StreamReader
+        writer: asyncio.StreamWriter
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        # the header announces almost 4 GiB, but only a few bytes follow
+        writer.write(b"\xff\xff\xff\xf0" + b"\x00" * 16)
+        await writer.drain()
+        # the connection is closed without waiting for the announced bytes
+        assert await asyncio.wait_for(reader.read(), 1) == b""
+        writer.close()
+    finally:
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_read_oversized_frame():
+    reader: asyncio.StreamReader = asyncio.StreamReader()
+    reader.feed_data((MaxFrameSize + 1).to_bytes(4))
+    reader.feed_eof()
+
+    with pytest.raises(MalformedSidecarFrameError):
+        await SidecarProtocol.read_frame(reader)
+
+
+def test_encode_oversized_request():
+    with pytest.raises(UnsupportedError):
+        SidecarProtocol.encode_request(
+            7, [(None, "/" + "a" * 0xFFFE, "get")] * 100,
+        )
+
+
+@pytest.mark.asyncio
+async def test_client_reader_exit(tmp_path):
+    socket_path: str = str(tmp_path / "rbac.sock")
+    connection_count: int = 0
+
+    async def handle(
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        nonlocal connection_count
+        connection_count += 1
+        batch_id: int = SidecarProtocol.decode_request(
+            await SidecarProtocol.read_frame(reader),
+        )[0]
+        if connection_count == 1:
+            # response with an unknown decision code
+            writer.write(
+                b"\x00\x00\x00\x07" + batch_id.to_bytes(4) + b"\x00\x01\x09",
+            )
+        else:
+            writer.write(SidecarProtocol.encode_response(
+                batch_id, [AccessDecision.Allowed],
+            ))
+        await writer.drain()
+
+    server: asyncio.AbstractServer = await asyncio.start_unix_server(
+        handle, path=socket_path,
+    )
+    try:
+        async with DecisionClient(socket_path) as client:
+            with pytest.raises(MalformedSidecarFrameError):
+                await asyncio.wait_for(
+                    client.check(None, "/items", "get"), 1,
+                )
+            # the client connects again instead of waiting forever
+            assert await asyncio.wait_for(
+                client.check(None, "/items", "get"), 1,
+            ) == AccessDecision.Allowed
+    finally:
+        server.close()
+        await server.wait_closed()
@@ -0,0 +1,39 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pykit import validation
+
+from orwynn_rbac.singleflight import SingleFlight
+
+
+def test_concurrent_calls_coalesced():
+    flight: SingleFlight[int] = SingleFlight()
+    calls: list[int] = []
+    barrier: threading.Barrier = threading.Barrier(20)
+
+    def resolve() -> int:
+        calls.append(1)
+        time.sleep(0.1)
+        return 42
+
+    def call() -> int:
+        barrier.wait()
+        return flight.do("user-1", resolve)
+
+    with ThreadPoolExecutor(20) as executor:
+        results: list[int] = list(executor.map(lambda _: call(), range(20)))
+
+    assert results == [42] * 20
+    assert len(calls) == 1
+    assert not flight.is_in_flight("user-1")
+
+
+def test_error_shared_and_not_cached():
+    flight: SingleFlight[int] = SingleFlight()
+
+    def fail() -> int:
+        raise ValueError
+
+    validation.expect(flight.do, ValueError, "user-1", fail)
+    assert flight.do("user-1", lambda: 1) == 1
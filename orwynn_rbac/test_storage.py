@@ -0,0 +1,284 @@
+from typing import Any
+
+import pytest
+from orwynn.di.di import Di
+from pykit import validation
+from pykit.errors import NotFoundError
+
+from orwynn_rbac.bootscripts import RBACBoot
+from orwynn_rbac.documents import Permission, Role
+from orwynn_rbac.models import HTTPAction
+from orwynn_rbac.search import PermissionSearch, RoleSearch
+from orwynn_rbac.services import (
+    AccessService,
+    PermissionService,
+    RoleService,
+)
+from orwynn_rbac.storage import (
+    MemoryRBACStorage,
+    MongoRBACStorage,
+    RBACStorage,
+)
+from orwynn_rbac.testing import (
+    DefaultRoles,
+    QueryPlan,
+    QueryPlanRecorder,
+    SyntheticDataset,
+    load_synthetic_dataset,
+)
+
+ItemsKey: str = "/items@orwynn_rbac.testing.ItemsController"
+ItemsIDKey: str = "/items/{id}@orwynn_rbac.testing.ItemsIDController"
+
+
+def _create_storage() -> MemoryRBACStorage:
+    storage: MemoryRBACStorage = MemoryRBACStorage()
+
+    permissions: list[Permission] = storage.create_permissions([
+        Permission(
+            name="slimebones.orwynn-rbac.testing.permission.item:get",
+            actions=[HTTPAction(controller_key=ItemsKey, method="get")],
+            is_dynamic=False,
+        ),
+        Permission(
+            name="slimebones.orwynn-rbac.testing.permission.item:update",
+            actions=[HTTPAction(controller_key=ItemsIDKey, method="patch")],
+            is_dynamic=False,
+        ),
+    ])
+    storage.create_roles([
+        Role(
+            name="guard",
+            permission_ids=[permissions[0].getid()],
+            user_ids=["1", "2"],
+            is_dynamic=False,
+        ),
+        Role(
+            name="seller",
+            permission_ids=[p.getid() for p in permissions],
+            user_ids=["2"],
+            is_dynamic=False,
+        ),
+    ])
+
+    return storage
+
+
+def test_memory_get_by_indexes():
+    storage: MemoryRBACStorage = _create_storage()
+
+    assert [r.name for r in storage.get_roles(RoleSearch(user_ids=["2"]))] \
+        == ["guard", "seller"]
+    assert storage.get_permissions(PermissionSearch(
+        actions=[HTTPAction(controller_key=ItemsIDKey, method="patch")],
+    ))[0].name == "slimebones.orwynn-rbac.testing.permission.item:update"
+    validation.expect(
+        storage.get_permissions,
+        NotFoundError,
+        PermissionSearch(
+            actions=[HTTPAction(controller_key=ItemsIDKey, method="get")],
+        ),
+    )
+    assert storage.get_role_ids_for_users(["1", "2", "3"]).keys() \
+        == {"1", "2"}
+
+
+def test_memory_not_found():
+    storage: MemoryRBACStorage = _create_storage()
+
+    validation.expect(
+        storage.get_roles,
+        NotFoundError,
+        RoleSearch(names=["seller"], user_ids=["1"]),
+    )
+
+
+def test_incomplete_storage_not_created():
+    class PermissionsOnlyStorage(RBACStorage):
+        def get_permissions(
+            self,
+            search: PermissionSearch,
+        ) -> list[Permission]:
+            return []
+
+    validation.expect(PermissionsOnlyStorage, TypeError)
+
+
+def test_memory_update_operators():
+    storage: MemoryRBACStorage = _create_storage()
+    role: Role = storage.get_roles(RoleSearch(names=["guard"]))[0]
+
+    updated: Role = storage.update_roles({
+        role.getid(): {
+            "$push": {"user_ids": "3"},
+            "$pull": {"user_ids": {"$in": ["1"]}},
+        },
+    })[0]
+
+    assert updated.user_ids == ["2", "3"]
+    assert storage.get_role_ids_for_users(["1"]) == {}
+    assert storage.get_role_ids_for_users(["3"]) == {"3": {role.getid()}}
+
+
+def test_memory_snapshot():
+    storage: MemoryRBACStorage = _create_storage()
+
+    restored: MemoryRBACStorage = MemoryRBACStorage.from_snapshot(
+        storage.dump(),
+    )
+
+    assert restored.dump() == storage.dump()
+
+
+def test_mongo_load(
+    role_service: RoleService,
+    rbac_baseline: dict[str, list[dict[str, Any]]],
+):
+    storage: RBACStorage = role_service.storage
+    storage.create_roles([
+        Role(name="temporary", user_ids=["1"], is_dynamic=False),
+    ])
+    revision: int = storage.revision
+
+    storage.load(rbac_baseline)
+
+    assert storage.revision > revision
+    assert storage.dump() == rbac_baseline
+    assert storage.get_role_ids_for_users(["1"]) == {}
+
+
+def test_synthetic_dataset():
+    storage: MemoryRBACStorage = MemoryRBACStorage()
+    dataset: SyntheticDataset = load_synthetic_dataset(
+        storage, users=2000, roles=50, permissions=200,
+    )
+
+    user_counts: list[int] = [
+        len(r.user_ids) for r in storage.get_roles(RoleSearch(
+            ids=dataset.role_ids,
+        ))
+    ]
+    assert len(storage.get_permissions(PermissionSearch())) \
+        == len(dataset.permission_ids)
+    assert len(user_counts) == len(dataset.role_ids)
+    # membership is skewed to the first roles
+    assert user_counts[0] > sorted(user_counts)[len(user_counts) // 2] * 5
+    assert storage.get_role_ids_for_users(dataset.user_ids).keys() \
+        == set(dataset.user_ids)
+
+
+def test_synthetic_dataset_reproducible():
+    def load(seed: int) -> list[tuple[str, list[str]]]:
+        storage: MemoryRBACStorage = MemoryRBACStorage()
+        load_synthetic_dataset(
+            storage, users=500, roles=20, permissions=50, seed=seed,
+        )
+        return [
+            (r.name, r.user_ids) for r in storage.get_roles(RoleSearch())
+        ]
+
+    assert load(1) == load(1)
+    assert load(1) != load(2)
+
+
+def test_query_plan_from_explain():
+    plan: QueryPlan = QueryPlan.from_explain(
+        "role",
+        "find",
+        {"user_ids": {"$in": ["1"]}},
+        {
+            "queryPlanner": {
+                "winningPlan": {
+                    "stage": "FETCH",
+                    "inputStage": {"stage": "IXSCAN", "keyPattern": {}},
+                },
+            },
+            "executionStats": {"totalDocsExamined": 2, "nReturned": 2},
+        },
+    )
+
+    assert sorted(plan.stages) == ["FETCH", "IXSCAN"]
+    assert not plan.is_collscan
+    assert plan.docs_examined == plan.returned
+
+
+def test_query_plan_recorder_records(
+    role_service: RoleService,
+    role_id_1: str,
+):
+    storage: RBACStorage = role_service.storage
+    assert isinstance(storage, MongoRBACStorage)
+
+    with QueryPlanRecorder(storage) as recorder:
+        role_service.set_for_user("1", RoleSearch(ids=[role_id_1]))
+        # whole collection reads are not recorded
+        storage.dump()
+    # queries are not recorded after the block
+    role_service.get(RoleSearch(names=["client"]))
+
+    assert recorder.queries
+    assert {o for _, o, _ in recorder.queries} == {"find"}
+    assert all(f for _, _, f in recorder.queries)
+    assert {"name": {"$in": ["client"]}} not in \
+        [f for _, _, f in recorder.queries]
+
+
+def test_hot_path_queries_indexed(  # noqa: PLR0913
+    query_plan_recorder: QueryPlanRecorder,
+    access_service: AccessService,
+    permission_service: PermissionService,
+    role_service: RoleService,
+    role_id_1: str,
+    user_id_1: str,
+):
+    with query_plan_recorder:
+        access_service.check_user(user_id_1, "/rbac/roles", "GET")
+        role_service.set_for_user("1", RoleSearch(ids=[role_id_1]))
+        permission_service._init_internal(  # noqa: SLF001
+            controllers=Di.ie().controllers,
+        )
+
+    assert query_plan_recorder.queries
+    query_plan_recorder.assert_indexed()
+
+
+def test_unindexed_query_detected(
+    query_plan_recorder: QueryPlanRecorder,
+    role_service: RoleService,
+):
+    with query_plan_recorder:
+        role_service.get(RoleSearch(is_dynamic=True))
+
+    with pytest.raises(AssertionError):
+        query_plan_recorder.assert_indexed()
+
+
+def test_legacy_actions_migrated_on_boot(
+    access_service: AccessService,
+    permission_service: PermissionService,
+    role_service: RoleService,
+    user_id_2: str,
+):
+    storage: RBACStorage = role_service.storage
+    assert isinstance(storage, MongoRBACStorage)
+    # actions stored by versions identifying controllers by their position
+    storage._get_collection(Permission).update_many(  # noqa: SLF001
+        {"name": "slimebones.orwynn-rbac.testing.permission.item:get"},
+        {"$set": {"actions": [{"controller_no": 0, "method": "get"}]}},
+    )
+
+    RBACBoot(default_roles=DefaultRoles)._boot(  # noqa: SLF001
+        role_service,
+        permission_service,
+        access_service,
+        Di.ie().find("MongoStateFlagService"),
+    )
+
+    assert storage.migrate() == 0
+    permission: Permission = permission_service.get(PermissionSearch(
+        names=["slimebones.orwynn-rbac.testing.permission.item:get"],
+    ))[0]
+    assert permission.actions == [
+        HTTPAction(controller_key=ItemsKey, method="get"),
+    ]
+    access_service.check_user(user_id_2, "/items", "get")
@@ -0,0 +1,43 @@
+from pykit import validation
+
+from orwynn_rbac.errors import InvalidPermissionTokenError
+from orwynn_rbac.tokens import PermissionToken, PermissionTokenSigner
+
+
+def _create_token() -> PermissionToken:
+    return PermissionToken(
+        user_id="jeffbezos",
+        permissions_version="0123456789abcdef",
+        role_ids=["656a3e3bf8b0a4d4a2b8a3c1"],
+        expires_at=1000,
+    )
+
+
+def test_mint_verify():
+    signer: PermissionTokenSigner = PermissionTokenSigner(b"key", lambda: 999)
+
+    assert signer.verify(signer.mint(_create_token())) == _create_token()
+
+
+def test_wrong_signature():
+    token: str = PermissionTokenSigner(b"key", lambda: 999).mint(
+        _create_token(),
+    )
+
+    validation.expect(
+        PermissionTokenSigner(b"other-key", lambda: 999).verify,
+        InvalidPermissionTokenError,
+        token,
+    )
+
+
+def test_expired():
+    signer: PermissionTokenSigner = PermissionTokenSigner(
+        b"key", lambda: 1000,
+    )
+
+    validation.expect(
+        signer.verify,
+        InvalidPermissionTokenError,
+        signer.mint(_create_token()),
+    )
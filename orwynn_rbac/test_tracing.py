@@ -0,0 +1,89 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from orwynn_rbac.services import AccessService
+from orwynn_rbac.tracing import (
+    FileSpanExporter,
+    MemorySpanExporter,
+    Span,
+    span,
+    use_span_exporter,
+)
+
+
+@pytest.fixture
+def exporter():
+    exporter: MemorySpanExporter = MemorySpanExporter()
+    use_span_exporter(exporter)
+    yield exporter
+    use_span_exporter(None)
+
+
+def test_disabled():
+    assert span("a") is span("b", key="value")
+
+
+def test_nested(exporter: MemorySpanExporter):
+    with span("outer", key="value"):
+        with span("inner"):
+            pass
+        with pytest.raises(ValueError), span("failed"):
+            raise ValueError
+    with span("next"):
+        pass
+
+    inner, failed, outer, next_ = exporter.spans
+    assert [s.name for s in exporter.spans] \
+        == ["inner", "failed", "outer", "next"]
+    assert outer.parent_id is None
+    assert outer.attributes == {"key": "value"}
+    assert inner.parent_id == outer.span_id
+    assert inner.trace_id == outer.trace_id
+    assert failed.error == "ValueError"
+    assert next_.trace_id != outer.trace_id
+
+
+def test_file_exporter(tmp_path: Path):
+    path: Path = Path(tmp_path, "spans.jsonl")
+    file_exporter: FileSpanExporter = FileSpanExporter(path)
+    use_span_exporter(file_exporter)
+    try:
+        with span("first"), span("second"):
+            pass
+    finally:
+        use_span_exporter(None)
+        file_exporter.close()
+
+    spans: list[Span] = [
+        Span.parse_obj(json.loads(line))
+        for line in path.read_text().splitlines()
+    ]
+    assert [s.name for s in spans] == ["second", "first"]
+
+
+def test_check_user_traced(
+    exporter: MemorySpanExporter,
+    access_service: AccessService,
+    user_id_1: str,
+):
+    # drop spans of fixtures
+    exporter.clear()
+    access_service.check_user(user_id_1, "/rbac/roles", "GET")
+
+    spans_by_name: dict[str, Span] = {s.name: s for s in exporter.spans}
+    root: Span = spans_by_name["rbac.check_user"]
+    assert {s.trace_id for s in exporter.spans} == {root.trace_id}
+    assert [
+        spans_by_name[name].parent_id
+        for name in (
+            "rbac.route_resolution",
+            "rbac.user_resolution",
+            "rbac.permission_matching",
+        )
+    ] == [root.span_id] * 3
+    assert spans_by_name["rbac.storage.get_roles"].parent_id \
+        == spans_by_name["rbac.role_lookup"].span_id
+    assert spans_by_name["rbac.storage.get_permissions"].parent_id \
+        == spans_by_name["rbac.permission_lookup"].span_id
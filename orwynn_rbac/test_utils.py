@@ -0,0 +1,186 @@
+from typing import TYPE_CHECKING
+
+import pytest
+from orwynn.di.di import Di
+
+from orwynn_rbac.errors import IncorrectNamePermissionError
+from orwynn_rbac.services import PermissionService
+from orwynn_rbac.utils import (
+    MethodRouteMatcher,
+    PermissionUtils,
+    RouteMatcher,
+    RouteUtils,
+)
+
+if TYPE_CHECKING:
+    from orwynn import Controller
+
+    from orwynn_rbac.cache import TTLCache
+
+
+def test_route_matcher_first_match():
+    matcher: RouteMatcher = RouteMatcher([
+        "/items/{id}",
+        "/items/special",
+        "/{collection}",
+        "/users",
+    ])
+
+    assert [
+        matcher.match(route)
+        for route in [
+            "/items/special",
+            "/items/42",
+            "/articles",
+            "/users",
+            "/users/42",
+        ]
+    ] == [0, 0, 2, 2, None]
+
+
+def test_route_matcher_no_routes():
+    assert RouteMatcher([]).match("/items") is None
+
+
+def test_route_matcher_controller_pattern():
+    matcher: RouteMatcher = RouteMatcher(
+        ["/items/{id}", "/items"],
+        RouteUtils.get_controller_route_pattern,
+    )
+
+    assert matcher.match("/items/42") == 0
+    assert matcher.match("/items/4/2") is None
+    assert matcher.match("/items") == 1
+
+
+def test_app_route_matcher_routes_replaced():
+    class Route:
+        def __init__(self, path: str) -> None:
+            self.path: str = path
+
+    class App:
+        def __init__(self, routes: list[Route]) -> None:
+            self.routes: list[Route] = routes
+
+    app: App = App([Route("/items"), Route("/users/{id}")])
+    assert RouteUtils.get_app_route_matcher(app).match("/items") == 0
+
+    # replaced in place, so neither the list nor its length is changed
+    app.routes[0] = Route("/orders")
+
+    matcher: RouteMatcher = RouteUtils.get_app_route_matcher(app)
+    assert matcher.match("/items") is None
+    assert matcher.match("/orders") == 0
+    assert RouteUtils.get_app_route_matcher(app) is matcher
+
+
+def test_method_route_matcher():
+    matcher: MethodRouteMatcher = MethodRouteMatcher([
+        (["/items"], ["get"]),
+        (["/items", "/items/{id}"], ["POST", "delete"]),
+        (["/{any}"], ["get", "post"]),
+    ])
+
+    assert [
+        matcher.match(route, method)
+        for route, method in [
+            ("/items", "GET"),
+            ("/items", "post"),
+            ("/items/42", "delete"),
+            ("/users", "post"),
+            ("/items", "patch"),
+            ("/users", "delete"),
+        ]
+    ] == [0, 1, 1, 2, None, None]
+
+
+def test_collect_controller_permissions_cached(
+    permission_service: PermissionService,
+):
+    controller: Controller = RouteUtils.find_by_abstract_route(
+        "/items", Di.ie().controllers,
+    )[1]
+
+    permissions: dict[str, str] = \
+        PermissionUtils.collect_controller_permissions(controller)
+    assert permissions == controller.Permissions  # type: ignore
+
+    # the cached permissions are not affected by changes of returned ones
+    permissions["get"] = "changed"
+    assert PermissionUtils.collect_controller_permissions(
+        controller,
+    ) == controller.Permissions  # type: ignore
+
+
+def test_validated_permissions_cache_bounded():
+    ItemsController: type[Controller] = type(
+        RouteUtils.find_by_abstract_route("/items", Di.ie().controllers)[1],
+    )
+    count: int = PermissionUtils.ValidatedControllersCacheSize + 1
+
+    for i in range(count):
+        # controller classes defined at runtime, e.g. by discarded apps
+        ControllerClass: type = type(f"Controller{i}", (ItemsController,), {
+            "Permissions": {"get": f"testing.permission.item-{i}:get"},
+        })
+        PermissionUtils.collect_controller_permissions(ControllerClass())
+
+    assert len(
+        PermissionUtils._get_permissions_by_controller_key(),  # noqa: SLF001
+    ) <= PermissionUtils.ValidatedControllersCacheSize
+    assert len(
+        PermissionUtils._get_validated_permission_names(),  # noqa: SLF001
+    ) <= PermissionUtils.ValidatedPermissionNamesCacheSize
+
+
+def test_validated_permissions_cache_size_changed(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    ItemsController: type[Controller] = type(
+        RouteUtils.find_by_abstract_route("/items", Di.ie().controllers)[1],
+    )
+    size: int = 2
+    monkeypatch.setattr(
+        PermissionUtils, "ValidatedControllersCacheSize", size,
+    )
+    monkeypatch.setattr(
+        PermissionUtils, "ValidatedPermissionNamesCacheSize", size,
+    )
+
+    controllers: list[Controller] = [
+        type(f"ResizedController{i}", (ItemsController,), {
+            "Permissions": {"get": f"testing.permission.resized-{i}:get"},
+        })()
+        for i in range(size + 1)
+    ]
+    for controller in controllers:
+        PermissionUtils.collect_controller_permissions(controller)
+
+    controllers_cache: TTLCache = \
+        PermissionUtils._get_permissions_by_controller_key()  # noqa: SLF001
+    names_cache: TTLCache = \
+        PermissionUtils._get_validated_permission_names()  # noqa: SLF001
+    assert controllers_cache.maxsize == size
+    assert names_cache.maxsize == size
+    assert len(controllers_cache) == size
+    assert len(names_cache) == size
+    # the least recently validated permission name is evicted
+    assert not names_cache.get("testing.permission.resized-0:get")[0]
+    assert names_cache.get(f"testing.permission.resized-{size}:get")[0]
+
+
+def test_collect_controller_permissions_changed(
+    permission_service: PermissionService,
+):
+    controller: Controller = RouteUtils.find_by_abstract_route(
+        "/items", Di.ie().controllers,
+    )[1]
+    PermissionUtils.collect_controller_permissions(controller)
+
+    # permissions changed in place are validated again
+    controller.Permissions = {"get": "wrong"}  # type: ignore
+    try:
+        with pytest.raises(IncorrectNamePermissionError):
+            PermissionUtils.collect_controller_permissions(controller)
+    finally:
+        del controller.Permissions  # type: ignore
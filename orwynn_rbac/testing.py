@@ -1,6 +1,11 @@
+import asyncio
+import functools
+import itertools
 import os
+import random
+import threading
 from collections.abc import Callable
-from typing import TYPE_CHECKING, AsyncGenerator
+from typing import Any, AsyncGenerator, Generator
 
 import pytest
 import pytest_asyncio
@@ -8,26 +13,23 @@ from orwynn import Module, Worker
 from orwynn.app import App
 from orwynn.boot import Boot
 from orwynn.di.di import Di
-from orwynn.http import (
-    Endpoint,
-    HttpController,
-    HttpMiddleware,
-    HttpRequest,
-    HttpResponse,
-)
+from orwynn.http import Endpoint, HttpController
+from orwynn.model import Model
 from orwynn.mongo import Mongo
 from orwynn.mongo import module as mongo_module
 from orwynn.testing import Client
 from pykit import validation
+from pymongo.collection import Collection
+from pymongo.errors import OperationFailure
 
 from orwynn_rbac import module as rbac_module
 from orwynn_rbac.bootscripts import RBACBoot
-from orwynn_rbac.models import DefaultRole, RoleCreate
+from orwynn_rbac.documents import Permission, Role
+from orwynn_rbac.middleware import AccessMiddleware
+from orwynn_rbac.models import DefaultRole, HTTPAction, RoleCreate
 from orwynn_rbac.search import PermissionSearch, RoleSearch
 from orwynn_rbac.services import AccessService, PermissionService, RoleService
-
-if TYPE_CHECKING:
-    from starlette.datastructures import Headers
+from orwynn_rbac.storage import MongoRBACStorage, RBACStorage
 
 DefaultRoles: list[DefaultRole] = [
     DefaultRole(
@@ -45,6 +47,13 @@ DefaultRoles: list[DefaultRole] = [
             "slimebones.orwynn-rbac.role.permission.role:update",
             "slimebones.orwynn-rbac.role.permission.role:delete",
             "slimebones.orwynn-rbac.role.permission.roles:delete",
+            "slimebones.orwynn-rbac.metrics.permission.metrics:get",
+            "slimebones.orwynn-rbac.explain.permission.explain:get",
+            "slimebones.orwynn-rbac.profiler.permission.profiler:get",
+            "slimebones.orwynn-rbac.profiler.permission.profiler:update",
+            "slimebones.orwynn-rbac.profiler.permission.profiler:delete",
+            "slimebones.orwynn-rbac.profiler.permission.stacks:get",
+            "slimebones.orwynn-rbac.profiler.permission.stacks:delete",
         ],
     ),
     DefaultRole(
@@ -58,39 +67,6 @@ DefaultRoles: list[DefaultRole] = [
 ]
 
 
-class AccessMiddleware(HttpMiddleware):
-    def __init__(
-        self,
-        covered_routes: list[str],
-        role_service: RoleService,
-        permission_service: PermissionService,
-        access_service: AccessService,
-    ) -> None:
-        super().__init__(covered_routes)
-
-        self.role_service = role_service
-        self.permission_service = permission_service
-        self.access_service = access_service
-
-    async def process(
-        self,
-        request: HttpRequest,
-        call_next: Callable,
-    ) -> HttpResponse:
-        headers: Headers = request.headers
-
-        user_id: str | None = headers.get("user-id", None)
-
-        method: str = request.method
-        route: str = request.url.path
-
-        self.access_service.check_user(user_id, route, method)
-
-        response: HttpResponse = await call_next(request)
-
-        return response
-
-
 class ItemsController(HttpController):
     Route = "/items"
     Endpoints = [
@@ -157,13 +133,13 @@ def do_buy_item_permission_id(
     ))[0].getid()
 
 
-@pytest.fixture(autouse=True)
+@pytest.fixture(scope="session", autouse=True)
 def run_around_tests():
     os.environ["ORWYNN_MODE"] = "test"
 
     yield
 
-    # Ensure that workers created in previous test does not migrate in the
+    # Ensure that workers created in this session does not migrate in the
     # next one
     _discard_workers()
 
@@ -177,8 +153,21 @@ def _discard_workers(W: type[Worker] = Worker):
     os.environ["ORWYNN_APPRC_PATH"] = ""
 
 
-@pytest_asyncio.fixture
-async def main_boot() -> AsyncGenerator:
+@pytest.fixture(scope="session")
+def event_loop() -> Generator:
+    # session-scoped async fixtures require a loop living as long as they do
+    loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest_asyncio.fixture(scope="session")
+async def session_boot() -> AsyncGenerator:
+    """
+    Boots the testing app once per session.
+
+    Tests should use `main_boot` instead, which also resets the RBAC storage.
+    """
     boot: Boot = await Boot.create(
         Module(
             "/",
@@ -220,6 +209,34 @@ async def main_boot() -> AsyncGenerator:
     mongo.drop_database()
 
 
+@pytest.fixture(scope="session")
+def rbac_baseline(session_boot: Boot) -> dict[str, list[dict[str, Any]]]:
+    """
+    Snapshot of the RBAC storage right after the boot.
+    """
+    role_service: RoleService = Di.ie().find("RoleService")
+    return role_service.storage.dump()
+
+
+@pytest.fixture
+def main_boot(
+    session_boot: Boot,
+    rbac_baseline: dict[str, list[dict[str, Any]]],
+) -> Boot:
+    """
+    Returns the session's app with the RBAC storage restored to the state
+    made by the boot.
+
+    Settings given to the services, e.g. a token key, are not reset.
+    """
+    role_service: RoleService = Di.ie().find("RoleService")
+    role_service.storage.load(rbac_baseline)
+    role_service.storage.instrumentation.reset()
+    role_service.rebuild_members_filter()
+
+    return session_boot
+
+
 @pytest.fixture
 def permission_service(main_boot) -> PermissionService:
     return validation.apply(
@@ -236,6 +253,380 @@ def role_service(main_boot) -> RoleService:
     )
 
 
+@pytest.fixture
+def access_service(main_boot) -> AccessService:
+    return validation.apply(
+        Di.ie().find("AccessService"),
+        AccessService,
+    )
+
+
+class QueryPlan(Model):
+    """
+    Explained plan of a query made to an RBAC collection.
+
+    Attributes:
+        collection:
+            Name of the queried collection.
+        operation:
+            Name of the collection method made the query.
+        filter:
+            Query filter.
+        stages:
+            Names of all stages of the winning plan.
+        docs_examined:
+            Amount of documents examined by the query.
+        returned:
+            Amount of documents returned by the query.
+    """
+    collection: str
+    operation: str
+    filter: dict[str, Any]
+    stages: list[str]
+    docs_examined: int
+    returned: int
+
+    @property
+    def is_collscan(self) -> bool:
+        return "COLLSCAN" in self.stages
+
+    @classmethod
+    def from_explain(
+        cls,
+        collection: str,
+        operation: str,
+        filter: dict[str, Any],
+        explain: dict[str, Any],
+    ) -> "QueryPlan":
+        """
+        Creates plan from result of the "explain" command run with the
+        "executionStats" verbosity.
+        """
+        stages: list[str] = []
+        nodes: list[Any] = [explain["queryPlanner"]["winningPlan"]]
+        while nodes:
+            node: Any = nodes.pop()
+            if isinstance(node, dict):
+                if "stage" in node:
+                    stages.append(node["stage"])
+                nodes.extend(node.values())
+            elif isinstance(node, list):
+                nodes.extend(node)
+
+        return cls(
+            collection=collection,
+            operation=operation,
+            filter=filter,
+            stages=stages,
+            docs_examined=explain["executionStats"]["totalDocsExamined"],
+            returned=explain["executionStats"]["nReturned"],
+        )
+
+
+class QueryPlanRecorder:
+    """
+    Records queries made to the RBAC collections and checks that they are
+    backed by indexes.
+
+    Queries are recorded by patching collection methods for the duration of
+    the `with` block and explained afterwards with the "explain" command.
+    Queries with an empty filter are reads or deletes of whole collections
+    made on purpose, so they are not recorded.
+
+    Example:
+    ```python
+    with QueryPlanRecorder(storage) as recorder:
+        access_service.check_user(user_id, "/items", "get")
+    recorder.assert_indexed()
+    ```
+
+    Attributes:
+        RecordedOperations:
+            Names of collection methods taking a filter as the first
+            argument which are recorded.
+        MaxExaminedRatio:
+            Maximum ratio of examined documents to returned ones. Queries
+            returning nothing are compared as returning one document.
+    """
+    RecordedOperations: list[str] = [
+        "find",
+        "find_one",
+        "find_one_and_delete",
+        "find_one_and_update",
+        "count_documents",
+        "update_one",
+        "update_many",
+        "delete_one",
+        "delete_many",
+    ]
+    MaxExaminedRatio: float = 10.0
+
+    def __init__(
+        self,
+        storage: MongoRBACStorage,
+    ) -> None:
+        self._collections: dict[str, Collection] = {
+            c.name: c for c in (
+                storage._get_collection(Permission),  # noqa: SLF001
+                storage._get_collection(Role),  # noqa: SLF001
+            )
+        }
+        self._originals: dict[str, Callable] = {}
+        self._lock: threading.Lock = threading.Lock()
+        self.queries: list[tuple[str, str, dict[str, Any]]] = []
+
+    def __enter__(self) -> "QueryPlanRecorder":
+        CollectionClass: type = type(next(iter(self._collections.values())))
+
+        for name in self.RecordedOperations:
+            original: Callable = getattr(CollectionClass, name)
+            self._originals[name] = original
+            setattr(CollectionClass, name, self._wrap(name, original))
+
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        CollectionClass: type = type(next(iter(self._collections.values())))
+
+        for name, original in self._originals.items():
+            setattr(CollectionClass, name, original)
+        self._originals.clear()
+
+    def explain(self) -> list[QueryPlan]:
+        """
+        Explains all recorded queries.
+
+        Raises:
+            OperationFailure:
+                The server cannot explain a query.
+        """
+        return [
+            QueryPlan.from_explain(
+                collection,
+                operation,
+                filter,
+                self._explain(collection, filter),
+            )
+            for collection, operation, filter in self.queries
+        ]
+
+    def is_explain_supported(self) -> bool:
+        """
+        Checks whether the server can explain queries, e.g. it is not a
+        mocked one.
+        """
+        try:
+            self._explain(next(iter(self._collections.keys())), {})
+        except (NotImplementedError, OperationFailure):
+            return False
+        return True
+
+    def assert_indexed(self) -> list[QueryPlan]:
+        """
+        Checks that no recorded query scans a whole collection or examines
+        too many documents.
+
+        Returns:
+            Explained plans.
+
+        Raises:
+            AssertionError:
+                Some queries are not backed by indexes.
+        """
+        plans: list[QueryPlan] = self.explain()
+        failed_plans: list[QueryPlan] = [
+            p for p in plans
+            if p.is_collscan
+            or p.docs_examined > self.MaxExaminedRatio * max(p.returned, 1)
+        ]
+
+        if failed_plans:
+            err_message: str = "queries not backed by indexes:\n" + "\n".join(
+                f"{p.collection}.{p.operation}({p.filter}):"
+                f" stages={p.stages}, examined={p.docs_examined},"
+                f" returned={p.returned}"
+                for p in failed_plans
+            )
+            raise AssertionError(err_message)
+
+        return plans
+
+    def _explain(
+        self,
+        collection: str,
+        filter: dict[str, Any],
+    ) -> dict[str, Any]:
+        return self._collections[collection].database.command(
+            {
+                "explain": {"find": collection, "filter": filter},
+                "verbosity": "executionStats",
+            },
+        )
+
+    def _wrap(self, name: str, original: Callable) -> Callable:
+        @functools.wraps(original)
+        def wrapped(collection: Collection, *args: Any, **kwargs: Any) -> Any:
+            filter: dict[str, Any] | None = \
+                args[0] if args else kwargs.get("filter")
+            if filter and collection.name in self._collections:
+                with self._lock:
+                    self.queries.append((collection.name, name, filter))
+            return original(collection, *args, **kwargs)
+
+        return wrapped
+
+
+@pytest.fixture
+def query_plan_recorder(role_service: RoleService) -> QueryPlanRecorder:
+    """
+    Returns recorder of queries to the RBAC collections of the booted app.
+
+    Skips the test if the Mongo server cannot explain queries.
+    """
+    storage: RBACStorage = role_service.storage
+    if not isinstance(storage, MongoRBACStorage):
+        pytest.skip("the app does not use a Mongo storage")
+
+    recorder: QueryPlanRecorder = QueryPlanRecorder(storage)
+    if not recorder.is_explain_supported():
+        pytest.skip("the Mongo server cannot explain queries")
+
+    return recorder
+
+
+class SyntheticDataset(Model):
+    """
+    Ids of documents loaded by `load_synthetic_dataset`.
+
+    Ids of permissions and roles are given in order of their numbers in
+    generated names, e.g. role "synthetic-role-0" is the first one. Roles
+    with lower numbers have more users.
+    """
+    permission_ids: list[str]
+    role_ids: list[str]
+    user_ids: list[str]
+
+
+def load_synthetic_dataset(  # noqa: PLR0913
+    storage: RBACStorage,
+    *,
+    users: int = 100000,
+    roles: int = 1000,
+    permissions: int = 5000,
+    roles_per_user: int = 3,
+    permissions_per_role: int = 20,
+    skew: float = 1.1,
+    seed: int = 0,
+) -> SyntheticDataset:
+    """
+    Generates a reproducible dataset and loads it into the storage.
+
+    Permissions and roles are inserted with one bulk write each. Role
+    membership is skewed: users pick roles with Zipf-like weights, so a few
+    roles have most of users, as in real deployments.
+
+    Permissions have actions of synthetic controllers which do not exist in
+    the app, so the dataset should be loaded after the boot, which deletes
+    permissions unused by controllers.
+
+    Args:
+        storage:
+            Storage to load the dataset into.
+        users(optional):
+            Amount of users.
+        roles(optional):
+            Amount of roles.
+        permissions(optional):
+            Amount of permissions.
+        roles_per_user(optional):
+            Amount of role picks per user. Repeated picks are merged, so some
+            users have less roles.
+        permissions_per_role(optional):
+            Amount of permissions of each role.
+        skew(optional):
+            Exponent of role weights. Zero gives uniform membership.
+        seed(optional):
+            Seed of the generator. Same seed gives the same dataset.
+    """
+    rnd: random.Random = random.Random(seed)
+
+    permission_ids: list[str] = [
+        p.getid() for p in storage.create_permissions([
+            Permission(
+                name=f"slimebones.orwynn-rbac.synthetic.permission.resource-{i}:get",
+                actions=[HTTPAction(
+                    controller_key=f"/synthetic-{i}@synthetic.Controller{i}",
+                    method="get",
+                )],
+                is_dynamic=False,
+            )
+            for i in range(permissions)
+        ])
+    ] if permissions else []
+
+    user_ids: list[str] = [f"synthetic-user-{i}" for i in range(users)]
+    # cumulative weights are computed once instead of on every pick
+    role_cum_weights: list[float] = list(itertools.accumulate(
+        1 / (i + 1) ** skew for i in range(roles)
+    ))
+    role_nos: range = range(roles)
+    user_ids_by_role_no: list[list[str]] = [[] for _ in role_nos]
+    if roles:
+        for user_id in user_ids:
+            for role_no in set(rnd.choices(
+                role_nos, cum_weights=role_cum_weights, k=roles_per_user,
+            )):
+                user_ids_by_role_no[role_no].append(user_id)
+
+    role_ids: list[str] = [
+        r.getid() for r in storage.create_roles([
+            Role(
+                name=f"synthetic-role-{i}",
+                permission_ids=rnd.sample(
+                    permission_ids,
+                    min(permissions_per_role, len(permission_ids)),
+                ),
+                user_ids=user_ids_by_role_no[i],
+                is_dynamic=False,
+            )
+            for i in range(roles)
+        ])
+    ] if roles else []
+
+    return SyntheticDataset(
+        permission_ids=permission_ids,
+        role_ids=role_ids,
+        user_ids=user_ids,
+    )
+
+
+@pytest.fixture
+def synthetic_dataset(
+    request: pytest.FixtureRequest,
+    role_service: RoleService,
+) -> SyntheticDataset:
+    """
+    Loads a synthetic dataset into the booted app's storage.
+
+    Full-size by default. Arguments of `load_synthetic_dataset` can be given
+    with indirect parametrization:
+    ```python
+    @pytest.mark.parametrize(
+        "synthetic_dataset", [{"users": 1000}], indirect=True,
+    )
+    def test_something(synthetic_dataset: SyntheticDataset): ...
+    ```
+    """
+    kwargs: dict[str, Any] = getattr(request, "param", {})
+    dataset: SyntheticDataset = load_synthetic_dataset(
+        role_service.storage, **kwargs,
+    )
+
+    role_service.rebuild_members_filter()
+
+    return dataset
+
+
 @pytest.fixture
 def permission_id_1(
     permission_service: PermissionService,
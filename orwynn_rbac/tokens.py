@@ -0,0 +1,124 @@
+"""
+Compact signed permission tokens.
+
+A token is `<payload>.<signature>`, both parts are unpadded base64url. The
+payload is a compact JSON array:
+    [user id, permissions version, [role id, ...], expiration timestamp]
+and the signature is HMAC-SHA256 of the encoded payload made with a local
+key.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import time
+from collections.abc import Callable
+
+from orwynn.model import Model
+
+from orwynn_rbac.errors import InvalidPermissionTokenError
+
+
+class PermissionToken(Model):
+    """
+    Attributes:
+        user_id:
+            Id of the user the token is minted for.
+        permissions_version:
+            `CompiledPolicy.permissions_version` the role ids are valid for.
+        role_ids:
+            Ids of all non-dynamic roles of the user.
+        expires_at:
+            Unix timestamp in seconds after which the token is invalid.
+    """
+    user_id: str
+    permissions_version: str
+    role_ids: list[str]
+    expires_at: int
+
+
+class PermissionTokenSigner:
+    """
+    Mints and verifies signed permission tokens.
+    """
+    def __init__(
+        self,
+        key: bytes,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._key: bytes = key
+        self._clock: Callable[[], float] = clock
+
+    def mint(self, token: PermissionToken) -> str:
+        payload: bytes = self._encode(json.dumps(
+            [
+                token.user_id,
+                token.permissions_version,
+                token.role_ids,
+                token.expires_at,
+            ],
+            separators=(",", ":"),
+        ).encode())
+
+        return (payload + b"." + self._encode(self._sign(payload))).decode()
+
+    def verify(self, raw_token: str) -> PermissionToken:
+        """
+        Verifies given token and decodes it.
+
+        Raises:
+            InvalidPermissionTokenError:
+                The token is malformed, has a wrong signature or is expired.
+        """
+        try:
+            payload, signature = raw_token.encode().split(b".")
+        except ValueError as err:
+            raise InvalidPermissionTokenError(
+                explanation="malformed",
+            ) from err
+
+        try:
+            is_signed: bool = hmac.compare_digest(
+                self._decode(signature), self._sign(payload),
+            )
+        except (binascii.Error, ValueError) as err:
+            raise InvalidPermissionTokenError(
+                explanation="malformed signature",
+            ) from err
+        if not is_signed:
+            raise InvalidPermissionTokenError(
+                explanation="wrong signature",
+            )
+
+        try:
+            user_id, permissions_version, role_ids, expires_at = json.loads(
+                self._decode(payload),
+            )
+        except (binascii.Error, TypeError, ValueError) as err:
+            raise InvalidPermissionTokenError(
+                explanation="malformed payload",
+            ) from err
+
+        if expires_at <= self._clock():
+            raise InvalidPermissionTokenError(
+                explanation="expired",
+            )
+
+        return PermissionToken(
+            user_id=user_id,
+            permissions_version=permissions_version,
+            role_ids=role_ids,
+            expires_at=expires_at,
+        )
+
+    def _sign(self, payload: bytes) -> bytes:
+        return hmac.new(self._key, payload, hashlib.sha256).digest()
+
+    @staticmethod
+    def _encode(data: bytes) -> bytes:
+        return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+    @staticmethod
+    def _decode(data: bytes) -> bytes:
+        return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
@@ -0,0 +1,216 @@
+import abc
+import contextlib
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar, Token
+from pathlib import Path
+from typing import Any, ContextManager
+
+from orwynn.model import Model
+
+
+class Span(Model):
+    """
+    Finished span of a traced operation.
+
+    Attributes:
+        name:
+            Name of the operation.
+        trace_id:
+            Id shared by all spans started within the same root span.
+        span_id:
+            Id of the span.
+        parent_id:
+            Id of the span this span has been started within, or None for a
+            root span.
+        started_at:
+            Unix time the span has been started at.
+        seconds:
+            Duration of the span.
+        attributes:
+            Additional data of the operation.
+        error:
+            Name of the error class the operation has been failed with.
+    """
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    started_at: float
+    seconds: float
+    attributes: dict[str, Any]
+    error: str | None = None
+
+
+class SpanExporter(abc.ABC):
+    """
+    Receives every finished span.
+
+    Called in the thread finished the span, so implementations should be
+    thread-safe and fast.
+    """
+    @abc.abstractmethod
+    def export(self, span: Span) -> None:
+        """
+        Exports a finished span.
+        """
+
+
+class MemorySpanExporter(SpanExporter):
+    """
+    Keeps the latest finished spans in memory.
+
+    Args:
+        maxsize(optional):
+            Maximum amount of kept spans. The oldest spans are dropped on
+            overflow.
+    """
+    def __init__(
+        self,
+        maxsize: int = 10000,
+    ) -> None:
+        self._spans: deque[Span] = deque(maxlen=maxsize)
+
+    @property
+    def spans(self) -> list[Span]:
+        """
+        Kept spans in order they have been finished.
+        """
+        return list(self._spans)
+
+    def export(self, span: Span) -> None:
+        # appending to a deque is atomic
+        self._spans.append(span)
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    Appends finished spans to a file as JSON lines.
+
+    Args:
+        path:
+            Path of the file.
+    """
+    def __init__(
+        self,
+        path: Path,
+    ) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self._file = Path(path).open("a", encoding="utf-8")  # noqa: SIM115
+
+    def export(self, span: Span) -> None:
+        line: str = span.json() + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class _RecordingSpan:
+    __slots__ = (
+        "_exporter",
+        "_name",
+        "_attributes",
+        "trace_id",
+        "span_id",
+        "_parent_id",
+        "_started_at",
+        "_started_at_counter",
+        "_token",
+    )
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        name: str,
+        attributes: dict[str, Any],
+    ) -> None:
+        self._exporter: SpanExporter = exporter
+        self._name: str = name
+        self._attributes: dict[str, Any] = attributes
+
+    def __enter__(self) -> None:
+        parent: _RecordingSpan | None = _CurrentSpanVar.get()
+
+        self.span_id: str = _new_id()
+        self._parent_id: str | None = None
+        self.trace_id: str
+        if parent is None:
+            self.trace_id = _new_id()
+        else:
+            self.trace_id = parent.trace_id
+            self._parent_id = parent.span_id
+
+        self._token: Token = _CurrentSpanVar.set(self)
+        self._started_at: float = time.time()
+        self._started_at_counter: float = time.perf_counter()
+
+    def __exit__(
+        self,
+        ErrorClass: type[BaseException] | None,
+        *args: object,
+    ) -> None:
+        seconds: float = time.perf_counter() - self._started_at_counter
+        _CurrentSpanVar.reset(self._token)
+
+        self._exporter.export(Span(
+            name=self._name,
+            trace_id=self.trace_id,
+            span_id=self.span_id,
+            parent_id=self._parent_id,
+            started_at=self._started_at,
+            seconds=seconds,
+            attributes=self._attributes,
+            error=None if ErrorClass is None else ErrorClass.__name__,
+        ))
+
+
+_CurrentSpanVar: ContextVar[_RecordingSpan | None] = ContextVar(
+    "orwynn_rbac_current_span",
+    default=None,
+)
+_NoopSpan: ContextManager[None] = contextlib.nullcontext()
+_Exporter: SpanExporter | None = None
+
+
+def use_span_exporter(exporter: SpanExporter | None) -> None:
+    """
+    Enables tracing of the RBAC services with the given exporter, or
+    disables it if None is given.
+
+    Tracing is disabled by default.
+    """
+    global _Exporter  # noqa: PLW0603
+    _Exporter = exporter
+
+
+def span(name: str, **attributes: Any) -> ContextManager[None]:
+    """
+    Traces the operation made within the returned context manager.
+
+    Spans started within the operation, also in threads started with
+    `asyncio.to_thread`, become its children. If tracing is disabled, a
+    shared no-op context manager is returned.
+
+    Example:
+    ```python
+    with span("rbac.check_user", route=route):
+        ...
+    ```
+    """
+    exporter: SpanExporter | None = _Exporter
+    if exporter is None:
+        return _NoopSpan
+    return _RecordingSpan(exporter, name, attributes)
+
+
+def _new_id() -> str:
+    return f"{random.getrandbits(64):016x}"
@@ -1,4 +1,6 @@
 import re
+import weakref
+from collections.abc import Callable, Iterable
 from typing import Any, Self
 
 from orwynn import Controller, Model
@@ -13,6 +15,7 @@ from pykit import validation
 from pykit.cls import Static
 from pykit.errors import EmptyInputError, NotFoundError, UnsupportedError
 
+from orwynn_rbac.cache import TTLCache
 from orwynn_rbac.constants import DynamicPrefix
 from orwynn_rbac.enums import PermissionAbstractAction
 from orwynn_rbac.errors import (
@@ -32,6 +35,73 @@ class NamingUtils(Static):
 
 
 class PermissionUtils(Static):
+    """
+    Attributes:
+        ValidatedControllersCacheSize:
+            Maximum amount of remembered validated controller permissions.
+        ValidatedPermissionNamesCacheSize:
+            Maximum amount of remembered validated permission names.
+
+    The caches are created on first use and recreated empty once their size
+    attribute is changed.
+    """
+    ValidatedControllersCacheSize: int = 1024
+    ValidatedPermissionNamesCacheSize: int = 4096
+
+    # validated permissions by controller class and its permission items,
+    # bounded, so controller classes of discarded apps are released
+    _PermissionsByControllerKey: TTLCache[
+        tuple[type[Controller], frozenset[tuple[Any, Any]]],
+        ControllerPermissions,
+    ] | None = None
+    _ValidatedPermissionNames: TTLCache[str, bool] | None = None
+    _PermissionTargetRegex: re.Pattern = re.compile(r"^[a-z0-9\-\.]+$")
+    _URLMethodByValue: dict[str, URLMethod] = {m.value: m for m in URLMethod}
+
+    @classmethod
+    def _get_permissions_by_controller_key(cls) -> TTLCache[
+        tuple[type[Controller], frozenset[tuple[Any, Any]]],
+        ControllerPermissions,
+    ]:
+        cache: TTLCache[
+            tuple[type[Controller], frozenset[tuple[Any, Any]]],
+            ControllerPermissions,
+        ] | None = cls._PermissionsByControllerKey
+
+        if cache is None or cache.maxsize != cls.ValidatedControllersCacheSize:
+            cache = TTLCache(cls.ValidatedControllersCacheSize)
+            cls._PermissionsByControllerKey = cache
+
+        return cache
+
+    @classmethod
+    def _get_validated_permission_names(cls) -> TTLCache[str, bool]:
+        cache: TTLCache[str, bool] | None = cls._ValidatedPermissionNames
+
+        if (
+            cache is None
+            or cache.maxsize != cls.ValidatedPermissionNamesCacheSize
+        ):
+            cache = TTLCache(cls.ValidatedPermissionNamesCacheSize)
+            cls._ValidatedPermissionNames = cache
+
+        return cache
+
+    @staticmethod
+    def get_controller_key(controller: Controller) -> str:
+        """
+        Returns identifier of the controller which does not depend on the
+        order controllers are registered in.
+
+        Made of the controller's route template and qualified name of its
+        class, e.g. "/items/{id}@myapp.items.ItemsIDController".
+        """
+        ControllerClass: type[Controller] = type(controller)
+        return (
+            f"{controller.Route}"
+            f"@{ControllerClass.__module__}.{ControllerClass.__qualname__}"
+        )
+
     @classmethod
     def collect_controller_permissions(
         cls,
@@ -40,6 +110,9 @@ class PermissionUtils(Static):
         """
         Returns dictionary {method: permission} for given controller.
 
+        Validated permissions are cached by the controller class and contents
+        of its `Permissions`, so the same controller is validated once.
+
         Returns:
             Controller permission by method.
 
@@ -53,6 +126,40 @@ class PermissionUtils(Static):
             IncorrectNamePermissionError:
                 If a controller used an incorrect name for a permission.
         """
+        raw_permissions: Any = getattr(controller, "Permissions", None)
+
+        cache: TTLCache[
+            tuple[type[Controller], frozenset[tuple[Any, Any]]],
+            ControllerPermissions,
+        ] = cls._get_permissions_by_controller_key()
+
+        key: tuple[type[Controller], frozenset[tuple[Any, Any]]] | None = None
+        if isinstance(raw_permissions, dict):
+            try:
+                key = (type(controller), frozenset(raw_permissions.items()))
+            except TypeError:
+                # unhashable values are left for the validation to reject
+                pass
+            else:
+                is_found: bool
+                cached: ControllerPermissions | None
+                is_found, cached = cache.get(key)
+                if is_found and cached is not None:
+                    return dict(cached)
+
+        controller_permissions: ControllerPermissions = \
+            cls._collect_controller_permissions(controller)
+
+        if key is not None:
+            cache.set(key, dict(controller_permissions))
+
+        return controller_permissions
+
+    @classmethod
+    def _collect_controller_permissions(
+        cls,
+        controller: Controller,
+    ) -> ControllerPermissions:
         controller_permissions: ControllerPermissions = {}
 
         try:
@@ -93,8 +200,8 @@ class PermissionUtils(Static):
         ControllerClass: type[Controller],
     ) -> None:
         try:
-            request_method: URLMethod = URLMethod(method.lower())
-        except ValueError as err:
+            request_method: URLMethod = cls._URLMethodByValue[method.lower()]
+        except KeyError as err:
             raise UnsupportedError(
                 title="request method",
                 value=method,
@@ -140,6 +247,10 @@ class PermissionUtils(Static):
             IncorrectNamePermissionError:
                 On any described above rule failure.
         """
+        cache: TTLCache[str, bool] = cls._get_validated_permission_names()
+        if cache.get(fullname)[0]:
+            return
+
         raw_action: str
         name: str
 
@@ -161,20 +272,168 @@ class PermissionUtils(Static):
                 explanation=f"unrecognized action={raw_action}",
             ) from err
 
-        try:
-            # TODO(ryzhovalex): add keycode pattern or keycode lib call here
-            validation.validate_re(
-                name,
-                r"^[a-z0-9\-\.]+$",
-            )
-        except validation.ValidationError as err:
+        # TODO(ryzhovalex): add keycode pattern or keycode lib call here
+        if not cls._PermissionTargetRegex.match(name):
             raise IncorrectNamePermissionError(
                 name=fullname,
                 explanation=f"invalid target name={name}",
-            ) from err
+            )
+
+        cache.set(fullname, True)
+
+
+class RouteMatcher:
+    """
+    Matches real routes against many abstract routes at once.
+
+    Abstract routes are grouped by their first segment. Routes of each
+    group, along with routes having a format bracket in the first segment,
+    are combined into a single alternation regex with a named group per
+    route. So matching is made by one dict lookup and one regex call instead
+    of a regex call per route.
+
+    Args:
+        abstract_routes:
+            Abstract routes to match against.
+        get_pattern(optional):
+            Function converting an abstract route into a regex pattern
+            string without capturing groups. Defaults to
+            `RouteUtils.get_route_pattern`.
+    """
+    def __init__(
+        self,
+        abstract_routes: list[str],
+        get_pattern: Callable[[str], str] | None = None,
+    ) -> None:
+        if get_pattern is None:
+            get_pattern = RouteUtils.get_route_pattern
+
+        self._abstract_routes: list[str] = abstract_routes
+
+        indexes_by_segment: dict[str, list[int]] = {}
+        any_segment_indexes: list[int] = []
+        for i, abstract_route in enumerate(abstract_routes):
+            segment: str = self._get_first_segment(abstract_route)
+            if "{" in segment:
+                any_segment_indexes.append(i)
+            else:
+                indexes_by_segment.setdefault(segment, []).append(i)
+
+        patterns: list[str] = [get_pattern(r) for r in abstract_routes]
+
+        # routes with any first segment are included into every group in
+        # order of registration, so the first matched route is kept first
+        self._regex_by_segment: dict[str, re.Pattern] = {
+            segment: self._combine(
+                patterns, sorted(indexes + any_segment_indexes),
+            )
+            for segment, indexes in indexes_by_segment.items()
+        }
+        self._any_segment_regex: re.Pattern | None = \
+            self._combine(patterns, any_segment_indexes)
+
+    @property
+    def abstract_routes(self) -> list[str]:
+        return self._abstract_routes
+
+    def match(self, route: str) -> int | None:
+        """
+        Returns:
+            Index of the first abstract route matching the route or None if
+            nothing is matched.
+        """
+        regex: re.Pattern | None = self._regex_by_segment.get(
+            self._get_first_segment(route), self._any_segment_regex,
+        )
+        if regex is None:
+            return None
+
+        match: re.Match | None = regex.fullmatch(route)
+        if match is None:
+            return None
+        # named groups have no nested capturing groups, so the last matched
+        # group is the matched route's one
+        return int(match.lastgroup[1:])  # type: ignore
+
+    @staticmethod
+    def _get_first_segment(route: str) -> str:
+        return route.split("/", 2)[1] if route.startswith("/") else route
+
+    @staticmethod
+    def _combine(
+        patterns: list[str],
+        indexes: list[int],
+    ) -> re.Pattern | None:
+        if not indexes:
+            return None
+        return re.compile("|".join(
+            f"(?P<r{i}>{patterns[i]})" for i in indexes
+        ))
+
+
+class MethodRouteMatcher:
+    """
+    Finds the first entry having a route matching a real route and
+    supporting a method.
+
+    Routes are combined into one `RouteMatcher` per method.
+
+    Args:
+        entries:
+            Abstract routes and supported methods of each entry, e.g. of
+            each controller.
+        get_pattern(optional):
+            Function converting an abstract route into a regex pattern
+            string, see `RouteMatcher`.
+    """
+    def __init__(
+        self,
+        entries: list[tuple[list[str], Iterable[str]]],
+        get_pattern: Callable[[str], str] | None = None,
+    ) -> None:
+        routes_by_method: dict[str, list[str]] = {}
+        entry_indexes_by_method: dict[str, list[int]] = {}
+
+        for i, (abstract_routes, methods) in enumerate(entries):
+            for method in methods:
+                routes_by_method.setdefault(method.lower(), []).extend(
+                    abstract_routes,
+                )
+                entry_indexes_by_method.setdefault(method.lower(), []).extend(
+                    [i] * len(abstract_routes),
+                )
+
+        self._matchers: dict[str, tuple[RouteMatcher, list[int]]] = {
+            method: (
+                RouteMatcher(routes, get_pattern),
+                entry_indexes_by_method[method],
+            )
+            for method, routes in routes_by_method.items()
+        }
+
+    def match(self, route: str, method: str) -> int | None:
+        """
+        Returns:
+            Index of the first matched entry or None if nothing is matched.
+        """
+        matcher: tuple[RouteMatcher, list[int]] | None = \
+            self._matchers.get(method.lower())
+        if matcher is None:
+            return None
+
+        route_index: int | None = matcher[0].match(route)
+        if route_index is None:
+            return None
+        return matcher[1][route_index]
 
 
 class RouteUtils(Static):
+    # route matchers by app, cached along with a copy of the route list
+    # they're built from
+    _MatcherByApp: weakref.WeakKeyDictionary[
+        Any, tuple[list, RouteMatcher],
+    ] = weakref.WeakKeyDictionary()
+
     @staticmethod
     def is_request_route_registered(
         request: GenericRequest,
@@ -189,17 +448,33 @@ class RouteUtils(Static):
         Returns:
             True if the route is registered, False otherwise.
         """
-        abstract_routes: list[str] = [
-            route.path for route in request.app.routes
-        ]
+        return RouteUtils.get_app_route_matcher(request.app).match(
+            request.url.path,
+        ) is not None
 
-        pattern: re.Pattern
-        for abstract_route in abstract_routes:
-            pattern = RouteUtils.compile_route_regex(abstract_route)
-            if pattern.fullmatch(request.url.path):
-                return True
+    @staticmethod
+    def get_app_route_matcher(app: Any) -> RouteMatcher:
+        """
+        Returns matcher of all routes of an app.
+
+        The matcher is built once per app and rebuilt only if the app's
+        routes are changed, including routes added, removed or replaced in
+        place.
+        """
+        cached: tuple[list, RouteMatcher] | None = \
+            RouteUtils._MatcherByApp.get(app)
+        routes: list = app.routes
+
+        # lists are compared in C and unchanged routes by identity, so the
+        # check stays cheap on every request
+        if cached is None or cached[0] != routes:
+            cached = (
+                list(routes),
+                RouteMatcher([route.path for route in routes]),
+            )
+            RouteUtils._MatcherByApp[app] = cached
 
-        return False
+        return cached[1]
 
     @staticmethod
     def compile_route_regex(
@@ -215,9 +490,19 @@ class RouteUtils(Static):
         Returns:
             Regex pattern.
         """
+        return re.compile(RouteUtils.get_route_pattern(abstract_route))
+
+    @staticmethod
+    def get_route_pattern(
+        abstract_route: str,
+    ) -> str:
+        """
+        Converts given abstract route into regex pattern string for
+        `compile_route_regex`.
+        """
         # Avoid regex symbols in origin abstract route
         abstract_route = re.escape(abstract_route)
-        return re.compile(re.sub(
+        return re.sub(
             # Two slashes ahead of each of the bracket symbols {} is required
             # since initial abstract route was escaped ("{" transformed into
             # "\{")
@@ -227,6 +512,66 @@ class RouteUtils(Static):
             # abstract "/users/{id}"
             r"[^\/]*",
             abstract_route,
+        )
+
+    @staticmethod
+    def compile_controller_route_regex(
+        abstract_route: str,
+    ) -> re.Pattern:
+        """
+        Compiles given abstract route into regex pattern matching real routes
+        exactly as `Controller.is_matching_route` does.
+
+        Args:
+            Abstract route to create pattern from.
+
+        Returns:
+            Regex pattern to be used with `fullmatch`.
+        """
+        return re.compile(
+            RouteUtils.get_controller_route_pattern(abstract_route),
+        )
+
+    @staticmethod
+    def get_controller_route_pattern(
+        abstract_route: str,
+    ) -> str:
+        """
+        Converts given abstract route into regex pattern string for
+        `compile_controller_route_regex`.
+        """
+        return re.sub(
+            r"\\{\w+\\}",
+            r"(?:\\w+)",
+            re.escape(abstract_route),
+        )
+
+    @staticmethod
+    def compile_middleware_routes_regex(
+        abstract_routes: list[str],
+    ) -> re.Pattern:
+        """
+        Compiles routes given to a middleware into one regex pattern.
+
+        Follows `orwynn.middleware.Middleware` route covering: "*" matches
+        any route and a format bracket matches the rest of the route, e.g.
+        "/files/{path}" matches "/files/home/user/file.txt".
+
+        Args:
+            Abstract routes to create pattern from.
+
+        Returns:
+            Regex pattern to be used with `fullmatch`. Matches nothing if no
+            routes are given.
+        """
+        if "*" in abstract_routes:
+            return re.compile(r".*")
+        if not abstract_routes:
+            return re.compile(r"(?!)")
+
+        return re.compile("|".join(
+            "(?:" + re.sub(r"\\{[^}]*\\}", r".+", re.escape(r)) + ")"
+            for r in abstract_routes
         ))
 
     @staticmethod
@@ -1,5 +1,5 @@
 import asyncio
-from typing import Callable
+from typing import TYPE_CHECKING
 
 from orwynn import Module
 from orwynn.boot import Boot
@@ -9,19 +9,19 @@ from orwynn.http import (
     Endpoint,
     EndpointResponse,
     HttpController,
-    HttpMiddleware,
-    HttpRequest,
-    HttpResponse,
 )
 
 from orwynn_rbac import module as rbac_module
 from orwynn_rbac.bootscripts import RBACBoot
+from orwynn_rbac.middleware import AccessMiddleware
 from orwynn_rbac.models import DefaultRole
 from orwynn_rbac.search import RoleSearch
-from orwynn_rbac.services import AccessService, RoleService
 from orwynn_rbac.utils import UpdateOperator
 from tests.app.runner import run_server
 
+if TYPE_CHECKING:
+    from orwynn_rbac.services import RoleService
+
 DefaultRoles: list[DefaultRole] = [
     DefaultRole(
         name="master",
@@ -99,30 +99,6 @@ class UncoveredController(HttpController):
         return {"type": "ok"}
 
 
-class AccessMiddleware(HttpMiddleware):
-    def __init__(
-        self,
-        covered_routes: list[str],
-        service: AccessService,
-    ) -> None:
-        super().__init__(covered_routes)
-        self.service: AccessService = service
-
-    async def process(
-        self,
-        request: HttpRequest,
-        call_next: Callable,
-    ) -> HttpResponse:
-        user_id: str | None = request.headers.get("user-id", None)
-        self.service.check_user(
-            user_id, str(request.url.components.path), request.method,
-        )
-
-        response: HttpResponse = await call_next(request)
-
-        return response
-
-
 def create_root_module() -> Module:
     return Module(
         "/",